@@ -0,0 +1,559 @@
+"""Write backups of the games on a server without blocking it.
+
+GTRServer marks a game dirty after every change. A BackupWriter keeps a
+thread that wakes up when there are dirty games, takes a snapshot of
+each with Game.clone() and writes it to its own file in the backup
+directory. Changes made while a write is in progress, or less than the
+interval after it, are written together in the next one, so a game is
+written at most once per interval however many actions it gets.
+
+Each file is written to a temporary name and renamed into place, so a
+crash leaves either the old backup or the new one, never a truncated
+file.
+
+Next to the games, the writer keeps an index with the GameRecord of
+every game it has written. A server started from the directory reads
+only the index, to list the games in the lobby, and keeps them in a
+GameStore that loads each game the first time it's used.
+
+A GameStore with an archive directory also moves finished games, and
+games nobody has used for a while, out of memory into gzipped files
+there, and reloads them when they're asked for.
+"""
+
+import cPickle as pickle
+import collections
+import gzip
+import logging
+import os
+import re
+import threading
+import time
+from pickle import BUILD, Unpickler
+
+from cloaca.card import Card
+from cloaca.game import Game
+from cloaca.game_record import GameRecord
+
+lg = logging.getLogger(__name__)
+lg.addHandler(logging.NullHandler())
+
+_game_file_re = re.compile(r'^game-(\d+)\.pickle$')
+_archive_file_re = re.compile(r'^game-(\d+)\.pickle\.gz$')
+
+INDEX_FILE = 'index.pickle'
+
+
+def game_file(directory, game_id):
+    """Return the path of the backup of a game."""
+    return os.path.join(directory, 'game-{0:d}.pickle'.format(game_id))
+
+
+def archive_file(directory, game_id):
+    """Return the path of the archive of a game."""
+    return os.path.join(directory, 'game-{0:d}.pickle.gz'.format(game_id))
+
+
+def write_atomically(path, obj, compress=False):
+    """Pickle obj to path through a temporary file that replaces path
+    once it's complete. If compress is True, the file is gzipped.
+    """
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        if compress:
+            with gzip.GzipFile(fileobj=f, mode='wb') as gz:
+                pickle.dump(obj, gz, pickle.HIGHEST_PROTOCOL)
+        else:
+            pickle.dump(obj, f, pickle.HIGHEST_PROTOCOL)
+        f.flush()
+        os.fsync(f.fileno())
+    os.rename(tmp, path)
+
+
+class _LegacyMemo(dict):
+    """Unpickler memo that remembers the key of each Card put in it."""
+
+    def __init__(self):
+        dict.__init__(self)
+        self.card_keys = {}
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, value)
+        if type(value) is Card:
+            self.card_keys[id(value)] = key
+
+
+class LegacyUnpickler(Unpickler):
+    """Unpickler for backups written before the game objects had
+    __slots__ and Card was interned.
+
+    Those pickled each Card with its __dict__, {'ident': n}, so each one
+    unpickles to a new instance. Once it has its ident, it's replaced by
+    the interned Card, on the stack and in the memo, so every reference
+    to it gets the interned card too.
+
+    Player and Building were old-style classes, which pickle creates by
+    calling the class with no arguments. Now that they're new-style
+    classes, they're created with __new__ instead, and get their old
+    __dict__ through __setstate__.
+    """
+
+    def __init__(self, f):
+        Unpickler.__init__(self, f)
+        self.memo = _LegacyMemo()
+
+    def _instantiate(self, klass, k):
+        if isinstance(klass, type) and len(self.stack) == k + 1:
+            del self.stack[k:]
+            self.append(klass.__new__(klass))
+        else:
+            Unpickler._instantiate(self, klass, k)
+
+    def load_build(self):
+        Unpickler.load_build(self)
+        card = self.stack[-1]
+        if type(card) is Card:
+            interned = Card(card.ident)
+            if interned is not card:
+                self.stack[-1] = interned
+                key = self.memo.card_keys.pop(id(card), None)
+                if key is not None:
+                    dict.__setitem__(self.memo, key, interned)
+
+    dispatch = dict(Unpickler.dispatch)
+    dispatch[BUILD] = load_build
+
+
+def load_pickle(f):
+    """Unpickle a backup from the file f, which must be seekable, with
+    LegacyUnpickler if it was written by an older server.
+    """
+    try:
+        return pickle.load(f)
+    except Exception:
+        # Eg. AttributeError for an old Card, or whatever the constructor
+        # of an old Player or Building raises when called with no args.
+        f.seek(0)
+        return LegacyUnpickler(f).load()
+
+
+def game_record(game):
+    """Return the GameRecord that describes the game in the lobby."""
+    return GameRecord(game.game_id, [p.name for p in game.players],
+            game.started, game.host, game.finished)
+
+
+def load_index(directory):
+    """Return the GameRecords of the games in a backup directory, by
+    game_id.
+
+    Directories written before the index existed have none, so it's
+    built from the games, loading them all.
+    """
+    path = os.path.join(directory, INDEX_FILE)
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except IOError:
+        pass
+    except (EOFError, pickle.UnpicklingError) as e:
+        lg.warning('Couldn\'t load backup index %s: %s', path, e)
+
+    lg.info('Building backup index for %s', directory)
+    return dict((game_id, game_record(game))
+            for game_id, game in enumerate(load_games(directory))
+            if game is not None)
+
+
+def load_game(directory, game_id, archived=False):
+    """Return the game from its backup, or from its archive if archived
+    is True. Return None if it can't be read.
+    """
+    if archived:
+        path = archive_file(directory, game_id)
+        opener = gzip.open
+    else:
+        path = game_file(directory, game_id)
+        opener = open
+
+    try:
+        with opener(path, 'rb') as f:
+            return pickle.load(f)
+    except (IOError, EOFError, pickle.UnpicklingError) as e:
+        lg.warning('Couldn\'t load backup %s: %s', path, e)
+        return None
+
+
+def load_games(directory):
+    """Return the games backed up in the directory as a list indexed by
+    game_id. Games that are missing, eg. after a crash before a new game
+    was first written, are None.
+    """
+    games = {}
+    for name in os.listdir(directory):
+        m = _game_file_re.match(name)
+        if m is not None:
+            game_id = int(m.group(1))
+            game = load_game(directory, game_id)
+            if game is not None:
+                games[game_id] = game
+
+    n = max(games) + 1 if games else 0
+    return [games.get(i) for i in range(n)]
+
+
+class BackupWriter(object):
+    """Write the games marked dirty to a directory from a background
+    thread.
+
+    The lock, if given, must be held by any code that changes a game.
+    The writer only holds it while it clones the dirty games.
+    """
+
+    def __init__(self, directory, interval=1.0, lock=None, index=None):
+        self.directory = directory
+        self.interval = interval
+        self._lock = lock if lock is not None else threading.RLock()
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        # GameRecords by game_id of all the games in the directory. The
+        # caller can pass it if it has already read it.
+        self._index = (dict(index) if index is not None
+                else load_index(directory))
+
+        # Dirty games by game_id, and the condition that guards them.
+        self._dirty = {}
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._stopped = threading.Event()
+        self._thread = None
+
+        # Held while writing, so flush() can be called from any thread.
+        self._write_lock = threading.Lock()
+
+        self.n_writes = 0
+
+    def mark_dirty(self, game):
+        """Have the game written in the next round of writes."""
+        with self._cond:
+            self._dirty[game.game_id] = game
+            self._cond.notify()
+
+    def mark_removed(self, game_id):
+        """Have the game's backup deleted in the next round of writes."""
+        with self._cond:
+            self._dirty[game_id] = None
+            self._cond.notify()
+
+    def start(self):
+        """Start the writer thread."""
+        self._stopping = False
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run,
+                name='BackupWriter')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop the writer thread and write the games that are still
+        dirty.
+        """
+        if self._thread is not None:
+            with self._cond:
+                self._stopping = True
+                self._cond.notify()
+            self._stopped.set()
+            self._thread.join()
+            self._thread = None
+
+        self.flush()
+
+    def flush(self):
+        """Write the dirty games now, in the calling thread."""
+        with self._write_lock:
+            with self._cond:
+                dirty, self._dirty = self._dirty, {}
+
+            if dirty:
+                with self._lock:
+                    snapshots = [(game_id, g.clone())
+                            for game_id, g in dirty.iteritems()
+                            if g is not None]
+                removed = [game_id for game_id, g in dirty.iteritems()
+                        if g is None]
+
+                failed = []
+                for game_id, snapshot in snapshots:
+                    if self._write(game_id, snapshot):
+                        self._index[game_id] = game_record(snapshot)
+                    else:
+                        failed.append(game_id)
+
+                for game_id in removed:
+                    self._index.pop(game_id, None)
+
+                # Written after the new games and before removing the old
+                # ones, so it never lists a game whose file doesn't exist.
+                path = os.path.join(self.directory, INDEX_FILE)
+                try:
+                    write_atomically(path, self._index)
+                except (IOError, OSError, pickle.PicklingError) as e:
+                    lg.warning('Error writing backup index %s: %s', path, e)
+                    # The new games aren't listed anywhere yet.
+                    failed = [game_id for game_id, _ in snapshots]
+
+                # Retried in the next round, unless the game has been
+                # marked dirty or removed again meanwhile.
+                if failed:
+                    with self._cond:
+                        for game_id in failed:
+                            self._dirty.setdefault(game_id, dirty[game_id])
+
+                for game_id in removed:
+                    try:
+                        os.remove(game_file(self.directory, game_id))
+                    except OSError:
+                        pass
+
+    def _run(self):
+        cond = self._cond
+        while True:
+            with cond:
+                while not self._dirty and not self._stopping:
+                    cond.wait()
+                if self._stopping:
+                    return
+
+            self.flush()
+
+            # Wait out the interval, so the changes made meanwhile are
+            # written together.
+            self._stopped.wait(self.interval)
+
+    def _write(self, game_id, game):
+        path = game_file(self.directory, game_id)
+        try:
+            write_atomically(path, game)
+        except (IOError, OSError, pickle.PicklingError) as e:
+            lg.warning('Error writing backup %s: %s', path, e)
+            return False
+        else:
+            self.n_writes += 1
+            return True
+
+
+class GameStore(object):
+    """The games of a server, by game_id.
+
+    With a backup directory, the games start out as their GameRecords in
+    the directory's index, and each game is loaded from its file the
+    first time it's used. Without one, it's a list of games in memory.
+
+    With an archive directory, evict() writes a game there and drops it
+    from memory, keeping only its GameRecord for the lobby. Unfinished
+    games are moved back into memory when they're used again. Finished
+    games can't change, so they're reloaded into a cache that keeps the
+    cache_size games used most recently, eg. for players looking at the
+    end of a game.
+
+    Game ids are never reused. remove() deletes a game for good, and
+    game ids missing from the index, eg. for games removed, or created
+    just before a crash, don't exist. Games listed in the index that
+    can't be loaded are replaced by empty games.
+    """
+
+    def __init__(self, directory=None, archive_dir=None, cache_size=100):
+        self.directory = directory
+        self.archive_dir = archive_dir
+        self.cache_size = cache_size
+
+        # Games in memory, and the time each was last used.
+        self._games = {}
+        self._last_used = {}
+
+        # Finished games reloaded from the archive, least recently used
+        # first.
+        self._cache = collections.OrderedDict()
+
+        # GameRecords of the games that aren't in memory.
+        self._records = load_index(directory) if directory else {}
+
+        self._archived = set()
+        if archive_dir:
+            if not os.path.isdir(archive_dir):
+                os.makedirs(archive_dir)
+            for name in os.listdir(archive_dir):
+                m = _archive_file_re.match(name)
+                if m is not None:
+                    self._archived.add(int(m.group(1)))
+
+        self._n = max(self._records) + 1 if self._records else 0
+        if self._archived:
+            self._n = max(self._n, max(self._archived) + 1)
+
+    def __len__(self):
+        # The next game id, as for a list of all the games ever created.
+        return self._n
+
+    def __getitem__(self, game_id):
+        try:
+            game = self._games[game_id]
+        except (KeyError, TypeError):
+            pass
+        else:
+            self._last_used[game_id] = time.time()
+            return game
+
+        try:
+            game = self._cache.pop(game_id)
+        except (KeyError, TypeError):
+            pass
+        else:
+            self._cache[game_id] = game
+            return game
+
+        if game_id not in self._records and game_id not in self._archived:
+            raise IndexError('Game {0!r} does not exist.'.format(game_id))
+
+        return self._load(game_id)
+
+    def __contains__(self, game_id):
+        return (game_id in self._games or game_id in self._cache
+                or game_id in self._records or game_id in self._archived)
+
+    def __setitem__(self, game_id, game):
+        if game_id not in self:
+            raise IndexError('Game {0!r} does not exist.'.format(game_id))
+        self._cache.pop(game_id, None)
+        self._make_resident(game_id, game)
+
+    def __iter__(self):
+        for game_id in range(self._n):
+            if game_id in self:
+                yield self[game_id]
+
+    def append(self, game):
+        self._games[self._n] = game
+        self._last_used[self._n] = time.time()
+        self._n += 1
+
+    def remove(self, game_id):
+        """Delete the game, from memory and from the archive."""
+        if game_id in self._archived:
+            self._archived.discard(game_id)
+            try:
+                os.remove(archive_file(self.archive_dir, game_id))
+            except OSError as e:
+                lg.warning('Couldn\'t remove archive of game %d: %s',
+                        game_id, e)
+
+        self._games.pop(game_id, None)
+        self._last_used.pop(game_id, None)
+        self._cache.pop(game_id, None)
+        self._records.pop(game_id, None)
+
+    def is_loaded(self, game_id):
+        """Return True if the game is in memory."""
+        return game_id in self._games or game_id in self._cache
+
+    def n_loaded(self):
+        """Return the number of games in memory."""
+        return len(self._games) + len(self._cache)
+
+    def evict(self, game_id):
+        """Archive the game and drop it from memory. Return False if
+        there's no archive directory or the game isn't in memory.
+
+        A finished game stays in the cache until other games push it
+        out.
+        """
+        if not self.archive_dir or game_id not in self._games:
+            return False
+
+        game = self._games[game_id]
+        path = archive_file(self.archive_dir, game_id)
+        try:
+            write_atomically(path, game, compress=True)
+        except (IOError, OSError, pickle.PicklingError) as e:
+            lg.warning('Error writing archive %s: %s', path, e)
+            return False
+
+        del self._games[game_id]
+        del self._last_used[game_id]
+        self._records[game_id] = game_record(game)
+        self._archived.add(game_id)
+        if game.finished:
+            self._add_to_cache(game_id, game)
+
+        return True
+
+    def evict_idle(self, timeout, now=None):
+        """Evict the games that haven't been used for timeout seconds.
+        Return the game_ids of the games evicted.
+        """
+        if not self.archive_dir:
+            return []
+
+        if now is None:
+            now = time.time()
+
+        idle = [game_id for game_id, t in self._last_used.iteritems()
+                if now - t >= timeout]
+        return [game_id for game_id in idle if self.evict(game_id)]
+
+    def index(self):
+        """Return the GameRecords of all the games by game_id, without
+        loading any.
+        """
+        index = dict(self._records)
+        for game_id, game in self._games.iteritems():
+            index[game_id] = game_record(game)
+        return index
+
+    def records(self):
+        """Return the list of GameRecords of all the games."""
+        index = self.index()
+        for game_id in self._archived.difference(index):
+            # Archived in a previous run, without a backup index.
+            index[game_id] = GameRecord(game_id, [], False, None)
+        return [index[game_id] for game_id in sorted(index)]
+
+    def _load(self, game_id):
+        game = None
+        if game_id in self._archived:
+            game = load_game(self.archive_dir, game_id, archived=True)
+        if game is None and game_id in self._records and self.directory:
+            game = load_game(self.directory, game_id)
+
+        if game is None:
+            lg.warning('Game {0:d} is missing from the backup.'.format(game_id))
+            game = Game()
+            game.game_id = game_id
+
+        if game.finished:
+            self._add_to_cache(game_id, game)
+            return game
+
+        self._make_resident(game_id, game)
+        return game
+
+    def _make_resident(self, game_id, game):
+        if game_id in self._archived:
+            # The game can change again, so its archive would be stale.
+            self._archived.discard(game_id)
+            try:
+                os.remove(archive_file(self.archive_dir, game_id))
+            except OSError as e:
+                lg.warning('Couldn\'t remove archive of game %d: %s',
+                        game_id, e)
+
+        self._records.pop(game_id, None)
+        self._games[game_id] = game
+        self._last_used[game_id] = time.time()
+
+    def _add_to_cache(self, game_id, game):
+        self._cache[game_id] = game
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
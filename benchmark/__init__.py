@@ -0,0 +1,6 @@
+"""Benchmark scripts for the GtR engine and server.
+
+Run them as modules from the directory containing the package, eg.
+
+    python -m cloaca.benchmark.card_access
+"""
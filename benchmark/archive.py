@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+
+"""Measure the memory a GTRServer holds for its games over its lifetime,
+with and without an archive directory.
+
+The server plays n_games 2-player games to the end with random legal
+actions, keeping n_live of them going at a time. After every batch of
+finished games, print the memory held by GTRServer.games.
+"""
+
+import random
+import shutil
+import tempfile
+
+from cloaca.server import GTRServer
+from cloaca.message import Command
+from cloaca.benchmark.backup import start_game
+from cloaca.benchmark.memory import deep_sizeof
+
+
+def lifetime(n_games, n_live, archive_dir=None, cache_size=4, seed=0):
+    """Return [(games finished, kB held by the games), ...]."""
+    rand = random.Random(seed)
+    s = GTRServer(archive_dir=archive_dir, cache_size=cache_size)
+    s.send_command = lambda uid, command: None
+
+    live = []
+    def new_game():
+        game_id = len(s.games)
+        s.games.append(start_game(s, game_id))
+        live.append(game_id)
+
+    for _ in range(n_live):
+        new_game()
+
+    sizes = []
+    n_finished = 0
+    while n_finished < n_games:
+        game_id = rand.choice(live)
+        g = s.games[game_id]
+        p = rand.choice(g.waiting_for())
+        a = rand.choice(list(g.legal_actions(p)))
+        s.handle_command(p.uid, Command(game_id, a))
+
+        if g.finished:
+            n_finished += 1
+            live.remove(game_id)
+            new_game()
+            if n_finished % (n_games//4) == 0:
+                sizes.append((n_finished, deep_sizeof(s.games)/1024.))
+
+    return sizes
+
+
+def main(n_games=40, n_live=8):
+    without = lifetime(n_games, n_live)
+
+    archive_dir = tempfile.mkdtemp()
+    try:
+        with_archive = lifetime(n_games, n_live, archive_dir)
+    finally:
+        shutil.rmtree(archive_dir)
+
+    print 'Memory held by GTRServer.games, {0:d} live 2-player games'.format(
+            n_live)
+    print '{0:>10s} {1:>14s} {2:>14s}'.format('finished', 'no archive (kB)',
+            'archive (kB)')
+    for (n, kb), (_, kb_archive) in zip(without, with_archive):
+        print '{0:10d} {1:14.1f} {2:14.1f}'.format(n, kb, kb_archive)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+
+"""Measure the latency of game actions sent to a GTRServer that keeps
+backups, with 1, 100 and 1000 live 2-player games.
+
+Each action is a random legal action for a random game, sent with
+GTRServer.handle_command(), which also sends the new game state to the
+players. Finished games are replaced by new ones. The server writes its
+backups to a temporary directory.
+
+Then measure the time to start a server from the backup of 1000 games,
+and the memory its game database holds, for a backup file with a
+pickled list of games (as older servers wrote) and for a backup
+directory, where only the index is read at startup.
+"""
+
+import random
+import shutil
+import tempfile
+import time
+import os
+import pickle
+
+from cloaca.server import GTRServer
+from cloaca.backup import BackupWriter
+from cloaca.benchmark.memory import deep_sizeof, thinker_game
+from cloaca.game import Game
+from cloaca.message import Command
+
+
+def start_game(s, game_id):
+    """Start a 2-player game with the given id on the server."""
+    g = Game()
+    g.game_id = game_id
+    g.headless = True
+    for i in range(2):
+        uid = game_id*2 + i
+        s.register_user(uid, {'name': 'p{0:d}'.format(uid)})
+        g.add_player(uid, 'p{0:d}'.format(uid))
+    g.host = game_id*2
+    g.start()
+    return g
+
+
+def live_server(n_games, backup_path):
+    """Return a server with n_games started 2-player games."""
+    s = GTRServer(backup_path)
+    s.send_command = lambda uid, command: None
+    for game_id in range(n_games):
+        s.games.append(start_game(s, game_id))
+    return s
+
+
+def latencies(n_games, n_actions, seed=0):
+    """Return the times in seconds of n_actions random actions."""
+    rand = random.Random(seed)
+    tmp = tempfile.mkdtemp()
+    s = live_server(n_games, os.path.join(tmp, 'backup'))
+
+    times = []
+    try:
+        while len(times) < n_actions:
+            game_id = rand.randrange(n_games)
+            g = s.games[game_id]
+            if g.finished:
+                # Keep the number of live games.
+                g = s.games[game_id] = start_game(s, game_id)
+            p = rand.choice(g.waiting_for())
+            a = rand.choice(list(g.legal_actions(p)))
+
+            start = time.time()
+            s.handle_command(p.uid, Command(game_id, a))
+            times.append(time.time() - start)
+    finally:
+        if hasattr(s, 'close'):
+            s.close()
+        shutil.rmtree(tmp)
+
+    return times
+
+
+def percentile(times, p):
+    times = sorted(times)
+    return times[min(len(times)-1, int(len(times)*p/100.0))]
+
+
+def startup(path, number=3):
+    """Return (seconds, bytes) to start a server from the backup at path
+    and for its game database.
+    """
+    times = []
+    for _ in range(number):
+        start = time.time()
+        s = GTRServer(None, path)
+        times.append(time.time() - start)
+    return min(times), deep_sizeof(s.games)
+
+
+def startup_table(n_games=1000, n_players=3, n_turns=15):
+    games = []
+    for i in range(n_games):
+        g = thinker_game(n_players, n_turns, seed=i)
+        g.game_id = i
+        games.append(g)
+
+    tmp = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp, 'backup.dat')
+        with open(path, 'wb') as f:
+            pickle.dump(games, f)
+        t_file, m_file = startup(path)
+
+        directory = os.path.join(tmp, 'backup')
+        w = BackupWriter(directory)
+        for g in games:
+            w.mark_dirty(g)
+        w.flush()
+        t_dir, m_dir = startup(directory)
+    finally:
+        shutil.rmtree(tmp)
+
+    print 'Server startup from {0:d} {1:d}-player games after {2:d} turns'.format(
+            n_games, n_players, n_turns)
+    print '{0:>10s} {1:>10s} {2:>12s}'.format('backup', 'time (ms)',
+            'games (kB)')
+    print '{0:>10s} {1:10.1f} {2:12.1f}'.format('file', t_file*1e3,
+            m_file/1024.)
+    print '{0:>10s} {1:10.1f} {2:12.1f}'.format('directory', t_dir*1e3,
+            m_dir/1024.)
+
+
+def main():
+    print 'handle_command latency with backups, random legal actions'
+    print '{0:>8s} {1:>8s} {2:>10s} {3:>10s}'.format(
+            'games', 'actions', 'p50 (ms)', 'p99 (ms)')
+    for n_games, n_actions in ((1, 2000), (100, 2000), (1000, 300)):
+        times = latencies(n_games, n_actions)
+        print '{0:8d} {1:8d} {2:10.2f} {3:10.2f}'.format(n_games, n_actions,
+                percentile(times, 50)*1e3, percentile(times, 99)*1e3)
+
+    print
+    startup_table()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+
+"""Time Card property access through the catalog tables against the old
+path, which re-read and re-parsed GTR_cards.json on every access.
+"""
+
+import timeit
+
+import cloaca.card_manager as cm
+from cloaca.card import Card
+
+
+def json_material(card):
+    """The old Card.material: parse the json file for every access."""
+    d = cm.get_cards_dict_from_json_file()
+    material = d[card.name]['material'] if card.name != 'Jack' else None
+    return str(material) if material else material
+
+
+def main(n=20000):
+    cards = cm.get_orders_card_set()
+    n_cards = len(cards)
+
+    def catalog_access():
+        for c in cards:
+            c.material, c.value, c.role, c.text
+
+    def json_access():
+        for c in cards[:10]:
+            json_material(c)
+
+    n_json = max(1, n // 1000)
+    t_cat = min(timeit.repeat(catalog_access, number=n//n_cards or 1, repeat=3))
+    t_json = min(timeit.repeat(json_access, number=n_json, repeat=3))
+
+    per_cat = t_cat / ((n//n_cards or 1) * n_cards * 4)
+    per_json = t_json / (n_json * 10)
+
+    print 'Card property access'
+    print '  json per access    : {0:10.3f} us'.format(per_json*1e6)
+    print '  catalog per access : {0:10.3f} us'.format(per_cat*1e6)
+    print '  speedup            : {0:10.0f}x'.format(per_json/per_cat)
+
+
+if __name__ == '__main__':
+    main()
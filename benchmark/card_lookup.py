@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+
+"""Micro-benchmarks for the card_manager lookup functions and the
+privatization path that uses them on every GAMESTATE broadcast.
+"""
+
+import timeit
+
+import cloaca.card_manager as cm
+from cloaca.benchmark.memory import thinker_game
+
+
+def bench(label, func, number):
+    t = min(timeit.repeat(func, number=number, repeat=3))
+    print '  {0:32s}: {1:10.3f} us'.format(label, t/number*1e6)
+
+
+def main():
+    names = ['Road', 'Dock', 'Wall', 'Jack', 'Shrine']
+
+    print 'card_manager lookups (per call)'
+    bench('get_card(name)', lambda: [cm.get_card(n) for n in names], 2000)
+    bench('get_card(name, copy)', lambda: cm.get_card('Road', 5), 10000)
+    bench('cards(name)', lambda: list(cm.cards('Road')), 10000)
+    bench('card_ids(name)', lambda: list(cm.card_ids('Road')), 10000)
+    bench('get_cards(8 names)', lambda: cm.get_cards(['Road']*3+names), 5000)
+    bench('get_cards_of_material', lambda: cm.get_cards_of_material('Wood'), 2000)
+
+    g = thinker_game(5, 20)
+    # Fill revealed zones as after a large Legionary demand.
+    for p in g.players:
+        p.revealed.set_content(list(p.hand)[:3])
+        p.prev_revealed.set_content(list(p.hand)[:3])
+
+    print 'privatization (per call, 5 players)'
+    bench('revealed -> get_card(name)',
+        lambda: [cm.get_card(c.name) for p in g.players for c in p.revealed],
+        5000)
+    bench('privatized_game_state_copy', lambda: g.privatized_game_state_copy('p1'), 200)
+
+
+if __name__ == '__main__':
+    main()
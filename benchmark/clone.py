@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+
+"""Compare Game.clone() with copy.deepcopy() and time the privatized
+copies made for every GAMESTATE broadcast, for games at three stages:
+
+    early -- 4 players, just started.
+    mid   -- 4 players after 40 thinker turns.
+    late  -- as mid after 60 turns, with buildings, clientele, vault
+             and stockpile cards dealt to each player from the library.
+"""
+
+import copy
+
+from cloaca.building import Building
+from cloaca.benchmark.memory import thinker_game
+from cloaca.benchmark.card_lookup import bench
+
+
+def late_game(n_players=4, n_turns=60):
+    g = thinker_game(n_players, n_turns)
+    for i, p in enumerate(g.players):
+        for _ in range(3):
+            foundation, m1, m2 = g.library.draw(3)
+            b = Building(foundation, foundation.material, [m1, m2],
+                    complete=True)
+            p.buildings.append(b)
+            g._track_building(i, b)
+        p.clientele.extend(g.library.draw(3))
+        p.vault.extend(g.library.draw(3))
+        p.stockpile.extend(g.library.draw(1))
+    return g
+
+
+def main():
+    games = (
+            ('early', thinker_game(4, 0)),
+            ('mid', thinker_game(4, 40)),
+            ('late', late_game()),
+            )
+
+    for label, g in games:
+        print '{0} game ({1:d} log entries, per call)'.format(
+                label, len(g.game_log))
+        bench('copy.deepcopy(game)', lambda: copy.deepcopy(g), 200)
+        if hasattr(g, 'clone'):
+            bench('game.clone()', lambda: g.clone(), 2000)
+        bench('privatized_game_state_copy',
+                lambda: g.privatized_game_state_copy('p1'), 500)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+
+"""Measure the cost of Game.handle() dispatch and of building the
+GameAction objects the engine makes for itself, and show the handler
+stats recorded with Game.profile_handlers.
+"""
+
+import timeit
+import copy
+
+from cloaca.game import Game
+import cloaca.game
+import cloaca.message as message
+from cloaca.message import GameAction
+from cloaca.benchmark.memory import thinker_game
+from cloaca.benchmark.card_lookup import bench
+
+
+def thinker_turns(g, n):
+    """Play n thinker turns, alternating jacks and orders."""
+    for turn in range(n):
+        g.handle(GameAction(message.THINKERORLEAD, True))
+        for_jack = turn % 2 == 1 and len(g.jacks) > 0
+        g.handle(GameAction(message.THINKERTYPE, for_jack))
+
+
+def main():
+    print 'GameAction construction (per call)'
+    bench('GameAction(USELATRINE, None)',
+            lambda: GameAction(message.USELATRINE, None), 20000)
+    if hasattr(GameAction, 'trusted'):
+        bench('GameAction.trusted(...)',
+                lambda: GameAction.trusted(message.USELATRINE, None), 20000)
+
+    g0 = thinker_game(3, 0)
+    games = [copy.deepcopy(g0) for _ in range(60)]
+    it = iter(games)
+    n = 4
+
+    def run():
+        thinker_turns(next(it), n)
+
+    t = min(timeit.repeat(run, number=20, repeat=3))
+    print 'handle() for thinker turns (per action, 3 players)'
+    print '  {0:32s}: {1:10.3f} us'.format('thinker turn actions',
+            t/(20*2*n)*1e6)
+
+    if hasattr(Game, 'profile_handlers'):
+        Game.profile_handlers = True
+        cloaca.game.reset_handler_stats()
+        thinker_turns(copy.deepcopy(g0), n)
+        Game.profile_handlers = False
+
+        print 'handler stats'
+        for name, s in sorted(cloaca.game.handler_stats().items()):
+            print '  {0:32s}: {1:4d} calls {2:10.3f} us'.format(
+                    name, s['calls'], s['time']*1e6)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+
+"""Time the expiry of lobby games with an ExpiryIndex against scanning
+the deadlines of all the games, for 1000 to 100000 games.
+
+Each event touches a random game's deadline and expires the games whose
+deadlines have passed, as GTRServer does for every join and reap().
+"""
+
+import random
+import timeit
+
+from cloaca.expiry import ExpiryIndex
+
+
+def index_events(n_games, n_events, seed=0):
+    rand = random.Random(seed)
+    index = ExpiryIndex()
+    for game_id in range(n_games):
+        index.set(game_id, rand.random()*n_games)
+
+    def run():
+        for now in xrange(n_events):
+            index.set(rand.randrange(n_games), now + n_games)
+            for game_id in index.pop_expired(now):
+                index.set(game_id, now + n_games)
+    return run
+
+
+def scan_events(n_games, n_events, seed=0):
+    rand = random.Random(seed)
+    deadlines = dict((game_id, rand.random()*n_games)
+            for game_id in range(n_games))
+
+    def run():
+        for now in xrange(n_events):
+            deadlines[rand.randrange(n_games)] = now + n_games
+            expired = [game_id for game_id, t in deadlines.iteritems()
+                    if t <= now]
+            for game_id in expired:
+                deadlines[game_id] = now + n_games
+    return run
+
+
+def main(n_events=1000):
+    print 'Time per event (touch a game and expire the due ones)'
+    print '{0:>8s} {1:>12s} {2:>12s}'.format('games', 'index (us)',
+            'scan (us)')
+    for n_games in (1000, 10000, 100000):
+        t_index = min(timeit.repeat(index_events(n_games, n_events),
+                number=1, repeat=3))
+        t_scan = min(timeit.repeat(scan_events(n_games, n_events//10),
+                number=1, repeat=3))
+        print '{0:8d} {1:12.2f} {2:12.2f}'.format(n_games,
+                t_index/n_events*1e6, t_scan/(n_events//10)*1e6)
+
+
+if __name__ == '__main__':
+    main()
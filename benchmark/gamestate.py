@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+"""Measure the bytes of game state the server sends per turn.
+
+Games of 2 to 5 players are created, joined and started through
+GTRServer and played to the end with random legal actions. Every
+GAMESTATE and GAMESTATEPATCH sent to any player is counted at its
+length on the wire, Command.to_json(), and divided by the number of
+actions and turns played.
+"""
+
+import random
+
+from cloaca.server import GTRServer
+from cloaca.message import GameAction, Command
+import cloaca.message as m
+
+
+def play(n_players, n_games, seed=0):
+    """Return (bytes, actions, turns, messages) for n_games games."""
+    rand = random.Random(seed)
+    s = GTRServer()
+
+    sent = {'bytes': 0, 'messages': 0}
+    def send_command(uid, command):
+        if command.action.action in (m.GAMESTATE, m.GAMESTATEPATCH):
+            sent['bytes'] += len(command.to_json())
+            sent['messages'] += 1
+    s.send_command = send_command
+
+    uids = range(n_players)
+    for uid in uids:
+        s.register_user(uid, {'name': 'p{0:d}'.format(uid)})
+
+    n_actions, n_turns = 0, 0
+    for game_id in range(n_games):
+        s.handle_command(uids[0], Command(None, GameAction(m.REQCREATEGAME)))
+        for uid in uids[1:]:
+            s.handle_command(uid, Command(game_id, GameAction(m.REQJOINGAME)))
+        s.handle_command(uids[0], Command(game_id, GameAction(m.REQSTARTGAME)))
+
+        g = s.games[game_id]
+        g.headless = True
+        while not g.finished:
+            p = rand.choice(g.waiting_for())
+            a = rand.choice(list(g.legal_actions(p)))
+            s.handle_command(p.uid, Command(game_id, a))
+            n_actions += 1
+        n_turns += g.turn_number
+
+    return sent['bytes'], n_actions, n_turns, sent['messages']
+
+
+def main(n_games=10):
+    print 'Game state sent to all players, {0:d} random games each'.format(
+            n_games)
+    print '{0:>8s} {1:>14s} {2:>12s} {3:>14s}'.format('players',
+            'bytes/action', 'bytes/turn', 'bytes/message')
+    for n_players in range(2, 6):
+        n_bytes, n_actions, n_turns, n_messages = play(n_players, n_games)
+        print '{0:8d} {1:14.0f} {2:12.0f} {3:14.0f}'.format(n_players,
+                float(n_bytes)/n_actions, float(n_bytes)/n_turns,
+                float(n_bytes)/n_messages)
+
+
+if __name__ == '__main__':
+    main()
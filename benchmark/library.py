@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+
+"""Benchmark drawing from the library, comparing repeated pop(0) on a
+top-first Zone with Library.draw().
+"""
+
+import cloaca.card_manager as cm
+from cloaca.zone import Zone, Library
+from cloaca.benchmark.card_lookup import bench
+
+
+def drain_zone(cards, n):
+    """Draw n cards at a time with pop(0) until the zone is empty."""
+    z = Zone(cards)
+    while len(z) >= n:
+        [z.pop(0) for i in range(n)]
+
+
+def drain_library(cards, n):
+    """Draw n cards at a time with Library.draw() until it is empty."""
+    l = Library(cards)
+    while len(l) >= n:
+        l.draw(n)
+
+
+def main():
+    orders = cm.get_orders_card_set()
+    for size in (1, 4):
+        cards = orders*size
+        print 'create from {0:d} cards'.format(len(cards))
+        bench('Zone(cards)', lambda: Zone(cards), 100)
+        bench('Library(cards)', lambda: Library(cards), 100)
+        for n in (1, 5, 20):
+            print 'draw {0:d} at a time from {1:d} cards (per library)'.format(
+                    n, len(cards))
+            bench('Zone.pop(0) x {0:d}'.format(n),
+                lambda: drain_zone(cards, n), 100)
+            bench('Library.draw({0:d})'.format(n),
+                lambda: drain_library(cards, n), 100)
+
+
+if __name__ == '__main__':
+    main()
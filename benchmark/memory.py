@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+
+"""Measure the memory held by Game objects, as GTRServer.games would
+hold them.
+
+The size of an object graph is the sum of sys.getsizeof() over every
+distinct object reachable from it, not counting classes, functions and
+modules. Objects shared between games (eg. interned Card instances) are
+counted once for the whole list.
+"""
+
+import gc
+import sys
+import types
+import random
+
+from cloaca.game import Game
+import cloaca.message as message
+from cloaca.error import GameOver
+
+_skip_types = (type, types.ClassType, types.ModuleType, types.FunctionType,
+        types.BuiltinFunctionType, types.MethodType)
+
+
+def deep_sizeof(obj):
+    """Return the total size in bytes of all objects reachable from obj.
+    """
+    seen = set()
+    total = 0
+    pending = [obj]
+    while pending:
+        o = pending.pop()
+        if id(o) in seen or isinstance(o, _skip_types):
+            continue
+
+        seen.add(id(o))
+        total += sys.getsizeof(o)
+        pending.extend(gc.get_referents(o))
+
+    return total
+
+
+def thinker_game(n_players, n_turns, seed=0):
+    """Return a started game after n_turns in which every leader thinks,
+    alternating between drawing cards and Jacks.
+    """
+    random.seed(seed)
+    g = Game()
+    for i in range(n_players):
+        g.add_player(i, 'p{0:d}'.format(i+1))
+
+    g.start()
+
+    try:
+        for turn in range(n_turns):
+            g.handle(message.GameAction(message.THINKERORLEAD, True))
+            for_jack = bool(turn % 2) and len(g.jacks) > 0
+            g.handle(message.GameAction(message.THINKERTYPE, for_jack))
+    except GameOver:
+        pass
+
+    return g
+
+
+def main(n_games=1000, n_players=3, n_turns=15):
+    one = deep_sizeof(thinker_game(n_players, n_turns))
+
+    games = [thinker_game(n_players, n_turns, seed=i) for i in range(n_games)]
+    many = deep_sizeof(games)
+
+    print 'Memory for {0:d}-player games after {1:d} turns'.format(
+            n_players, n_turns)
+    print '  one game          : {0:10.1f} kB'.format(one/1024.)
+    print '  {0:d} games        : {1:10.1f} kB ({2:.1f} kB per game)'.format(
+            n_games, many/1024., many/1024./n_games)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+
+"""Time scoring and the Forum check in a late 5-player game (see
+benchmark.clone), where the first players also have a Forum, and the
+cost of keeping the vault tally while moving cards.
+"""
+
+from cloaca.building import Building
+from cloaca.zone import Zone
+from cloaca.benchmark.clone import late_game
+from cloaca.benchmark.card_lookup import bench
+
+
+def forum_game(n_players=5):
+    g = late_game(n_players, n_turns=0)
+    for i, p in enumerate(g.players):
+        forum = g.library.pop_name('Forum') if 'Forum' in g.library else None
+        if forum is not None:
+            b = Building(forum, 'Marble', complete=True)
+            p.buildings.append(b)
+            g._track_building(i, b)
+    return g
+
+
+def main():
+    g = forum_game()
+    players = g.players
+    print 'late 5-player game ({0} vault cards, per call)'.format(
+            sum(len(p.vault) for p in players))
+    bench('_player_score(each player)',
+            lambda: [g._player_score(p) for p in players], 2000)
+    bench('_calc_winners()', g._calc_winners, 2000)
+    bench('_check_forum()', g._check_forum, 2000)
+    if hasattr(g, 'scores'):
+        bench('scores()', g.scores, 2000)
+
+    vault, other = players[0].vault, Zone(name='other')
+    def move():
+        c = vault.cards[0]
+        vault.move_card(c, other)
+        other.move_card(c, vault)
+    bench('vault move_card out and back', move, 20000)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+
+"""Play complete games to measure the speed of the rules engine, in
+normal and headless mode, for 2 to 5 players.
+
+Every leader thinks, choosing at random between a Jack and cards, until
+the library runs out and the game ends. The seeds are the same for both
+modes, so they play the same games.
+
+Then play games choosing at random from Game.legal_actions(), to count
+the actions the players make per turn with and without Game.auto_resolve,
+and the times per turn the game waits for players with and without
+Game.concurrent_follow. Each player's choices depend only on how many
+choices they've made in the turn, and actions with only one legal choice
+don't count as choices, so the games are the same with all settings.
+"""
+
+import random
+import time
+
+from cloaca.game import Game
+import cloaca.message as message
+from cloaca.error import GameOver
+
+
+def random_thinker_game(n_players, seed, headless=False):
+    """Play a game to the end and return the number of actions."""
+    random.seed(seed)
+    g = Game()
+    g.headless = headless
+    for i in range(n_players):
+        g.add_player(i, 'p{0:d}'.format(i+1))
+    g.start()
+
+    n_actions = 0
+    try:
+        while True:
+            g.handle(message.GameAction(message.THINKERORLEAD, True))
+            for_jack = len(g.jacks) > 0 and random.random() < 0.25
+            g.handle(message.GameAction(message.THINKERTYPE, for_jack))
+            n_actions += 2
+    except GameOver:
+        pass
+
+    return n_actions
+
+
+def random_legal_game(n_players, seed, auto_resolve=False,
+        concurrent_follow=False):
+    """Play a game to the end and return (actions, waits, turns).
+
+    The actions sent by early followers and the active player at the same
+    time are one wait.
+    """
+    random.seed(seed)
+    g = Game()
+    g.headless = True
+    g.auto_resolve = auto_resolve
+    g.concurrent_follow = concurrent_follow
+    for i in range(n_players):
+        g.add_player(i, 'p{0:d}'.format(i+1))
+    g.start()
+
+    choices = {}
+    def choose(p):
+        actions = list(g.legal_actions(p))
+        if len(actions) == 1:
+            return actions[0]
+        key = (seed, g.turn_number, p.name)
+        n = choices[key] = choices.get(key, 0) + 1
+        return random.Random(hash(key + (n,))).choice(actions)
+
+    n_actions, n_waits = 0, 0
+    try:
+        while True:
+            n_waits += 1
+            for p in g.waiting_for()[::-1]:
+                g.handle(choose(p), p)
+                n_actions += 1
+    except GameOver:
+        pass
+
+    return n_actions, n_waits, g.turn_number
+
+
+def per_turn(n_players, n_games, **settings):
+    """Return (actions per turn, waits per turn)."""
+    n_actions, n_waits, n_turns = 0, 0, 0
+    for seed in range(n_games):
+        actions, waits, turns = random_legal_game(n_players, seed, **settings)
+        n_actions += actions
+        n_waits += waits
+        n_turns += turns
+    return float(n_actions)/n_turns, float(n_waits)/n_turns
+
+
+def run(n_players, n_games, headless):
+    """Return (games per second, actions per second)."""
+    start = time.time()
+    n_actions = 0
+    for seed in range(n_games):
+        n_actions += random_thinker_game(n_players, seed, headless)
+    t = time.time() - start
+    return n_games/t, n_actions/t
+
+
+def main(n_games=100):
+    print '{0:>8s} {1:>9s} {2:>12s} {3:>14s}'.format(
+            'players', 'mode', 'games/s', 'actions/s')
+    for n_players in range(2, 6):
+        for headless in (False, True):
+            games, actions = run(n_players, n_games, headless)
+            print '{0:8d} {1:>9s} {2:12.1f} {3:14.0f}'.format(n_players,
+                    'headless' if headless else 'normal', games, actions)
+
+    print
+    print 'Player actions per turn, random legal actions'
+    print '{0:>8s} {1:>9s} {2:>12s} {3:>10s}'.format(
+            'players', 'normal', 'auto_resolve', 'reduction')
+    for n_players in range(2, 6):
+        normal, _ = per_turn(n_players, n_games)
+        auto, _ = per_turn(n_players, n_games, auto_resolve=True)
+        print '{0:8d} {1:9.2f} {2:12.2f} {3:9.0f}%'.format(
+                n_players, normal, auto, 100*(1 - auto/normal))
+
+    print
+    print 'Waits for players per turn, random legal actions'
+    print '{0:>8s} {1:>10s} {2:>10s} {3:>10s} {4:>10s}'.format(
+            'players', 'sequential', 'concurrent', '+auto', 'reduction')
+    for n_players in range(2, 6):
+        _, sequential = per_turn(n_players, n_games)
+        _, concurrent = per_turn(n_players, n_games, concurrent_follow=True)
+        _, both = per_turn(n_players, n_games, concurrent_follow=True,
+                auto_resolve=True)
+        print '{0:8d} {1:10.2f} {2:10.2f} {3:10.2f} {4:9.0f}%'.format(
+                n_players, sequential, concurrent, both,
+                100*(1 - concurrent/sequential))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+"""Benchmark moving cards between zones one at a time with move_card()
+and in bulk with move_cards() and move_all(), for the moves the engine
+makes: discarding a whole hand (Vomitorium) and a large Legionary demand.
+
+Each timing is a round trip, moving the cards to the target zone and
+back again, so that the zones don't have to be rebuilt between runs.
+"""
+
+import random
+
+import cloaca.card_manager as cm
+from cloaca.zone import Zone
+from cloaca.benchmark.card_lookup import bench
+
+
+def one_at_a_time(source, cards, target):
+    for c in cards:
+        source.move_card(c, target)
+    for c in cards:
+        target.move_card(c, source)
+
+
+def bulk(source, cards, target, trusted):
+    source.move_cards(cards, target, trusted)
+    target.move_cards(cards, source, trusted)
+
+
+def round_trip_all(source, target):
+    n = len(target)
+    source.move_all(target)
+    target.move_cards(target.cards[n:], source, True)
+
+
+def main():
+    random.seed(0)
+    orders = cm.get_orders_card_set()
+    random.shuffle(orders)
+
+    for hand_size in (5, 12, 30):
+        hand = Zone(orders[:hand_size], name='hand')
+        pool = Zone(orders[-20:], name='pool')
+        cards = list(hand)
+        print 'discard a hand of {0:d} cards into the pool'.format(hand_size)
+        bench('move_card per card',
+            lambda: one_at_a_time(hand, cards, pool), 2000)
+        bench('move_all',
+            lambda: round_trip_all(hand, pool), 2000)
+
+    for n_demanded in (3, 10, 30):
+        hand = Zone(orders[:40], name='hand')
+        stockpile = Zone(orders[-20:], name='stockpile')
+        # The demanded cards are matched by material, so they are spread
+        # through the hand.
+        demanded = hand.cards[::40//n_demanded][:n_demanded]
+        print 'Legionary takes {0:d} cards from a hand of 40'.format(n_demanded)
+        bench('move_card per card',
+            lambda: one_at_a_time(hand, demanded, stockpile), 2000)
+        bench('move_cards',
+            lambda: bulk(hand, demanded, stockpile, False), 2000)
+        bench('move_cards, trusted',
+            lambda: bulk(hand, demanded, stockpile, True), 2000)
+
+
+if __name__ == '__main__':
+    main()
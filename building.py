@@ -1,7 +1,8 @@
 from cloaca.zone import Zone
 from cloaca.error import GTRError
+from cloaca.slots import SlotsObject
 
-class Building:
+class Building(SlotsObject):
     """A container that represents buildings.
     
     The primary data members are the building foundation, site, and materials.
@@ -21,8 +22,16 @@ class Building:
         stairway_materials -- (Zone) material cardss added to the buildling
             with Stairway.
         complete -- (bool) True if the building is complete.
+        owner -- (Player) the player whose buildings list has this
+            building, or None. It is set by the list and is told when the
+            building is completed or its stairway materials change.
     """
 
+    __slots__ = ('foundation', 'site', 'materials', '_stairway_materials',
+            '_complete', 'owner')
+    _fields = ('foundation', 'site', 'materials', 'stairway_materials',
+            'complete')
+
     def __init__(self, foundation=None, site=None, materials=None,
                  stairway_materials=None, complete=False):
         """Initialize an instance with specified properties.
@@ -32,6 +41,7 @@ class Building:
 
         Creating a building with no site or no foundation raises a GTRError.
         """
+        self.owner = None
         self.foundation = foundation
         self.site = site
         self.materials = Zone(materials if materials else [])
@@ -47,6 +57,48 @@ class Building:
         if self.site is None:
             raise GTRError('Invalid building (no site): '+repr(self))
 
+    def __setstate__(self, state):
+        self.owner = None
+        SlotsObject.__setstate__(self, state)
+
+    def clone(self, locations=None):
+        """Return a copy of this building, sharing the Card objects. See
+        Zone.clone() for locations. The copy has no owner.
+        """
+        b = Building.__new__(Building)
+        b.owner = None
+        b.foundation = self.foundation
+        b.site = self.site
+        b.materials = self.materials.clone(locations)
+        b._stairway_materials = self._stairway_materials.clone(locations)
+        b._stairway_materials.on_change = b._changed
+        b._complete = self._complete
+        return b
+
+    def _changed(self):
+        """Tell the owner that the building is completed or stairwayed."""
+        if self.owner is not None:
+            self.owner.buildings_changed()
+
+    @property
+    def complete(self):
+        return self._complete
+
+    @complete.setter
+    def complete(self, complete):
+        self._complete = complete
+        self._changed()
+
+    @property
+    def stairway_materials(self):
+        return self._stairway_materials
+
+    @stairway_materials.setter
+    def stairway_materials(self, zone):
+        self._stairway_materials = zone
+        zone.on_change = self._changed
+        self._changed()
+
     def __str__(self):
         """Return the name of the foundation card."""
         return str(self.foundation.name)
@@ -57,7 +109,15 @@ class Building:
                .format(**self.__dict__))
     
     def __eq__(self, other):
-        return self.__dict__ == other.__dict__
+        return isinstance(other, Building) and \
+                self.foundation == other.foundation and \
+                self.site == other.site and \
+                self.materials == other.materials and \
+                self.stairway_materials == other.stairway_materials and \
+                self.complete == other.complete
+
+    def __ne__(self, other):
+        return not self == other
 
     @property
     def is_stairwayed(self):
@@ -1,37 +1,23 @@
 #!/usr/bin/env python
 
 """
-This module reads data from a json file and returns card properties as strings,
-except card value, which is returned as an int.
+This module returns card properties as strings, except card value, which is
+returned as an int. The data is read from a json file once, by the catalog
+module, and looked up from its tables.
 There is barely any error handling!
 """
 
-import json
 import logging
-from os import path
 
-from collections import Counter
+import cloaca.catalog as catalog
 
-_deck = ()
+from collections import Counter
 
 def _get_deck():
-    """Initialize or return the list of card names. Six Jacks plus
+    """Return the list of card names. Six Jacks plus
     the Orders cards in alphabetical order.
     """
-
-    global _deck
-    if len(_deck) == 0:
-        orders = []
-        d = get_cards_dict_from_json_file()
-        for name, card_dict in d.items():
-            name = str(name)
-            n_cards = int(card_dict['card_count'])
-            orders.extend([name]*n_cards)
-
-        orders.sort(key=lambda x:x.lower())
-        _deck = tuple(['Jack']*6 + orders)
-
-    return _deck
+    return catalog.deck
 
 def standard_deck():
     """Returns a tuple of the standard cards (strings) in a deck, Jacks first,
@@ -45,15 +31,21 @@ def get_card(name, copy=0):
     index. If the first Dock card is 12, say, then 
     get_card('Dock', 2) returns Card(ident=14).
 
+    Raise ValueError if there is no card with that name.
+
     Raise IndexError if copy is larger than the number
     of those cards.
     """
-    c = Card(standard_deck().index(name)+copy)
-    if c.name != name:
+    try:
+        start, stop = catalog.ident_ranges[name]
+    except KeyError:
+        raise ValueError('No card named {0!r} in the deck.'.format(name))
+
+    if copy < 0 or start+copy >= stop:
         raise IndexError('There are not {0!s} copies of {1} in the deck.'
                 .format(copy+1, name))
-    else:
-        return c
+
+    return _interned_cards[start+copy]
 
 
 def get_cards(card_names):
@@ -67,19 +59,20 @@ def get_cards(card_names):
     instance, there are only 3 'Statue' cards, so get_cards(['Statue']*4)
     will raise.
     """
-    d = {name:list(cards(name)) for name in set(card_names)}
+    n_pulled = {}
 
     out=[]
     for name in card_names:
-        try:
-            c = d[name].pop(0)
-        except IndexError:
+        start, stop = catalog.ident_ranges.get(name, (0, 0))
+        ident = start + n_pulled.get(name, 0)
+        if ident >= stop:
             raise ValueError(
                     'There are only {0} {1} cards in the game '
                     '({2} requested).'
-                    .format(len(cards(name)), name, card_names.count(name)))
+                    .format(stop-start, name, card_names.count(name)))
 
-        out.append(c)
+        n_pulled[name] = ident - start + 1
+        out.append(_interned_cards[ident])
     
     return tuple(out)
 
@@ -87,141 +80,79 @@ def get_cards(card_names):
 def get_cards_of_material(material):
     """Gets all card of the specified material.
     """
-    return filter(lambda c: c.material == material, get_orders_card_set())
+    return list(_cards_of_material.get(material, ()))
 
 def card_ids(name):
-    """Return generator of all card ids with the specified name.
+    """Return a sequence of all card ids with the specified name.
     """
-    return (i for i,c in enumerate(standard_deck()) if c==name)
+    return xrange(*catalog.ident_ranges.get(name, (0, 0)))
 
 def cards(name):
-    """Return generator of all Card objects with the specified name. 
+    """Return a tuple of all Card objects with the specified name. 
     They will have different ids.
     """
-    return (Card(i) for i in card_ids(name))
+    return _cards_of_name.get(name, ())
 
 
 def get_orders_card_set():
     """Returns a list with the default number of each Orders cards.
     The elements are Card objects.
     """
-    return [Card(i) for i in range(6, len(_get_deck()))]
+    return list(_orders_cards)
         
 
 def get_cards_dict_from_json_file():
     """ Return dict of data for ALL cards from the json file.  """
-    # json should be in the GTR directory, with this module
-    gtr_dir = path.dirname(__file__)
-    json_file = file(path.join(gtr_dir,'GTR_cards.json'), 'r')
-    cards_dict = json.load(json_file)
-    json_file.close()
-    return cards_dict
+    return catalog.read_cards_json()
 
 def get_card_dict(card_name):
     """ Return dict of data for ONE card. """
-    cards_dict = get_cards_dict_from_json_file()
-    
-    if card_name in ['Jack','Card'] :
-        card_dict = {"card_count": "0", 
-                "function": None,
-                "material": None
-               } 
-    else:
-        card_dict = cards_dict[card_name]
-    return card_dict
+    return dict(catalog.card_dicts[card_name])
 
 def get_function_of_card(card_name):
     """ Return function string for the specified card. """
-    card_dict = get_card_dict(card_name)
-    function = card_dict['function']
-    return str(function) if function else function
+    return catalog.text_of_name[card_name]
 
 def get_material_of_card(card_name):
     """ Return material string for the specified card. """
-    card_dict = get_card_dict(card_name)
-    material = card_dict['material']
-    return str(material) if material else material
+    return catalog.material_of_name[card_name]
 
 def get_count_of_card(card_name):
     """ Return card count for the specified card. """
-    card_dict = get_card_dict(card_name)
-    count = card_dict['card_count']
-    count =  int(count)
-    return count
+    return int(catalog.card_dicts[card_name]['card_count'])
 
 def get_materials():
-    materials = [
-      'Brick',
-      'Concrete',
-      'Marble',
-      'Rubble',
-      'Stone',
-      'Wood'
-    ]
-    return materials
+    return list(catalog.MATERIALS)
 
 def get_role_of_material(material):
-    if material == 'Brick':
-        return 'Legionary'
-    elif material == 'Concrete':
-        return 'Architect'
-    elif material == 'Marble':
-        return 'Patron'
-    elif material == 'Rubble':
-        return 'Laborer'
-    elif material == 'Stone':
-        return 'Merchant'
-    elif material == 'Wood':
-        return 'Craftsman'
-    elif material is None:
+    if material is None:
         return None
-    else:
+    try:
+        return catalog.ROLE_OF_MATERIAL[material]
+    except KeyError:
         logging.error('----> Role of {0} not found!'.format(material))
 
 def get_role_of_card(card_name):
-    material = get_material_of_card(card_name)
-    role = get_role_of_material(material)
-    return role
+    return catalog.role_of_name[card_name]
 
 def get_value_of_material(material):
-    if material == 'Brick':
-        return 2
-    elif material == 'Concrete':
-        return 2
-    elif material == 'Marble':
-        return 3
-    elif material == 'Rubble':
-        return 1
-    elif material == 'Stone':
-        return 3
-    elif material == 'Wood':
-        return 1
-    elif material is None:
+    if material is None:
         return None
-    else:
+    try:
+        return catalog.VALUE_OF_MATERIAL[material]
+    except KeyError:
         logging.error('----> Value of {0} not found!'.format(material))
 
 def get_value_of_card(card_name):
-    material = get_material_of_card(card_name)
-    value = get_value_of_material(material)
-    return value
+    return catalog.value_of_name[card_name]
 
 def get_all_roles():
     """ Returns a list of all 6 possible roles. """
-    return ['Patron', 'Laborer', 'Architect',
-            'Craftsman', 'Legionary', 'Merchant']
+    return list(catalog.ROLES)
 
 def get_all_materials():
     """ Returns a list of all possible materials """
-    foundations = [
-      'Brick',
-      'Concrete',
-      'Marble',
-      'Rubble',
-      'Stone',
-      'Wood',
-    ]
-    return foundations
+    return list(catalog.MATERIALS)
 
 def cmp_jacks_first(c1, c2):
     """ Comparator that alphabetizes cards, but puts Jacks before all
@@ -250,10 +181,15 @@ class Card(object):
     Comparisons between cards using the operators (==, <, etc.) compare
     names alphabetically except that Jacks are always first.
 
+    Cards are interned: there is exactly one Card instance per ident, so
+    Card(12) is Card(12). The instances are immutable, and copying or
+    unpickling a card returns the same canonical instance.
+
     Members:
     ident -- unique id number, different for all cards. Negative values
              are for anonymouse cards named 'Card', eg. for your opponent's
-             hand. Card with idents too large are set to -1.
+             hand, and all give the same card, Card(-1). Card idents too
+             large raise a TypeError.
 
     Attributes (read-only):
     name -- name of foundation, or 'Jack'
@@ -263,28 +199,65 @@ class Card(object):
     text -- rules text of the card. Empty string for Jacks.
     """
 
-    def __init__(self, ident):
+    __slots__ = ('ident',)
+
+    def __new__(cls, ident):
+        try:
+            if type(ident) is int:
+                return _interned_cards[ident]
+        except KeyError:
+            pass
+
         if type(ident) is not int:
             raise TypeError(
                     'Card.ident must be an integer, received \'{0!s}\''
                     .format(ident))
-        self.ident = ident
-        if self.ident >= len(standard_deck()):
+        if ident >= len(catalog.deck):
             raise TypeError('Card.ident out of range: {0}'.format(ident))
 
+        if ident < -1:
+            # All anonymous cards are the same. Clients send card idents,
+            # so interning each negative one would let them grow the
+            # table without limit.
+            return _interned_cards[-1]
+
+        card = object.__new__(cls)
+        object.__setattr__(card, 'ident', ident)
+        _interned_cards[ident] = card
+        return card
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Card objects are immutable.')
+
+    def __reduce__(self):
+        return (Card, (self.ident,))
+
+    def __setstate__(self, state):
+        # Backups written before cards were interned pickled each card
+        # with its __dict__, {'ident': n}, so unpickling one makes a new
+        # instance. Give it its ident so it still works as that card;
+        # backup.load_pickle() replaces it with the interned one.
+        object.__setattr__(self, 'ident', state['ident'])
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
     def get_name(self):
-        if self.ident < 0: return 'Card'
-        else: return standard_deck()[self.ident]
+        return catalog.names[self.ident if self.ident >= 0 else -1]
 
-    name = property(lambda self: standard_deck()[self.ident])
-    material = property(lambda self: get_material_of_card(self.name))
-    value = property(lambda self: get_value_of_card(self.name))
-    role = property(lambda self: get_role_of_card(self.name))
-    text = property(lambda self: get_function_of_card(self.name))
+    # The catalog tables end with the anonymous card, so ident -1
+    # indexes the 'Card' entry.
+    name = property(lambda self: catalog.names[self.ident])
+    material = property(lambda self: catalog.materials[self.ident])
+    value = property(lambda self: catalog.values[self.ident])
+    role = property(lambda self: catalog.roles[self.ident])
+    text = property(lambda self: catalog.texts[self.ident])
 
     def __repr__(self):
-        rep = ('Card({ident!r})')
-        return rep.format(**self.__dict__)
+        return 'Card({0!r})'.format(self.ident)
 
     def __str__(self):
         return self.name
@@ -318,3 +291,21 @@ class Card(object):
 
     def same_name(self, other):
         return self.name == other.name
+
+
+# One canonical Card per ident. Build them all up front so the fast
+# path in Card.__new__ is a single dict lookup.
+_interned_cards = {}
+for _ident in range(-1, len(catalog.deck)):
+    Card(_ident)
+del _ident
+
+_orders_cards = tuple(Card(i) for i in range(catalog.N_JACKS, len(catalog.deck)))
+
+_cards_of_name = dict(
+        (name, tuple(Card(i) for i in xrange(start, stop)))
+        for name, (start, stop) in catalog.ident_ranges.items())
+
+_cards_of_material = dict(
+        (m, tuple(Card(i) for i in idents))
+        for m, idents in catalog.idents_of_material.items())
@@ -0,0 +1,160 @@
+"""Immutable, ident-indexed tables of card properties.
+
+The card definitions in GTR_cards.json are read exactly once, when this
+module is imported. Every card property is then a tuple lookup by
+Card.ident:
+
+    catalog.names[12]      # 'Atrium'
+    catalog.materials[12]  # 'Brick'
+
+Each table has one extra entry at the end for the anonymous card
+(ident -1), so that table[-1] describes the card named 'Card' that
+stands in for hidden cards, eg. an opponent's hand.
+"""
+
+import json
+from os import path
+
+ANONYMOUS_NAME = 'Card'
+JACK_NAME = 'Jack'
+N_JACKS = 6
+
+MATERIALS = ('Brick', 'Concrete', 'Marble', 'Rubble', 'Stone', 'Wood')
+
+ROLES = ('Patron', 'Laborer', 'Architect',
+         'Craftsman', 'Legionary', 'Merchant')
+
+# Small-int codes for materials and roles, used to index per-material
+# counters. NO_CODE is the code of a card with no material or role.
+MATERIAL_CODES = dict((m, i) for i, m in enumerate(MATERIALS))
+ROLE_CODES = dict((r, i) for i, r in enumerate(ROLES))
+NO_CODE = -1
+
+ROLE_OF_MATERIAL = {
+    'Brick'    : 'Legionary',
+    'Concrete' : 'Architect',
+    'Marble'   : 'Patron',
+    'Rubble'   : 'Laborer',
+    'Stone'    : 'Merchant',
+    'Wood'     : 'Craftsman',
+    }
+
+VALUE_OF_MATERIAL = {
+    'Brick'    : 2,
+    'Concrete' : 2,
+    'Marble'   : 3,
+    'Rubble'   : 1,
+    'Stone'    : 3,
+    'Wood'     : 1,
+    }
+
+
+def read_cards_json():
+    """Return the dict of data for ALL cards from the json file.
+
+    The json file lives in the GTR directory, with this module.
+    """
+    gtr_dir = path.dirname(__file__)
+    with open(path.join(gtr_dir, 'GTR_cards.json'), 'r') as json_file:
+        return json.load(json_file)
+
+
+class CardCatalog(object):
+    """Lookup tables for every card in the standard deck.
+
+    The deck is six Jacks followed by the Orders cards in alphabetical
+    order. The tables are tuples indexed by ident with len(deck)+1 entries,
+    the last one being the anonymous card.
+
+    Attributes:
+        deck -- tuple of card names, Jacks first.
+        names, materials, roles, values, texts -- per-ident tuples of
+            the card properties. Jacks and the anonymous card have None
+            for material, role, value and text.
+        material_codes, role_codes -- per-ident tuples of the material
+            and role codes, NO_CODE for Jacks and the anonymous card.
+        card_dicts -- dict of card name to the raw data dict from the
+            json file, with entries for 'Jack' and 'Card' as well.
+        material_of_name, role_of_name, value_of_name, text_of_name --
+            dicts of card name to the card properties.
+        ident_ranges -- dict of card name to the (start, stop) idents of
+            the copies of that card, which are contiguous in the deck.
+        idents_of_material, idents_of_role -- dicts of material or role
+            to the tuple of Orders card idents with that property.
+    """
+
+    def __init__(self, cards_dict):
+        orders = []
+        card_dicts = {}
+        for name, card_dict in cards_dict.items():
+            name = str(name)
+            orders.extend([name]*int(card_dict['card_count']))
+            card_dicts[name] = card_dict
+
+        orders.sort(key=lambda x:x.lower())
+        self.deck = tuple([JACK_NAME]*N_JACKS + orders)
+
+        no_card = {'card_count': '0', 'function': None, 'material': None}
+        card_dicts[JACK_NAME] = no_card
+        card_dicts[ANONYMOUS_NAME] = no_card
+        self.card_dicts = card_dicts
+
+        self.names = self.deck + (ANONYMOUS_NAME,)
+
+        materials, texts = [], []
+        for name in self.names:
+            material = card_dicts[name]['material']
+            function = card_dicts[name]['function']
+            materials.append(str(material) if material else material)
+            texts.append(str(function) if function else function)
+
+        self.materials = tuple(materials)
+        self.texts = tuple(texts)
+        self.roles = tuple(ROLE_OF_MATERIAL.get(m) for m in self.materials)
+        self.values = tuple(VALUE_OF_MATERIAL.get(m) for m in self.materials)
+        self.material_codes = tuple(
+                MATERIAL_CODES.get(m, NO_CODE) for m in self.materials)
+        self.role_codes = tuple(
+                ROLE_CODES.get(r, NO_CODE) for r in self.roles)
+
+        # The same properties keyed by card name.
+        self.material_of_name = dict(zip(self.names, self.materials))
+        self.role_of_name = dict(zip(self.names, self.roles))
+        self.value_of_name = dict(zip(self.names, self.values))
+        self.text_of_name = dict(zip(self.names, self.texts))
+
+        # Copies of a card are adjacent since the deck is sorted by name.
+        ident_ranges = {}
+        for ident, name in enumerate(self.deck):
+            start, stop = ident_ranges.get(name, (ident, ident))
+            ident_ranges[name] = (start, ident+1)
+        self.ident_ranges = ident_ranges
+
+        idents_of_material = dict((m, []) for m in MATERIALS)
+        for ident in range(N_JACKS, len(self.deck)):
+            idents_of_material[self.materials[ident]].append(ident)
+
+        self.idents_of_material = dict(
+                (m, tuple(l)) for m, l in idents_of_material.items())
+        self.idents_of_role = dict(
+                (ROLE_OF_MATERIAL[m], l) for m, l in self.idents_of_material.items())
+
+
+_catalog = CardCatalog(read_cards_json())
+
+deck = _catalog.deck
+names = _catalog.names
+materials = _catalog.materials
+roles = _catalog.roles
+values = _catalog.values
+texts = _catalog.texts
+material_codes = _catalog.material_codes
+role_codes = _catalog.role_codes
+card_dicts = _catalog.card_dicts
+material_of_name = _catalog.material_of_name
+role_of_name = _catalog.role_of_name
+value_of_name = _catalog.value_of_name
+text_of_name = _catalog.text_of_name
+ident_ranges = _catalog.ident_ranges
+idents_of_material = _catalog.idents_of_material
+idents_of_role = _catalog.idents_of_role
@@ -0,0 +1,150 @@
+"""Patches between the game states sent to a player, so the server can
+send only what changed since the last one.
+
+A game state is flattened into leaves keyed by their path in the
+GAMESTATE JSON, eg. ('turn_number',) or ('players', 0, 'hand', 'cards').
+Each leaf is kept as JSON text, and each list, including the cards of a
+zone and the frames of the stack, as a tuple with the JSON text of its
+items. make_patch() compares the leaves of two states. A list that
+changed is spliced, so a new log line or a card drawn from the library
+costs only the items that changed. Any other leaf that changed is set
+to its new value.
+
+The patch is a JSON object:
+
+    {"from": 3, "game_id": 0, "to": 5,
+     "set": [[path, value], ...],
+     "splice": [[path, start, n_deleted, [item, ...]], ...]}
+
+apply_patch() applies it to a state decoded from a GAMESTATE, as the
+clients do.
+"""
+
+import json
+
+from cloaca.card import Card
+from cloaca.zone import Zone
+from cloaca.stack import Stack
+
+
+def json_default(o):
+    """Represent objects for the GAMESTATE JSON, eg. Card(20)
+    becomes {'ident': 20}, a Zone becomes {'cards': [...], 'name': <name>}
+    and other objects become their __dict__, leaving out any attributes
+    listed in the class's _json_exclude tuple.
+    """
+    if isinstance(o, Card):
+        return {'ident': o.ident}
+    elif isinstance(o, Zone):
+        return {'cards': o.cards, 'name': o.name}
+    else:
+        exclude = getattr(o, '_json_exclude', ())
+        if exclude:
+            return dict((k, v) for k, v in o.__dict__.items()
+                    if k not in exclude)
+        return o.__dict__
+
+
+def _to_json(o):
+    if type(o) is Card:
+        return '{{"ident": {0:d}}}'.format(o.ident)
+    return json.dumps(o, sort_keys=True, default=json_default)
+
+
+def _add_leaf(leaves, path, value):
+    if isinstance(value, Zone):
+        path += ('cards',)
+        value = value.cards
+    elif isinstance(value, Stack):
+        path += ('stack',)
+        value = value.stack
+
+    if isinstance(value, list):
+        leaves[path] = tuple(_to_json(o) for o in value)
+    else:
+        leaves[path] = _to_json(value)
+
+
+def flatten(game):
+    """Return the leaves of the GAMESTATE JSON of the game by path. The
+    version is left out, since every patch changes it.
+    """
+    leaves = {}
+    for k, v in json_default(game).iteritems():
+        if k == 'version':
+            continue
+        elif k == 'players':
+            for i, p in enumerate(v):
+                for pk, pv in json_default(p).iteritems():
+                    _add_leaf(leaves, ('players', i, pk), pv)
+        else:
+            _add_leaf(leaves, (k,), v)
+
+    return leaves
+
+
+def _splice(old, new):
+    """Return (start, n_deleted, items) to turn the list old into new."""
+    n = min(len(old), len(new))
+    start = 0
+    while start < n and old[start] == new[start]:
+        start += 1
+
+    end = 0
+    while end < n - start and old[-1-end] == new[-1-end]:
+        end += 1
+
+    return start, len(old) - start - end, new[start:len(new)-end]
+
+
+def make_patch(old, new, game_id, from_version, to_version):
+    """Return the JSON text of the patch from the leaves old to the leaves
+    new, or None if they're the same.
+    """
+    sets, splices = [], []
+    for path in sorted(new):
+        value, old_value = new[path], old.get(path)
+        if value == old_value:
+            continue
+
+        path_json = json.dumps(path)
+        if type(value) is tuple and type(old_value) is tuple:
+            start, n_deleted, items = _splice(old_value, value)
+            splices.append('[{0}, {1:d}, {2:d}, [{3}]]'.format(
+                    path_json, start, n_deleted, ', '.join(items)))
+        elif type(value) is tuple:
+            sets.append('[{0}, [{1}]]'.format(path_json, ', '.join(value)))
+        else:
+            sets.append('[{0}, {1}]'.format(path_json, value))
+
+    if not sets and not splices:
+        return None
+
+    return ('{{"from": {0:d}, "game_id": {1}, "set": [{2}], '
+            '"splice": [{3}], "to": {4:d}}}').format(from_version,
+                json.dumps(game_id), ', '.join(sets), ', '.join(splices),
+                to_version)
+
+
+def apply_patch(state, patch):
+    """Apply the patch, decoded from JSON, to the state decoded from a
+    GAMESTATE. Return False, leaving the state unchanged, if the patch
+    doesn't start from the state's version.
+    """
+    if state.get('version') != patch['from']:
+        return False
+
+    for path, value in patch['set']:
+        obj = state
+        for k in path[:-1]:
+            obj = obj[k]
+        obj[path[-1]] = value
+
+    for path, start, n_deleted, items in patch['splice']:
+        obj = state
+        for k in path:
+            obj = obj[k]
+        obj[start:start+n_deleted] = items
+
+    state['version'] = patch['to']
+    return True
@@ -3,11 +3,12 @@
 import json
 import copy
 
-from cloaca.zone import Zone
+from cloaca.zone import Zone, Library
 from cloaca.building import Building
 from cloaca.game import Game
 from cloaca.card import Card
 from cloaca.player import Player
+from cloaca.stack import Stack, Frame
 
 class GTREncodingError(Exception):
     pass
@@ -23,7 +24,9 @@ def encode(obj):
         Zone --> Zone.cards
         Building --> __dict__
         Player --> __dict__
-        Game --> __dict__ (except that stack and _current_frame are deleted)
+        Stack --> list of frames
+        Frame --> [opcode, player index, arg]
+        Game --> __dict__ (except that the card location table is deleted)
 
     Other objects are untouched
     """
@@ -39,6 +42,12 @@ def encode(obj):
     elif isinstance(obj, Player):
         return encode(obj.__dict__)
 
+    elif isinstance(obj, Stack):
+        return [f.to_list() for f in obj.stack]
+
+    elif isinstance(obj, Frame):
+        return obj.to_list()
+
     elif isinstance(obj, list):
         return [encode(el) for el in obj]
 
@@ -47,8 +56,7 @@ def encode(obj):
 
     elif isinstance(obj, Game):
         d = dict(obj.__dict__)
-        del d['stack']
-        del d['_current_frame']
+        del d['_locations']
 
         return encode(d)
 
@@ -72,14 +80,20 @@ def decode_game(obj):
     game_dict['players'] = [decode_player(p) for p in players]
 
     game_dict['jacks'] = decode_zone(jacks, 'jacks')
-    game_dict['library'] = decode_zone(library, 'library')
+    game_dict['library'] = Library([Card(c) for c in library])
     game_dict['pool'] = decode_zone(pool, 'pool')
 
+    game_dict['stack'] = Stack([Frame.from_list(f) for f in obj.get('stack', [])])
+    frame = obj.get('_current_frame')
+    game_dict['_current_frame'] = Frame.from_list(frame) if frame is not None else None
+
     g = Game()
 
     for k, v in game_dict.items():
         setattr(g, k, v)
 
+    g._reset_card_locations()
+
     return g
 
 
@@ -0,0 +1,70 @@
+"""Deadlines for keys, ordered in a heap so the next one to expire is
+found without looking at the others.
+"""
+
+import heapq
+
+
+class ExpiryIndex(object):
+    """Map keys to deadlines and pop the keys whose deadlines have passed.
+
+    Setting or discarding a key's deadline doesn't search the heap for
+    its old entry. The new deadline is pushed and the old entry is
+    skipped when it reaches the top, so each change costs O(log n). The
+    heap is rebuilt when more than half of it is out of date, which is
+    O(1) per change amortized.
+    """
+
+    def __init__(self):
+        self._deadlines = {}
+        self._heap = []
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def __contains__(self, key):
+        return key in self._deadlines
+
+    def get(self, key):
+        """Return the deadline of the key, or None."""
+        return self._deadlines.get(key)
+
+    def set(self, key, deadline):
+        """Set the deadline of the key, replacing any it had."""
+        self._deadlines[key] = deadline
+        heapq.heappush(self._heap, (deadline, key))
+        if len(self._heap) > 2*len(self._deadlines) + 16:
+            self._rebuild()
+
+    def discard(self, key):
+        """Remove the key's deadline, if it has one."""
+        self._deadlines.pop(key, None)
+
+    def next_deadline(self):
+        """Return the earliest deadline, or None if there are none."""
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_expired(self, now):
+        """Remove and return the keys whose deadlines are at or before
+        now, earliest first.
+        """
+        expired = []
+        heap = self._heap
+        while True:
+            self._drop_stale()
+            if not heap or heap[0][0] > now:
+                return expired
+
+            _, key = heapq.heappop(heap)
+            del self._deadlines[key]
+            expired.append(key)
+
+    def _drop_stale(self):
+        heap, deadlines = self._heap, self._deadlines
+        while heap and deadlines.get(heap[0][1]) != heap[0][0]:
+            heapq.heappop(heap)
+
+    def _rebuild(self):
+        self._heap = [(d, k) for k, d in self._deadlines.iteritems()]
+        heapq.heapify(self._heap)
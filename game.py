@@ -2,13 +2,17 @@ from cloaca.player import Player
 import cloaca.gtrutils as gtrutils
 from cloaca.building import Building
 from cloaca.card import Card
-from cloaca.zone import Zone
+from cloaca.zone import Zone, Library
 from cloaca.error import GTRError, GameOver
 import cloaca.stack as stack
 import cloaca.card_manager as cm
+import cloaca.location as location
+import cloaca.catalog as catalog
+from cloaca.slots import SlotsObject
 
+import itertools
 import random
-import copy
+import timeit
 from collections import Counter
 import logging
 import message
@@ -17,7 +21,87 @@ from datetime import datetime
 lg = logging.getLogger(__name__)
 lg.addHandler(logging.NullHandler())
 
-class Game(object):
+# Calls to each action handler and their total time in seconds, as
+# [calls, seconds] lists keyed by action type. Only recorded while
+# Game.profile_handlers is True.
+_handler_stats = {}
+
+def _record_handler(action, seconds):
+    stats = _handler_stats.get(action)
+    if stats is None:
+        stats = _handler_stats[action] = [0, 0.0]
+    stats[0] += 1
+    stats[1] += seconds
+
+def handler_stats():
+    """Return a dict of the calls to each action handler since the last
+    reset_handler_stats(), eg. {'thinkertype': {'calls': 10, 'time': 0.002}},
+    with the total time in seconds. Nothing is recorded unless
+    Game.profile_handlers is True.
+    """
+    names = message.action_names()
+    return dict((names[k], {'calls': n, 'time': t})
+            for k, (n, t) in _handler_stats.items())
+
+def reset_handler_stats():
+    _handler_stats.clear()
+
+def _site_counts(sites):
+    """Return a list of the number of sites of each material, indexed by
+    catalog.MATERIAL_CODES, from a list of material names.
+    """
+    counts = [0]*len(catalog.MATERIALS)
+    for site in sites:
+        counts[catalog.MATERIAL_CODES[site]] += 1
+    return counts
+
+def _site_list(counts):
+    """Inverse of _site_counts(). The sites are in order of material."""
+    sites = []
+    for material, n in zip(catalog.MATERIALS, counts):
+        sites.extend([material]*n)
+    return sites
+
+def _group_by_name(cards):
+    """Return lists of the cards with the same name, in order of the
+    first card of each name.
+    """
+    groups = {}
+    order = []
+    for c in cards:
+        group = groups.get(c.name)
+        if group is None:
+            group = groups[c.name] = []
+            order.append(group)
+        group.append(c)
+    return order
+
+def _choices(groups, k):
+    """Yield every way to choose k cards from the lists made by
+    _group_by_name(), as tuples. Cards with the same name are
+    interchangeable, so only the first n cards of a list are used.
+    """
+    if k == 0:
+        yield ()
+        return
+    if not groups:
+        return
+    first, rest = groups[0], groups[1:]
+    for n in range(min(k, len(first)), -1, -1):
+        head = tuple(first[:n])
+        for tail in _choices(rest, k-n):
+            yield head + tail
+
+def _subsets(groups):
+    """Yield every choice of any number of cards from groups, as tuples.
+    Only the first n cards of each list are used, as in _choices().
+    """
+    prefixes = [[tuple(g[:n]) for n in range(len(g)+1)] for g in groups]
+    for cards in itertools.product(*prefixes):
+        yield sum(cards, ())
+
+
+class Game(SlotsObject):
     """Controls the operation of a single game.
 
     The game_state attribute stores all the information about an ongoing game
@@ -40,6 +124,38 @@ class Game(object):
     """
     _initial_jack_count = 6
 
+    # Internal tables left out of the GAMESTATE sent to clients.
+    _json_exclude = ('_locations',)
+
+    # Set to True to check the index of active buildings against
+    # _active_buildings() on every query, eg. in tests.
+    debug_active_buildings = False
+
+    # Set to True to count the calls to each action handler in handle()
+    # and their total time. See handler_stats().
+    profile_handlers = False
+
+    __slots__ = ('game_id', 'players', 'leader_index', 'turn_number',
+            'role_led', 'active_player_index', 'jacks', 'library', 'pool',
+            '_in_town_counts', '_out_of_town_counts', 'oot_allowed',
+            'used_oot', 'stack', 'legionary_count', 'legionary_player_index',
+            'expected_action', 'host', 'winners', '_current_frame',
+            'game_log', '_locations', 'check_invariants', '_active_index',
+            '_running', '_pump_requested', 'frames_executed',
+            'last_action_frames', 'headless', 'auto_resolve',
+            'concurrent_follow', 'follow_decisions', 'premoves', 'version',
+            '__weakref__')
+
+    # The sites are stored as counts by material, but the state has the
+    # list of material names, as before.
+    _fields = ('game_id', 'players', 'leader_index', 'turn_number',
+            'role_led', 'active_player_index', 'jacks', 'library', 'pool',
+            'in_town_sites', 'out_of_town_sites', 'oot_allowed',
+            'used_oot', 'stack', 'legionary_count', 'legionary_player_index',
+            'expected_action', 'host', 'winners', '_current_frame',
+            'game_log', '_locations', 'auto_resolve', 'concurrent_follow',
+            'follow_decisions', 'premoves', 'version')
+
     leader = property(lambda self : self.players[self.leader_index])
     started = property(lambda self : self.turn_number > 0)
     finished = property(lambda self : self.winners is not None)
@@ -52,7 +168,7 @@ class Game(object):
         self.role_led = None
         self.active_player_index = None
         self.jacks = Zone(name='jacks')
-        self.library = Zone(name='library')
+        self.library = Library()
         self.pool = Zone(name='pool')
         self.in_town_sites = []
         self.out_of_town_sites = []
@@ -68,8 +184,115 @@ class Game(object):
         # Keep track of currently-executing stack frame.
         self._current_frame = None
 
+        # State of the run loop, see _pump().
+        self._running = False
+        self._pump_requested = False
+        self.frames_executed = 0
+        self.last_action_frames = 0
+
         self.game_log = []
 
+        # Headless games are for simulations. They skip the game log
+        # and debug logging that only matter to people watching.
+        self.headless = False
+
+        # Names of the buildings active for each player, rebuilt after
+        # any player's buildings change.
+        self._active_index = None
+
+        # Location of every card, updated by the zones as cards move.
+        self._locations = None
+        self._reset_card_locations()
+
+        # Set to True to check that every card is in exactly one place
+        # after each action, eg. for debugging or soak tests.
+        self.check_invariants = False
+
+        # Set to True to handle the actions that have only one legal
+        # choice without waiting for the player. See _resolve_forced().
+        self.auto_resolve = False
+
+        # Set to True to let all followers send FOLLOWROLE as soon as the
+        # role is led. See waiting_for().
+        self.concurrent_follow = False
+
+        # FOLLOWROLE args sent early with concurrent_follow, indexed by
+        # player, as [n_actions, card idents...], or None. An empty list
+        # is a decision hidden by privatized_game_state_copy().
+        self.follow_decisions = None
+
+        # Actions queued by each player to be handled when the game gets
+        # to them, indexed by player, or None. See queue_premove().
+        self.premoves = None
+
+        # Increased by the server every time the game changes, so clients
+        # can tell which state a GAMESTATEPATCH applies to.
+        self.version = 0
+
+    def __setstate__(self, state):
+        # Games saved before these settings existed don't have them.
+        self.auto_resolve = False
+        self.concurrent_follow = False
+        self.follow_decisions = None
+        self.premoves = None
+        self.version = 0
+        SlotsObject.__setstate__(self, state)
+        self.check_invariants = False
+        self.headless = False
+        self._active_index = None
+        self._running = False
+        self._pump_requested = False
+        self.frames_executed = 0
+        self.last_action_frames = 0
+        for p in self.players:
+            p.on_buildings_change = self._buildings_changed
+        if not isinstance(self.library, Library):
+            self.library = Library(self.library.cards)
+        if '_locations' not in state:
+            self._reset_card_locations()
+        if self.premoves is not None:
+            # Games saved when add_player() didn't add a queue.
+            self.premoves.extend([] for _ in
+                    range(len(self.players) - len(self.premoves)))
+        self._convert_old_frames()
+
+    def _convert_old_frames(self):
+        """Replace the Player objects in frames pickled by older versions
+        with their indices. See Frame.__setstate__().
+        """
+        frames = list(self.stack.stack)
+        if self._current_frame is not None:
+            frames.append(self._current_frame)
+        for frame in frames:
+            if isinstance(frame.player, Player):
+                frame.player = next(i for i, p in enumerate(self.players)
+                        if p is frame.player)
+
+    @property
+    def in_town_sites(self):
+        """List of the in-town sites left, eg. ['Brick', 'Brick', ...]."""
+        return _site_list(self._in_town_counts)
+
+    @in_town_sites.setter
+    def in_town_sites(self, sites):
+        self._in_town_counts = _site_counts(sites)
+
+    @property
+    def out_of_town_sites(self):
+        """List of the out-of-town sites left."""
+        return _site_list(self._out_of_town_counts)
+
+    @out_of_town_sites.setter
+    def out_of_town_sites(self, sites):
+        self._out_of_town_counts = _site_counts(sites)
+
+    def _n_sites(self, site, out_of_town=False):
+        """Return the number of sites of the material left in town or
+        out of town.
+        """
+        counts = self._out_of_town_counts if out_of_town else self._in_town_counts
+        return counts[catalog.MATERIAL_CODES[site]]
+
     @property
     def active_player(self):
         return self.players[self.active_player_index]
@@ -92,15 +315,14 @@ class Game(object):
 
         self._init_common_piles(len(self.players))
         self._init_player_hands()
-        self.stack.push_frame('_take_turn_stacked', self.active_player)
+        self._push_frame(stack.TAKE_TURN_STACKED, self.active_player)
         self.turn_number = 1
 
         self._log('Starting game.')
-        self._log('Turn {0}: {1}'
-            .format(self.turn_number,
-                    self.leader.name))
+        self._log('Turn {0}: {1}', self.turn_number, self.leader.name)
 
         self._pump()
+        self._handle_queued()
 
     def controlled_start(self):
         """Start the game with modified, deterministic rules.
@@ -120,16 +342,16 @@ class Game(object):
 
         self.jacks = Zone([Card(i) for i in range(Game._initial_jack_count)])
         self._init_sites(len(self.players))
+        self._reset_card_locations()
 
-        self.stack.push_frame('_take_turn_stacked', self.active_player)
+        self._push_frame(stack.TAKE_TURN_STACKED, self.active_player)
         self.turn_number = 1
 
         self._log('Starting game.')
-        self._log('Turn {0}: {1}'
-            .format(self.turn_number,
-                    self.leader.name))
+        self._log('Turn {0}: {1}', self.turn_number, self.leader.name)
 
         self._pump()
+        self._handle_queued()
 
     def add_player(self, uid, name):
         """Adds a player to the game. Raises GTRError if game is started,
@@ -147,34 +369,361 @@ class Game(object):
             raise GTRError('Maximum players reached for this game {0}/{0}'
                     .format(n))
 
-        lg.debug('Adding player {0}.'.format(name))
+        lg.debug('Adding player %s.', name)
 
         self.players.append(Player(uid, name))
-        self._log('{0} has joined the game.'.format(name))
+        self._track_player(n, self.players[n])
+        if self.premoves is not None:
+            # Players can queue premoves before the game starts.
+            self.premoves.append([])
+        self._log('{0} has joined the game.', name)
 
-    def handle(self, a):
+    def handle(self, a, player=None):
         """ Switchyard to handle game actions.
+
+        The player sending the action is the active player, unless
+        another player is given. With concurrent_follow, this can be
+        a follower sending FOLLOWROLE before their turn to decide.
         """
-        lg.debug('Handling action: ' + repr(a))
+        if not self.headless:
+            lg.debug('Handling action: %r', a)
+        if player is not None and player is not self.active_player:
+            self._handle_early_follow(player, a)
+            return
         if a.action != self.expected_action:
             raise GTRError('Expected GameAction type: ' + str(self.expected_action)
                 + ', got: ' + repr(a))
 
-        method_name = '_handle_' + str(a)
-
         try:
-            method = getattr(self, method_name)
-        except AttributeError:
+            method = _action_functions[a.action]
+        except KeyError:
             raise GTRError('Unhandled GameAction type: ' + str(a.action))
         else:
             # TODO: We should catch this in GTRServer where it calls this.
             # The server class can decide what to do with illegal actions.
+            n_frames = self.frames_executed
+            profile = Game.profile_handlers
+            if profile:
+                start = timeit.default_timer()
             try:
-                method(a)
+                try:
+                    method(self, a)
+                except GTRError as e:
+                    lg.debug('Error handling action: '+e.message)
+                    raise
+
+                # The action was accepted. Errors from the queued actions
+                # after it aren't the player's, so they're handled there.
+                self._handle_queued()
+            finally:
+                self.last_action_frames = self.frames_executed - n_frames
+                if profile:
+                    _record_handler(a.action, timeit.default_timer() - start)
+
+            if self.check_invariants:
+                self.check_card_locations()
+
+    def legal_actions(self, player):
+        """Generate the GameAction objects that player can make now.
+
+        Nothing is generated unless the game is waiting for an action
+        from player. Cards with the same name are interchangeable, so
+        only one of them is used for each choice, eg. leading Laborer
+        with a hand of two Road cards gives one action, not two.
+
+        Every action generated is accepted by handle(). Some handlers
+        accept more than the rules allow, eg. Architect from the pool
+        without an Archway; only the actions the rules allow are
+        generated.
+        """
+        if self.finished:
+            return
+        elif player is self.active_player:
+            action = self.expected_action
+        elif player in self._early_followers():
+            action = message.FOLLOWROLE
+        else:
+            return
+
+        legal = _legal_functions.get(action)
+        if legal is None:
+            return
+
+        for args in legal(self, player):
+            yield message.GameAction.trusted(action, *args)
+
+    def waiting_for(self):
+        """Return the players who can send an action now: the active
+        player, and with concurrent_follow, the followers who haven't
+        decided whether to follow the role that was led.
+        """
+        if self.finished:
+            return []
+        return [self.active_player] + self._early_followers()
+
+    def queue_premove(self, player, a, role=None, keep=False):
+        """Queue the GameAction a to be handled for player when the game
+        expects it from them, eg. FOLLOWROLE with a Dock if Laborer is
+        led, or USEFOUNTAIN whenever the Fountain can be used.
+
+        If role is given, the premove is only used after that role has
+        been led in the turn. The premove is used once and dropped at the
+        end of the turn, unless keep is True, in which case it's used
+        every time it matches until clear_premoves() is called. A premove
+        that fails the checks in handle() when its time comes is dropped.
+
+        If the game is waiting for the action now, it's handled right
+        away and any GTRError is raised. Return True if the action was
+        handled, False if it was queued.
+        """
+        if self.finished:
+            raise GTRError('Game has finished.')
+
+        if player not in self.players:
+            raise GTRError('Player {0} is not in the game.'.format(player.name))
+
+        if a.action not in _action_functions:
+            raise GTRError('Not a game action: {0!r}'.format(a))
+
+        if role is not None and role not in cm.get_all_roles():
+            raise GTRError('Illegal role: {0}'.format(role))
+
+        premove = {
+                'action': a.action,
+                'args': [c.ident if isinstance(c, Card) else c for c in a.args],
+                'role': role,
+                'turn': None if keep else self.turn_number,
+                }
+
+        handled = self.started and player in self.waiting_for() and \
+                self._premove_matches(player, premove)
+        if handled:
+            self.handle(a, player)
+            if not keep or self.finished:
+                return True
+
+        if self.premoves is None:
+            self.premoves = [[] for _ in self.players]
+        self.premoves[self.players.index(player)].append(premove)
+
+        if not self.headless:
+            lg.debug('%s queued premove: %r', player.name, premove)
+
+        if handled:
+            self._handle_queued()
+        return handled
+
+    def clear_premoves(self, player):
+        """Drop all the premoves queued by player."""
+        if self.premoves is not None:
+            self.premoves[self.players.index(player)] = []
+            if not any(self.premoves):
+                self.premoves = None
+
+    def _early_followers(self):
+        """Return the players, other than the active player, who are yet
+        to follow or think in this turn and haven't sent FOLLOWROLE early.
+        This is empty unless concurrent_follow is set and a role has been
+        led.
+        """
+        if not self.concurrent_follow or \
+                self.expected_action == message.LEADROLE:
+            return []
+
+        decisions = self.follow_decisions
+        i_active = self.active_player_index
+        followers = []
+        for f in self.stack.stack:
+            if f.opcode == stack.AWAIT_ACTION and \
+                    f.arg == message.FOLLOWROLE and f.player != i_active and \
+                    (decisions is None or decisions[f.player] is None):
+                followers.append(self.players[f.player])
+
+        # The stack is in reverse turn order.
+        return followers[::-1]
+
+    def _handle_early_follow(self, player, a):
+        """Check and keep a FOLLOWROLE action sent by player before their
+        turn to decide. It's applied by _await_action() in turn order, so
+        the game goes on as if the followers had decided one by one.
+        """
+        if player not in self._early_followers():
+            raise GTRError('Not waiting for an action from {0}.'
+                    .format(player.name))
+
+        if a.action != message.FOLLOWROLE:
+            raise GTRError('Expected GameAction type: {0}, got: {1!r}'
+                    .format(message.FOLLOWROLE, a))
+
+        n_actions = a.args[0]
+        cards = a.args[1:]
+        self._check_follow(player, n_actions, cards)
+
+        if self.follow_decisions is None:
+            self.follow_decisions = [None]*len(self.players)
+        self.follow_decisions[self.players.index(player)] = \
+                [n_actions] + [c.ident for c in cards]
+
+        if not self.headless:
+            lg.debug('%s decided early: %r', player.name, a)
+
+    def _resolve_forced(self):
+        """Handle the actions that have only one legal choice, eg.
+        USESEWER with nothing in camp or GIVECARDS with no matching cards,
+        until the game waits for a real decision. This saves sending the
+        game state to the players and waiting for the only answer.
+        """
+        while not self.finished:
+            p = self.active_player
+            actions = list(itertools.islice(self.legal_actions(p), 2))
+            if len(actions) != 1:
+                return
+
+            a = actions[0]
+            if not self.headless:
+                lg.info('Auto-resolving %r for %s.', a, p.name)
+            try:
+                _action_functions[a.action](self, a)
             except GTRError as e:
-                lg.debug('Error handling action: '+e.message)
-                raise
+                # legal_actions() and the handler disagree. Leave the
+                # action to the player rather than failing theirs.
+                lg.warning('Failed to auto-resolve %r for %s: %s', a,
+                        p.name, e.message)
+                return
 
+    def _handle_queued(self):
+        """Handle the actions that don't need to wait for a player: the
+        forced actions with auto_resolve, and the premoves that match.
+        A GTRError from one of them is logged and the game waits for the
+        player instead, so it isn't raised to whoever sent the action
+        before them.
+        """
+        while not self.finished:
+            if self.auto_resolve:
+                self._resolve_forced()
+            if self.premoves is None or not self._apply_premove():
+                return
+
+    def _premove_matches(self, player, premove):
+        """Return True if the game is waiting for the premove from
+        player, who must be in waiting_for().
+        """
+        if premove['turn'] not in (None, self.turn_number):
+            return False
+
+        if player is self.active_player:
+            expected = self.expected_action
+        else:
+            expected = message.FOLLOWROLE
+
+        return premove['action'] == expected and \
+                premove['role'] in (None, self.role_led)
+
+    def _apply_premove(self):
+        """Handle the first matching premove of the active player, or
+        else of an early follower. A premove that's rejected is dropped.
+        Return False if no premove matched.
+        """
+        for p in self.waiting_for():
+            i = self.players.index(p)
+            for premove in self.premoves[i]:
+                if self._premove_matches(p, premove):
+                    break
+            else:
+                continue
+
+            if premove['turn'] is not None:
+                self._drop_premove(i, premove)
+
+            try:
+                a = message.GameAction(premove['action'], *premove['args'])
+                if not self.headless:
+                    lg.info('Handling premove %r for %s.', a, p.name)
+                if p is self.active_player:
+                    _action_functions[a.action](self, a)
+                else:
+                    self._handle_early_follow(p, a)
+            except GTRError as e:
+                lg.info('Dropped premove %r for %s: %s', premove, p.name,
+                        e.message)
+                if premove['turn'] is None:
+                    self._drop_premove(i, premove)
+
+            return True
+
+        return False
+
+    def _drop_premove(self, i, premove):
+        queue = self.premoves[i]
+        self.premoves[i] = [q for q in queue if q is not premove]
+        if not any(self.premoves):
+            self.premoves = None
+
+    def _drop_stale_premoves(self):
+        """Drop the premoves made for an earlier turn."""
+        self.premoves = [[q for q in queue if q['turn'] is None]
+                for queue in self.premoves]
+        if not any(self.premoves):
+            self.premoves = None
+
+    def clone(self):
+        """Return a copy of the game, eg. to privatize or to try out
+        actions on.
+
+        Unlike copy.deepcopy(), this knows which parts of the game are
+        never changed in place and shares them with the copy: the Card
+        objects, the stack frames, the game log entries and the premoves.
+        The lists and zones that hold them are copied. The copy keeps the
+        headless, check_invariants, auto_resolve and concurrent_follow
+        settings, but not the run loop counters.
+        """
+        g = Game.__new__(Game)
+        g.game_id = self.game_id
+        g.leader_index = self.leader_index
+        g.turn_number = self.turn_number
+        g.role_led = self.role_led
+        g.active_player_index = self.active_player_index
+        g._in_town_counts = self._in_town_counts[:]
+        g._out_of_town_counts = self._out_of_town_counts[:]
+        g.oot_allowed = self.oot_allowed
+        g.used_oot = self.used_oot
+        g.legionary_count = self.legionary_count
+        g.legionary_player_index = self.legionary_player_index
+        g.expected_action = self.expected_action
+        g.host = self.host
+        g.game_log = self.game_log[:]
+        g.stack = stack.Stack(self.stack.stack[:])
+        g._current_frame = self._current_frame
+
+        locations = g._locations = self._locations.copy()
+        g.jacks = self.jacks.clone(locations)
+        g.library = self.library.clone(locations)
+        g.pool = self.pool.clone(locations)
+
+        g.players = [p.clone(locations) for p in self.players]
+        for p in g.players:
+            p.on_buildings_change = g._buildings_changed
+
+        if self.winners is None:
+            g.winners = None
+        else:
+            g.winners = [g.players[self.players.index(p)] for p in self.winners]
+
+        g.check_invariants = self.check_invariants
+        g.headless = self.headless
+        g.auto_resolve = self.auto_resolve
+        g.concurrent_follow = self.concurrent_follow
+        g.follow_decisions = (None if self.follow_decisions is None
+                else self.follow_decisions[:])
+        g.premoves = (None if self.premoves is None
+                else [q[:] for q in self.premoves])
+        g.version = self.version
+        g._active_index = None
+        g._running = False
+        g._pump_requested = False
+        g.frames_executed = 0
+        g.last_action_frames = 0
+        return g
 
     def privatized_game_state_copy(self, player_name):
         """Change card names to 'Card' in order to represent a game
@@ -185,7 +734,7 @@ class Game(object):
 
         Return a new game state object
         """
-        gs = copy.deepcopy(self)
+        gs = self.clone()
 
         gs.library.set_content([Card(-1)]*len(gs.library))
 
@@ -198,6 +747,14 @@ class Game(object):
                 p.revealed.set_content([cm.get_card(c.name) for c in p.revealed])
                 p.prev_revealed.set_content([cm.get_card(c.name) for c in p.prev_revealed])
 
+        if gs.follow_decisions is not None:
+            gs.follow_decisions = [d if d is None or p.name == player_name
+                    else [] for p, d in zip(gs.players, gs.follow_decisions)]
+
+        if gs.premoves is not None:
+            gs.premoves = [q if p.name == player_name else []
+                    for p, q in zip(gs.players, gs.premoves)]
+
         return gs
 
     def find_player_index(self, player_name):
@@ -207,9 +764,102 @@ class Game(object):
                          if p.name==player_name]
         return players_match[0] if len(players_match) else None
 
+    def card_location(self, card):
+        """Return (kind, player) for the zone holding the card, where kind is
+        one of the zone kinds in the location module, eg. location.HAND,
+        and player is the Player who owns the zone or None.
+        """
+        kind, i, _ = self._locations.where(card)
+        return kind, (self.players[i] if i != location.NO_PLAYER else None)
+
+    def check_card_locations(self):
+        """Check that every card of the deck is in exactly one place and
+        that the card location table agrees with the zones.
+
+        Raise GTRError if not.
+        """
+        expected = location.CardLocations()
+        seen = [0]*len(cm.standard_deck())
+
+        def visit(cards, kind, player=location.NO_PLAYER,
+                building=location.NO_BUILDING):
+            for c in cards:
+                if c.ident >= 0:
+                    seen[c.ident] += 1
+            expected.place(cards, kind, player, building)
+
+        visit(self.library, location.LIBRARY)
+        visit(self.jacks, location.JACKS)
+        visit(self.pool, location.POOL)
+        for i, p in enumerate(self.players):
+            for attr, kind in location.PLAYER_ZONES:
+                visit(getattr(p, attr), kind, i)
+            if p.fountain_card is not None:
+                visit((p.fountain_card,), location.FOUNTAIN, i)
+            for b in p.buildings:
+                f = b.foundation.ident
+                visit((b.foundation,), location.FOUNDATION, i)
+                visit(b.materials, location.MATERIALS, i, f)
+                visit(b.stairway_materials, location.STAIRWAY, i, f)
+
+        missing = [i for i, n in enumerate(seen) if n == 0]
+        repeated = [i for i, n in enumerate(seen) if n > 1]
+        if missing or repeated:
+            raise GTRError('Cards missing: {0!s}, cards in more than one place: {1!s}'
+                    .format(map(Card, missing), map(Card, repeated)))
+
+        for table in ('kinds', 'players', 'buildings'):
+            if getattr(expected, table) != getattr(self._locations, table):
+                raise GTRError('Card location table is out of date ({0}).'
+                        .format(table))
+
+    def _reset_card_locations(self):
+        """Attach all of the game's zones to a new card location table,
+        recording where every card is.
+        """
+        self._locations = location.CardLocations()
+        self.library.track(self._locations, location.LIBRARY)
+        self.jacks.track(self._locations, location.JACKS)
+        self.pool.track(self._locations, location.POOL)
+        for i, p in enumerate(self.players):
+            self._track_player(i, p)
+
+    def _track_player(self, i, player):
+        """Attach the zones of the player with index i to the card location
+        table, and watch the player's buildings.
+        """
+        player.on_buildings_change = self._buildings_changed
+        self._active_index = None
+
+        for attr, kind in location.PLAYER_ZONES:
+            getattr(player, attr).track(self._locations, kind, i)
+
+        if player.fountain_card is not None:
+            self._locations.place((player.fountain_card,), location.FOUNTAIN, i)
+
+        for b in player.buildings:
+            self._track_building(i, b)
+
+    def _track_building(self, i, building):
+        """Attach the zones of a building owned by the player with index i
+        to the card location table.
+        """
+        f = building.foundation.ident
+        self._locations.place((building.foundation,), location.FOUNDATION, i)
+        building.materials.track(self._locations, location.MATERIALS, i, f)
+        building.stairway_materials.track(self._locations, location.STAIRWAY, i, f)
+
     def _find_players_building(self, foundation):
         """Return (player, building) with specified foundation Card.
         """
+        kind, p = self.card_location(foundation)
+        if kind == location.FOUNDATION:
+            try:
+                return p, p.get_building(foundation)
+            except GTRError:
+                pass
+
+        # Buildings that weren't added through the game aren't tracked.
         for p in self.players:
             try:
                 b = p.get_building(foundation)
@@ -232,8 +882,8 @@ class Game(object):
         self.leader_index = self.leader_index + 1
         if self.leader_index >= len(self.players):
             self.leader_index = 0
-        lg.debug('Leader index changed from {0} to {1}'.format(prev_index,
-        self.leader_index))
+        lg.debug('Leader index changed from %s to %s', prev_index,
+                self.leader_index)
 
     def _following_players_in_order(self):
         """Return a list of players in turn order starting with
@@ -263,6 +913,7 @@ class Game(object):
         self.leader_index = first_player_index
         self.jacks = Zone([Card(i) for i in range(Game._initial_jack_count)])
         self._init_sites(n_players)
+        self._reset_card_locations()
 
     def _init_pool(self, n_players):
         """Deals one card to each player and place the cards in the pool.
@@ -285,7 +936,7 @@ class Game(object):
 
             if len(players)==1:
                 has_winner = True
-                self._log('{0} plays first.'.format(self.players[0].name))
+                self._log('{0} plays first.', self.players[0].name)
             else:
                 self._log('Deal more cards into pool to break tie.')
 
@@ -294,18 +945,19 @@ class Game(object):
 
     def _init_sites(self, n_players):
         n_out_of_town = 6 - n_players
-        for material in cm.get_all_materials():
-            self.in_town_sites.extend([material]*n_players)
-            self.out_of_town_sites.extend([material]*n_out_of_town)
+        n_materials = len(catalog.MATERIALS)
+        self._in_town_counts = [n_players]*n_materials
+        self._out_of_town_counts = [n_out_of_town]*n_materials
 
     def _init_library(self):
         """Initializes the library as a list of Card objects
         """
-        self.library = Zone(cm.get_orders_card_set())
+        self.library = Library(cm.get_orders_card_set())
+        self.library.track(self._locations, location.LIBRARY)
         self._shuffle_library()
 
     def _init_player_hands(self):
-        lg.info('Initializing {0} players.'.format(len(self.players)))
+        lg.info('Initializing %d players.', len(self.players))
         for player in self.players:
             self._draw_jack_for_player(player)
             self._thinker_for_cards(player, 5)
@@ -318,58 +970,87 @@ class Game(object):
         shuffle. See the SO question
           http://stackoverflow.com/questions/3062741/maximal-length-of-list-to-shuffle-with-python-random-shuffle
         """
-        random.shuffle(self.library.cards)
+        self.library.shuffle()
+
+    def score(self, player):
+        """Return the player's score if the game ended now, as a dict of
+        the parts and the total:
+
+            influence -- influence points, from sites and Prison.
+            statue    -- 3 points with a Statue.
+            wall      -- a point for every two stockpile cards with a Wall.
+            vault     -- the value of the cards in the vault.
+            merchant  -- 3 points for each merchant bonus.
+            total     -- the sum of the parts.
+
+        The vault and clientele keep their counts as cards move, so this
+        takes time in proportion to the number of players, not cards.
+        """
+        bonuses = self._merchant_bonuses()
+        return self._score_parts(player, bonuses[self.players.index(player)])
+
+    def scores(self):
+        """Return the score() of every player, in player order."""
+        bonuses = self._merchant_bonuses()
+        return [self._score_parts(p, b) for p, b in zip(self.players, bonuses)]
+
+    def _score_parts(self, player, bonuses):
+        parts = dict(
+                influence=player.influence_points,
+                statue=0,
+                wall=0,
+                vault=player.vault.value,
+                merchant=3*len(bonuses))
+
+        if self._player_has_active_building(player, 'Statue'):
+            parts['statue'] = 3
+
+        if self._player_has_active_building(player, 'Wall'):
+            parts['wall'] = len(player.stockpile) // 2
+
+        parts['total'] = sum(parts.values())
+        return parts
 
     def _player_score(self, player):
-        return self._buildings_score(player) + self._vault_score(player)
+        return self.score(player)['total']
 
     def _buildings_score(self, player):
         """ Add up the score from this players buildings.
         This includes the influence gained by sites, including payment
         from a Prison, and points from Statue and Wall.
         """
-        influence_pts = player.influence_points
-        statue_pts = 0
-        if self._player_has_active_building(player, 'Statue'):
-            statue_pts = 3
-
-        wall_pts = 0
-        if self._player_has_active_building(player, 'Wall'):
-            wall_pts = len(player.stockpile) // 2
-
-        return influence_pts + statue_pts + wall_pts
+        parts = self._score_parts(player, ())
+        return parts['influence'] + parts['statue'] + parts['wall']
 
     def _vault_score(self, player):
         """ Examines all players' vaults to determine the vault
         score for each player, including the merchant bonuses.
         """
-        bonuses = {}
-        for player in self.players:
-            bonuses[player.name] = []
-
+        parts = self.score(player)
+        return parts['vault'] + parts['merchant']
+
+    def _merchant_bonuses(self):
+        """Return the list of materials each player has a merchant bonus
+        for, in player order. The bonus goes to the player with the most
+        cards of the material in their vault, and to nobody if there's
+        a tie.
+        """
+        bonuses = [[] for _ in self.players]
+        counts = [p.vault.material_counts() for p in self.players]
         for material in cm.get_materials():
-            # Set name to None if there's a tie, but maintain maximum
-            name, maximum = None, 0
-            for player in self.players:
-                material_cards = filter(
-                    lambda c : c.material == material, player.vault)
-                n = len(material_cards)
+            # Set index to None if there's a tie, but maintain maximum
+            index, maximum = None, 0
+            for i, player_counts in enumerate(counts):
+                n = player_counts.get(material, 0)
                 if n > maximum:
-                    name = player.name
+                    index = i
                     maximum = n
                 elif n == maximum:
                     index = None
-                    maximum = n
-            if name:
-                bonuses[name].append(material)
+            if index is not None:
+                bonuses[index].append(material)
 
-        bonus_pts = 3*len(bonuses[player.name])
-
-        card_pts = 0
-        for card in player.vault:
-            card_pts += card.value
-
-        return card_pts + bonus_pts
+        return bonuses
 
     def _clientele_limit(self, player):
         has_insula = self._player_has_active_building(player, 'Insula')
@@ -394,7 +1075,7 @@ class Game(object):
         player -- Player object
         building -- string
         """
-        return building in self._active_building_names(player)
+        return building in self._active_building_set(player)
 
     def _active_building_names(self, player):
         """Returns a list of building names that are active for a player,
@@ -402,9 +1083,59 @@ class Game(object):
         _active_buildings(player) method for reference, but note that
         this method does not return duplicate names.
         """
+        return list(self._active_building_set(player))
+
+    def _buildings_changed(self):
+        """Called by the players when buildings are started, completed,
+        moved or stairwayed.
+        """
+        self._active_index = None
 
-        names = map(str, self._active_buildings(player))
-        return list(set(names))
+    def _active_building_set(self, player):
+        """Return the frozenset of building names active for the player,
+        from the index of active buildings.
+
+        The index is rebuilt for all players after any building changes,
+        since a Stairway or Gate can activate buildings for other players.
+        """
+        index = self._active_index
+        if index is None:
+            index = self._active_index = self._build_active_index()
+
+        try:
+            names = index[player]
+        except KeyError:
+            # Not one of this game's players.
+            names = frozenset(map(str, self._active_buildings(player)))
+
+        if Game.debug_active_buildings:
+            expected = frozenset(map(str, self._active_buildings(player)))
+            if names != expected:
+                raise AssertionError('Active buildings of {0} are out of date: '
+                        '{1!r} != {2!r}'.format(player.name, sorted(names),
+                            sorted(expected)))
+
+        return names
+
+    def _build_active_index(self):
+        """Return a dict of Player to the frozenset of names of the
+        buildings active for that player. See _active_buildings().
+        """
+        stairwayed = set()
+        for p in self.players:
+            stairwayed.update(map(str, p.stairwayed_buildings))
+
+        index = {}
+        for p in self.players:
+            names = set(stairwayed)
+            names.update(map(str, p.complete_buildings))
+            if 'Gate' in names:
+                names.update(str(b) for b in p.incomplete_buildings
+                        if b.composed_of('Marble'))
+
+            index[p] = frozenset(names)
+
+        return index
 
     def _active_buildings(self, player):
         """Returns a list of all Building objects that are active for a player.
@@ -422,7 +1153,7 @@ class Game(object):
         Since multiple players can have a building with a Stairway activation,
         this list might contain buildings with the same name.
         """
-        _active_buildings = player.complete_buildings
+        _active_buildings = list(player.complete_buildings)
         for player_ in self.players:
             _active_buildings.extend(player_.stairwayed_buildings)
 
@@ -435,11 +1166,11 @@ class Game(object):
         return _active_buildings
 
 
-    def _await_action(self, action, active_player):
+    def _await_action(self, active_player, action):
         """Sets the game in a state to await a call to handle()
         for the active_player and the specific action. For example:
 
-            self._await_action(message.GIVECARDS, player)
+            self._await_action(player, message.GIVECARDS)
 
         This exists because these are frequently placed on the stack,
         requiring a function.
@@ -447,6 +1178,18 @@ class Game(object):
         self.expected_action = action
         self.active_player = active_player
 
+        decisions = self.follow_decisions
+        if action == message.FOLLOWROLE and decisions is not None:
+            i = self.active_player_index
+            decision = decisions[i]
+            if decision is not None:
+                decisions[i] = None
+                if not any(d is not None for d in decisions):
+                    self.follow_decisions = None
+                cards = [Card(ident) for ident in decision[1:]]
+                self._handle_followrole(message.GameAction.trusted(
+                    message.FOLLOWROLE, decision[0], *cards))
+
 
     def _handle_thinkerorlead(self, a):
         do_thinker = a.args[0]
@@ -455,21 +1198,22 @@ class Game(object):
         if not do_thinker:
             # my_list[::-1] reverses the list
             for p in self._players_in_turn_order()[::-1]:
-                self.stack.push_frame("_perform_role_being_led", p)
-            for p in self._following_players_in_order()[::-1]:
-                self.stack.push_frame("_await_action", message.FOLLOWROLE, p)
-            self.stack.push_frame("_await_action", message.LEADROLE, p)
+                self._push_frame(stack.PERFORM_ROLE_BEING_LED, p)
+            for follower in self._following_players_in_order()[::-1]:
+                self._push_frame(stack.AWAIT_ACTION, follower, message.FOLLOWROLE)
+            self._push_frame(stack.AWAIT_ACTION, self.leader, message.LEADROLE)
 
         else:
-            self.stack.push_frame("_perform_thinker_action", p)
+            self._push_frame(stack.PERFORM_THINKER_ACTION, p)
 
         self._pump()
 
     def _thinker_for_cards(self, player, max_hand_size):
         n_cards = max_hand_size - len(player.hand)
         if n_cards < 1: n_cards = 1
-        lg.debug(
-            'Adding {0} cards to {1}\'s hand'.format(n_cards, player.name))
+        # The game ends when the last card is drawn, even if it's short.
+        n_cards = min(n_cards, len(self.library))
+        lg.debug('Adding %d cards to %s\'s hand', n_cards, player.name)
         player.hand.extend(self._draw_cards(n_cards))
 
     def _draw_jack_for_player(self, player):
@@ -479,9 +1223,10 @@ class Game(object):
         player.hand.move_card(card, self.pool)
 
     def _discard_all_for_player(self, player):
-        cards_to_discard = list(player.hand)
-        for card in cards_to_discard:
-            player.hand.move_card(card, self.pool)
+        # Jacks go back to the Jack pile, not the pool.
+        jacks = [c for c in player.hand if c.name == 'Jack']
+        player.hand.move_cards(jacks, self.jacks, trusted=True)
+        player.hand.move_all(self.pool)
 
     def _draw_jack(self):
         try:
@@ -492,44 +1237,89 @@ class Game(object):
         return c
 
     def _draw_cards(self, n_cards):
-        cards = []
-        for i in range(0, n_cards):
-            cards.append(self.library.pop(0))
-        return cards
+        return self.library.draw(n_cards)
+
+    def _log(self, msg, *args):
+        """Logs the message in the GameState log roll. If there are args,
+        the message is formatted with them, eg.
 
-    def _log(self, msg):
-        """Logs the message in the GameState log roll.
+            self._log('{0} thinks for a Jack.', player.name)
+
+        Headless games don't keep a log, so they skip the formatting.
         """
+        if self.headless:
+            return
+
+        if args:
+            msg = msg.format(*args)
         time = datetime.now().time().strftime('%H:%M:%S ')
         self.game_log.append(time+msg)
         lg.debug(time+msg)
 
+    def _push_frame(self, opcode, player=None, arg=None):
+        """Push a frame to call the method for opcode (see stack.py) with
+        the Player and arg, if they are given.
+        """
+        i = self.players.index(player) if player is not None else stack.NO_PLAYER
+        self.stack.push_frame(opcode, i, arg)
+
     def _pump(self):
-        """Pop the top frame from the stack into self._current_frame
-        and execute the function.
+        """Continue with the next frame on the stack.
+
+        Frame functions call this as the last thing they do. Inside the
+        run loop, it only tells the loop to execute the next frame once
+        the current function returns. Otherwise it starts the run loop.
         """
-        if self.stack.stack:
-            try:
-                self._current_frame = self.stack.stack.pop()
-            except IndexError:
-                lg.warning('Tried to pop from empty stack!')
-                raise
+        if self._running:
+            self._pump_requested = True
+        else:
+            self._run()
+
+    def _run(self):
+        """Run loop. Pop the top frame from the stack into
+        self._current_frame and execute the function, for as long as
+        the functions call _pump(). A function that waits for a player's
+        action returns without calling _pump(), which ends the loop.
+        """
+        self._running = True
+        debug = not self.headless and lg.isEnabledFor(logging.DEBUG)
+        try:
+            pump = True
+            while pump and self.stack.stack:
+                self._pump_requested = False
+
+                frame = self._current_frame = self.stack.stack.pop()
+                self.frames_executed += 1
+                if debug:
+                    lg.debug('Execute next stack frame: %s', frame)
+
+                func = _frame_functions[frame.opcode]
+                if frame.player == stack.NO_PLAYER:
+                    func(self)
+                elif frame.arg is None:
+                    func(self, self.players[frame.player])
+                else:
+                    func(self, self.players[frame.player], frame.arg)
 
-            lg.debug('Execute next stack frame: ' + str(self._current_frame))
+                pump = self._pump_requested
 
-            func = getattr(self, self._current_frame.function_name)
-            func.__call__(*self._current_frame.args)
+        finally:
+            self._running = False
+            self._pump_requested = False
 
     def _advance_turn(self):
         """ Moves the leader index, prints game state, saves, and pushes the next turn.
         """
         self.turn_number += 1
+        self.role_led = None
+        if self.premoves is not None:
+            self._drop_stale_premoves()
         self._increment_leader_index()
         leader_index = self.leader_index
         leader = self.players[leader_index]
-        self.stack.push_frame('_take_turn_stacked', leader)
+        self._push_frame(stack.TAKE_TURN_STACKED, leader)
 
-        self._log('Turn {0}: {1}'.format(self.turn_number, leader.name))
+        self._log('Turn {0}: {1}', self.turn_number, leader.name)
 
         self._pump()
 
@@ -539,10 +1329,10 @@ class Game(object):
         Push END_TURN frame.
         Push THINKER_OR_LEAD frame.
         """
-        self.stack.push_frame("_advance_turn")
-        self.stack.push_frame("_end_turn")
-        self.stack.push_frame("_kids_in_pool")
-        self.stack.push_frame("_await_action", message.THINKERORLEAD, player)
+        self._push_frame(stack.ADVANCE_TURN)
+        self._push_frame(stack.END_TURN)
+        self._push_frame(stack.KIDS_IN_POOL)
+        self._push_frame(stack.AWAIT_ACTION, player, message.THINKERORLEAD)
 
         self._pump()
 
@@ -562,11 +1352,11 @@ class Game(object):
         p = self.active_player
 
         if skip:
-            self._log('{0} skips thinker with Academy'.format(p.name))
+            self._log('{0} skips thinker with Academy', p.name)
             self._pump()
 
         else:
-            self._log('{0} thinks at the end of turn with Academy'.format(p.name))
+            self._log('{0} thinks at the end of turn with Academy', p.name)
             self._perform_thinker_action(self.leader)
 
 
@@ -578,7 +1368,7 @@ class Game(object):
             self.expected_action = message.USEVOMITORIUM
 
         else:
-            a = message.GameAction(message.USEVOMITORIUM, False)
+            a = message.GameAction.trusted(message.USEVOMITORIUM, False)
             self._handle_usevomitorium(a)
 
 
@@ -596,11 +1386,11 @@ class Game(object):
 
         do_discard = a.args[0]
         if do_discard:
-            self._log('{0} discards their entire hand with Vomitorium: {1}.'
-                .format(p.name, ', '.join(map(str, p.hand))))
+            self._log('{0} discards their entire hand with Vomitorium: {1}.',
+                p.name, ', '.join(map(str, p.hand)))
 
             self._discard_all_for_player(p)
-            a = message.GameAction(message.USELATRINE, None)
+            a = message.GameAction.trusted(message.USELATRINE, None)
             self._handle_uselatrine(a)
 
         elif self._player_has_active_building(p, 'Latrine'):
@@ -608,7 +1398,7 @@ class Game(object):
             self.expected_action = message.USELATRINE
 
         else:
-            a = message.GameAction(message.USELATRINE, None)
+            a = message.GameAction.trusted(message.USELATRINE, None)
             self._handle_uselatrine(a)
 
 
@@ -618,8 +1408,8 @@ class Game(object):
 
         if latrine_card is not None:
             self._discard_for_player(p, latrine_card)
-            self._log('{0} discards {1} using Latrine.'
-                .format(p.name, latrine_card))
+            self._log('{0} discards {1} using Latrine.',
+                p.name, latrine_card)
 
         self.active_player = p
         self.expected_action = message.THINKERTYPE
@@ -635,9 +1425,9 @@ class Game(object):
             self._draw_jack_for_player(p)
 
             if is_leader:
-                self._log('{0} thinks for a Jack.'.format(p.name))
+                self._log('{0} thinks for a Jack.', p.name)
             else:
-                self._log('{0} thinks for a Jack instead of following.'.format(p.name))
+                self._log('{0} thinks for a Jack instead of following.', p.name)
 
         else:
             self._thinker_for_cards(p, self._max_hand_size(p))
@@ -646,13 +1436,13 @@ class Game(object):
             noun = 'cards' if n_cards > 1 else 'card'
 
             if is_leader:
-                self._log('{0} thinks for {1} {2}.'.format(p.name, n_cards, noun))
+                self._log('{0} thinks for {1} {2}.', p.name, n_cards, noun)
             else:
-                self._log('{0} thinks for {1} {2} instead of following.'
-                    .format(p.name, n_cards, noun))
+                self._log('{0} thinks for {1} {2} instead of following.',
+                    p.name, n_cards, noun)
 
             if len(self.library) == 0:
-                self._log('{0} has drawn the last Orders card. Game Over.'.format(p.name))
+                self._log('{0} has drawn the last Orders card. Game Over.', p.name)
                 self._end_game()
 
         self._pump()
@@ -677,11 +1467,11 @@ class Game(object):
             p.hand.move_card(c, p.camp)
 
         if n_actions > 1:
-            self._log('{0} leads {1} for {2} actions using: {3}'
-                    .format(p.name, role, n_actions, ', '.join(map(str, cards))))
+            self._log('{0} leads {1} for {2} actions using: {3}',
+                    p.name, role, n_actions, ', '.join(map(str, cards)))
         else:
-            self._log('{0} leads {1} using: {2}'
-                    .format(p.name, role, ', '.join(map(str, cards))))
+            self._log('{0} leads {1} using: {2}',
+                    p.name, role, ', '.join(map(str, cards)))
 
         self._pump()
 
@@ -763,35 +1553,46 @@ class Game(object):
 
         think = n_actions == 0
 
-        if think and len(cards)>0:
-            raise GTRError('Thinker (n_actions == 0) requested but cards received ({0}).'
-                    .format(', '.join(map(str, cards))))
+        # This will raise GTRError if the cards don't check out.
+        self._check_follow(p, n_actions, cards)
 
         if think:
             p.n_camp_actions = 0
-            self.stack.push_frame("_perform_thinker_action", p)
+            self._push_frame(stack.PERFORM_THINKER_ACTION, p)
         else:
-            # This will raise GTRError if the cards don't check out.
-            self._check_action_units(p, self.role_led, n_actions, cards)
-
-            # Check if cards exist in hand
-            if not p.hand.contains(cards):
-                raise GTRError('Not all cards specified exist in hand.')
-
             p.n_camp_actions = n_actions
             for c in cards:
                 p.hand.move_card(c, p.camp)
 
             if n_actions > 1:
-                self._log('{0} follows for {1} actions using: {2}'
-                        .format(p.name, n_actions, ', '.join(map(str, cards))))
+                self._log('{0} follows for {1} actions using: {2}',
+                        p.name, n_actions, ', '.join(map(str, cards)))
             else:
-                self._log('{0} follows using: {1}'
-                        .format(p.name, ', '.join(map(str, cards))))
+                self._log('{0} follows using: {1}',
+                        p.name, ', '.join(map(str, cards)))
 
         self._pump()
 
 
+    def _check_follow(self, p, n_actions, cards):
+        """Check the args of a FOLLOWROLE action by player p. If n_actions
+        is 0, p thinks instead of following.
+
+        Raises GTRError if the action isn't legal.
+        """
+        if n_actions == 0:
+            if len(cards)>0:
+                raise GTRError('Thinker (n_actions == 0) requested but cards received ({0}).'
+                        .format(', '.join(map(str, cards))))
+            return
+
+        self._check_action_units(p, self.role_led, n_actions, cards)
+
+        # Check if cards exist in hand
+        if not p.hand.contains(cards):
+            raise GTRError('Not all cards specified exist in hand.')
+
+
     def _player_client_count(self, player, role):
         """Return the number of active clients this player has of the specified
         role, accounting for Storeroom, but not Ludus Magna.
@@ -829,20 +1630,20 @@ class Game(object):
         (and we're leading craftsman), set "out of town allowed".
         """
         role = self.role_led
-        self._log('Player {} is performing {}'.format(player.name, role))
+        self._log('Player {} is performing {}', player.name, role)
 
         n_merchants = self._player_client_count(player, 'Merchant')
         n_role = self._player_client_count(player, role)
 
         if role != 'Merchant':
             for _ in range(n_merchants):
-                self.stack.push_frame('_perform_clientele_action', player, 'Merchant')
+                self._push_frame(stack.PERFORM_CLIENTELE_ACTION, player, 'Merchant')
 
         for _ in range(n_role):
-            self.stack.push_frame('_perform_clientele_action', player, role)
+            self._push_frame(stack.PERFORM_CLIENTELE_ACTION, player, role)
 
         for _ in range(player.n_camp_actions):
-            self.stack.push_frame('_perform_role_action', player, role)
+            self._push_frame(stack.PERFORM_ROLE_ACTION, player, role)
 
         self._pump()
 
@@ -857,15 +1658,15 @@ class Game(object):
         # Only do these if the player has an active Ludus Magnus
         if role == 'Merchant' and role_led != 'Merchant':
             if has_ludus:
-                self.stack.push_frame('_perform_role_action', player, role_led)
+                self._push_frame(stack.PERFORM_ROLE_ACTION, player, role_led)
                 if has_cm and is_leading_or_following:
-                    self.stack.push_frame('_perform_role_action', player, role_led)
+                    self._push_frame(stack.PERFORM_ROLE_ACTION, player, role_led)
             # Skip Merchant if that's not the role being led and no Ludus
         else:
             # Do these for everyone
-            self.stack.push_frame('_perform_role_action', player, role)
+            self._push_frame(stack.PERFORM_ROLE_ACTION, player, role)
             if has_cm and is_leading_or_following:
-                self.stack.push_frame('_perform_role_action', player, role)
+                self._push_frame(stack.PERFORM_ROLE_ACTION, player, role)
 
         self._pump()
 
@@ -895,32 +1696,31 @@ class Game(object):
         has_ludus = self._player_has_active_building(player, 'Ludus Magnus')
 
         f = self.stack.stack[-1]
+        i_player = self.players.index(player)
 
-        # Args are (player, role)
-        if f.function_name == '_perform_role_action':
-            p, role = f.args
+        # Frame player and arg are the player index and role.
+        if f.opcode == stack.PERFORM_ROLE_ACTION:
+            p, role = f.player, f.arg
 
-            current_function = self._current_frame.function_name
-            if current_function != '_perform_role_action':
+            current_frame = self._current_frame
+            if current_frame.opcode != stack.PERFORM_ROLE_ACTION:
                 lg.warning('Called _check_oot_allowed during action: {0}'
-                        .format(current_function))
+                        .format(current_frame.function_name))
                 return False
 
-            current_player = self._current_frame.args[0]
-
-            if current_player.name != player.name:
+            if current_frame.player != i_player:
                 lg.warning('Called _check_oot_allowed for wrong player.')
                 return False
 
-            current_role = self._current_frame.args[1]
+            current_role = current_frame.arg
 
-            if p.name == player.name and role == current_role:
+            if p == i_player and role == current_role:
                 return True
 
-        if f.function_name == '_perform_clientele_action':
-            p, role = f.args
+        if f.opcode == stack.PERFORM_CLIENTELE_ACTION:
+            p, role = f.player, f.arg
 
-            if p.name == player.name and \
+            if p == i_player and \
                     ((role=='Merchant' and has_ludus) or role == self.role_led):
                 return True
 
@@ -1008,11 +1808,11 @@ class Game(object):
             p.hand.move_card(hand_c, p.stockpile)
 
         if hand_c:
-            self._log('{0} performs Laborer from pool: {1} and hand: {2}.'
-                    .format(p.name, pool_c, hand_c))
+            self._log('{0} performs Laborer from pool: {1} and hand: {2}.',
+                    p.name, pool_c, hand_c)
         else:
-            self._log('{0} performs Laborer from pool: {1}'
-                    .format(p.name, pool_c))
+            self._log('{0} performs Laborer from pool: {1}',
+                    p.name, pool_c)
 
         self._pump()
 
@@ -1027,11 +1827,11 @@ class Game(object):
 
         else:
             if has_bar:
-                self.stack.push_frame('_await_action', message.PATRONFROMDECK, player)
+                self._push_frame(stack.AWAIT_ACTION, player, message.PATRONFROMDECK)
             if has_aqueduct:
-                self.stack.push_frame('_await_action', message.PATRONFROMHAND, player)
+                self._push_frame(stack.AWAIT_ACTION, player, message.PATRONFROMHAND)
 
-            self.stack.push_frame('_await_action', message.PATRONFROMPOOL, player)
+            self._push_frame(stack.AWAIT_ACTION, player, message.PATRONFROMPOOL)
 
             self._pump()
 
@@ -1042,13 +1842,13 @@ class Game(object):
         p = self.active_player
 
         if bar_first:
-            self.stack.push_frame('_await_action', message.PATRONFROMDECK, p)
-            self.stack.push_frame('_await_action', message.PATRONFROMHAND, p)
+            self._push_frame(stack.AWAIT_ACTION, p, message.PATRONFROMDECK)
+            self._push_frame(stack.AWAIT_ACTION, p, message.PATRONFROMHAND)
         else:
-            self.stack.push_frame('_await_action', message.PATRONFROMHAND, p)
-            self.stack.push_frame('_await_action', message.PATRONFROMDECK, p)
+            self._push_frame(stack.AWAIT_ACTION, p, message.PATRONFROMHAND)
+            self._push_frame(stack.AWAIT_ACTION, p, message.PATRONFROMDECK)
 
-        self.stack.push_frame('_await_action', message.PATRONFROMPOOL, p)
+        self._push_frame(stack.AWAIT_ACTION, p, message.PATRONFROMPOOL)
 
         self._pump()
 
@@ -1066,15 +1866,15 @@ class Game(object):
 
             if self._player_has_active_building(p, 'Bath'):
                 #TODO: Does Ludus Magna help with Bath. What about Circus Maximus?
-                self.stack.push_frame('_perform_role_action', p, card.role)
+                self._push_frame(stack.PERFORM_ROLE_ACTION, p, card.role)
                 self._log(
-                    '{0} performs Patron, hiring {1} from pool and performing {2} using Bath.'
-                    .format(p.name, card, card.role))
+                    '{0} performs Patron, hiring {1} from pool and performing {2} using Bath.',
+                    p.name, card, card.role)
 
             else:
                 self._log(
-                    '{0} performs Patron, hiring {1} from pool.'
-                    .format(p.name, card))
+                    '{0} performs Patron, hiring {1} from pool.',
+                    p.name, card)
 
             self._check_forum()
 
@@ -1092,18 +1892,22 @@ class Game(object):
 
             if self._player_has_active_building(p, 'Bath'):
                 #TODO: Does Ludus Magna help with Bath. What about Circus Maximus?
-                self.stack.push_frame('_perform_role_action', p, card.role)
+                self._push_frame(stack.PERFORM_ROLE_ACTION, p, card.role)
                 self._log(
-                    '{0} performs Patron, hiring {1} from deck and performing {2} using Bath.'
-                    .format(p.name, card, card.role))
+                    '{0} performs Patron, hiring {1} from deck and performing {2} using Bath.',
+                    p.name, card, card.role)
 
             else:
                 self._log(
-                    '{0} performs Patron, hiring {1} from deck.'
-                    .format(p.name, card))
+                    '{0} performs Patron, hiring {1} from deck.',
+                    p.name, card)
 
         self._check_forum()
 
+        if do_patron and len(self.library) == 0:
+            self._log('{0} has hired the last Orders card. Game Over.', p.name)
+            self._end_game()
+
         self._pump()
 
 
@@ -1117,15 +1921,15 @@ class Game(object):
 
             if self._player_has_active_building(p, 'Bath'):
                 #TODO: Does Ludus Magna help with Bath. What about Circus Maximus?
-                self.stack.push_frame('_perform_role_action', p, card.role)
+                self._push_frame(stack.PERFORM_ROLE_ACTION, p, card.role)
                 self._log(
-                    '{0} performs Patron, hiring {1} from hand and performing {2} using Bath.'
-                    .format(p.name, card, card.role))
+                    '{0} performs Patron, hiring {1} from hand and performing {2} using Bath.',
+                    p.name, card, card.role)
 
             else:
                 self._log(
-                    '{0} performs Patron, hiring {1} from hand.'
-                    .format(p.name, card))
+                    '{0} performs Patron, hiring {1} from hand.',
+                    p.name, card)
 
         self._check_forum()
 
@@ -1142,17 +1946,18 @@ class Game(object):
                 has_ludus = self._player_has_active_building(p, 'Ludus Magna')
                 has_storeroom = self._player_has_active_building(p, 'Storeroom')
 
+                # The clientele keeps its counts by role, see
+                # Zone.keep_tally().
+                clientele = p.clientele
+                roles = set(clientele.roles())
+
                 # With a ludus, the extra Merchants count for missing roles.
-                extra_merchant_count = 0
-                roles = set()
-                for c in p.clientele:
-                    if c.role not in roles:
-                        roles.add(c.role)
-                    elif c.role == 'Merchant':
-                        extra_merchant_count += 1
-                    elif has_storeroom:
-                        roles.add('Laborer')
+                extra_merchant_count = max(clientele.role_count('Merchant') - 1, 0)
 
+                # With a Storeroom, any other extra client counts as a Laborer.
+                if has_storeroom and any(clientele.role_count(r) > 1
+                        for r in roles if r != 'Merchant'):
+                    roles.add('Laborer')
 
                 ludus_win = has_ludus and (len(roles) + extra_merchant_count) >= 6
                 normal_win = len(roles) >= 6
@@ -1182,11 +1987,11 @@ class Game(object):
         if player.owns_building(building):
             raise GTRError('Player already owns {0!s}.'.format(building))
 
-        if site not in self.out_of_town_sites:
+        if not self._n_sites(site, out_of_town=True):
             raise GTRError('No {0} sites left, including out of town'
                 .format(site))
 
-        if site not in self.in_town_sites and \
+        if not self._n_sites(site) and \
                 not self.oot_allowed:
             raise GTRError('Starting an out of town building is not allowed.')
 
@@ -1238,7 +2043,7 @@ class Game(object):
         if self._player_has_active_building(player, 'Fountain'):
             self.expected_action = message.USEFOUNTAIN
         else:
-            a = message.GameAction(message.USEFOUNTAIN, False)
+            a = message.GameAction.trusted(message.USEFOUNTAIN, False)
             self._handle_usefountain(a)
 
 
@@ -1251,13 +2056,15 @@ class Game(object):
 
         if use_fountain:
             p.fountain_card = self._draw_cards(1)[0]
+            self._locations.place((p.fountain_card,), location.FOUNTAIN,
+                    self.active_player_index)
             self.expected_action = message.FOUNTAIN
-            self._log('{0} reveals {1} with Fountain.'
-                .format(p.name, p.fountain_card))
+            self._log('{0} reveals {1} with Fountain.',
+                p.name, p.fountain_card)
 
             if len(self.library) == 0:
-                self._log('{0} has drawn the last Orders card with Fountain. Game Over.'
-                        .format(p.name))
+                self._log('{0} has drawn the last Orders card with Fountain. Game Over.',
+                        p.name)
                 self._end_game()
 
         else:
@@ -1274,8 +2081,8 @@ class Game(object):
         fountain_card = p.fountain_card
 
         if skip:
-            self._log('{0} skips Fountain, drawing {1}.'
-                .format(p.name, fountain_card))
+            self._log('{0} skips Fountain, drawing {1}.',
+                p.name, fountain_card)
             p.hand.append(p.fountain_card)
             p.fountain_card = None
         else:
@@ -1286,7 +2093,7 @@ class Game(object):
             self._log_construct(p, building, material, site, ' using Fountain card')
 
             if b.complete:
-                self._log('{0} completed.'.format(str(b)))
+                self._log('{0} completed.', str(b))
                 self._resolve_building(p, b)
 
         self._pump()
@@ -1302,14 +2109,14 @@ class Game(object):
         """
 
         if site is None:
-            self._log('{0} adds {1} as material to {2}{3}.'
-                .format(player.name, material, building, material_source))
+            self._log('{0} adds {1} as material to {2}{3}.',
+                player.name, material, building, material_source)
         elif self.used_oot:
-            self._log('{0} starts {1} on a {2} site, out of town.'
-                .format(player.name, building, site))
+            self._log('{0} starts {1} on a {2} site, out of town.',
+                player.name, building, site)
         else:
-            self._log('{0} starts {1} on a {2} site.'
-                .format(player.name, building, site))
+            self._log('{0} starts {1} on a {2} site.',
+                player.name, building, site)
 
 
     def _construct(self, player, foundation, material, site, material_zone, fountain=False):
@@ -1337,7 +2144,7 @@ class Game(object):
             # raises if start is illegal
             self._check_building_start_legal(player, foundation, site)
 
-            is_oot = site not in self.in_town_sites
+            is_oot = not self._n_sites(site)
 
             # TODO: These errors are all checked in check_building_start
             if player.owns_building(foundation):
@@ -1345,12 +2152,12 @@ class Game(object):
                     .format(player.name, foundation))
 
             if is_oot:
-                sites = self.out_of_town_sites
-                if site not in sites:
+                sites = self._out_of_town_counts
+                if not self._n_sites(site, out_of_town=True):
                     raise GTRError('{0} not available out of town.'.format(site))
             else:
-                sites = self.in_town_sites
-                if site not in sites:
+                sites = self._in_town_counts
+                if not self._n_sites(site):
                     raise GTRError('{0} not available in town.'.format(site))
 
             if fountain:
@@ -1362,7 +2169,9 @@ class Game(object):
                     raise GTRError('{0!s} card not in {1}\'s hand.'
                         .format(foundation, player.name))
 
-            site_card = gtrutils.get_card_from_zone(site, sites)
+            code = catalog.MATERIAL_CODES[site]
+            sites[code] -= 1
+            site_card = catalog.MATERIALS[code]
             if fountain:
                 foundation_card = player.fountain_card
                 player.fountain_card = None
@@ -1371,6 +2180,7 @@ class Game(object):
 
             b = Building(foundation_card, site_card)
             player.buildings.append(b)
+            self._track_building(self.players.index(player), b)
 
             self.used_oot = is_oot
 
@@ -1379,7 +2189,7 @@ class Game(object):
             # a win.
             self._check_forum()
 
-            if len(self.in_town_sites) == 0:
+            if not any(self._in_town_counts):
                 self._end_game()
 
             return b
@@ -1405,19 +2215,19 @@ class Game(object):
 
             complete = False
             if has_scriptorium and material.material == 'Marble':
-                self._log('Player {} completed building {} using Scriptorium'.format(
-                  player.name, str(b)))
+                self._log('Player {} completed building {} using Scriptorium',
+                  player.name, str(b))
                 complete = True
            
             elif len(b.materials) == cm.get_value_of_material(b.site):
-                self._log('Player {} completed building {}'.format(player.name, str(b)))
+                self._log('Player {} completed building {}', player.name, str(b))
                 complete = True
             
             # This is an Architect action if the material comes from the stockpile.
             elif material_zone is player.stockpile and foundation.name == 'Villa':
                 self._log('Player {} completed Villa with one material '
-                        'using Architect.'
-                        .format(player.name))
+                        'using Architect.',
+                        player.name)
                 complete = True
 
 
@@ -1438,12 +2248,12 @@ class Game(object):
 
         else:
             b = self._construct(p, foundation, material, site, p.hand)
-            self._log('{0} performs Craftsman.'.format(p.name))
+            self._log('{0} performs Craftsman.', p.name)
             self._log_construct(p, foundation, material, site, ' from hand')
 
             if b.complete:
-                lg.debug('{0} completes {1!s}'.format(p.name, b))
-                self._log('{0} completed.'.format(str(b)))
+                lg.debug('%s completes %s', p.name, b)
+                self._log('{0} completed.', str(b))
                 self._resolve_building(p, b)
 
             p.performed_craftsman = True
@@ -1468,15 +2278,15 @@ class Game(object):
                     material_zone, s = p.stockpile, ' from stockpile'
 
             b = self._construct(p, foundation, material, site, material_zone)
-            self._log('{0} performs Architect.'.format(p.name))
+            self._log('{0} performs Architect.', p.name)
             self._log_construct(p, foundation, material, site, s)
 
             if b.complete:
-                self._log('{0} completed'.format(str(b)))
+                self._log('{0} completed', str(b))
                 self._resolve_building(p, b)
 
         else:
-            self._log('{0} skips Architect action.'.format(p.name))
+            self._log('{0} skips Architect action.', p.name)
 
         has_stairway = self._player_has_active_building(p, 'Stairway')
         if has_stairway:
@@ -1497,7 +2307,7 @@ class Game(object):
         p = self.active_player
 
         if foundation is None or material is None:
-            self._log('{0} skips Stairway.'.format(p.name))
+            self._log('{0} skips Stairway.', p.name)
 
         else:
             player, b = self._find_players_building(foundation)
@@ -1515,11 +2325,11 @@ class Game(object):
             zone.move_card(material, b.stairway_materials)
 
             if from_pool:
-                self._log('{0} uses Stairway to add {1} from the pool to {2}\'s {3}.' 
-                    .format(p.name, material, player.name, foundation))
+                self._log('{0} uses Stairway to add {1} from the pool to {2}\'s {3}.',
+                    p.name, material, player.name, foundation)
             else:
-                self._log('{0} uses Stairway to add {1} to {2}\'s {3}.' 
-                    .format(p.name, material, player.name, foundation))
+                self._log('{0} uses Stairway to add {1} to {2}\'s {3}.',
+                    p.name, material, player.name, foundation)
 
             self._check_forum()
 
@@ -1551,16 +2361,17 @@ class Game(object):
         self.legionary_count = 1
 
         # Traverse the stack, remove Legionary frames and increment legionary count
+        i_player = self.players.index(player)
         for f in self.stack.stack[::-1]:
-            if not len(f.args) or f.args[0] != player:
+            if f.player != i_player:
                 break
 
-            if f.function_name == '_perform_role_action' and f.args[1] == 'Legionary':
+            if f.opcode == stack.PERFORM_ROLE_ACTION and f.arg == 'Legionary':
                 self.legionary_count += 1
                 self.stack.remove(f)
 
-            elif f.function_name == '_perform_clientele_action':
-                role = f.args[1]
+            elif f.opcode == stack.PERFORM_CLIENTELE_ACTION:
+                role = f.arg
 
                 if role == 'Legionary' or (has_ludus and role == 'Merchant'):
                     self.legionary_count += 1
@@ -1584,7 +2395,7 @@ class Game(object):
         p = self.active_player
         hand = Zone([c for c in p.hand if c.name !='Jack'])
         for c in p.prev_revealed:
-            hand.cards.remove(c)
+            hand.pop(hand.index(c))
 
         if not hand.contains(cards):
             raise GTRError('Demanding with cards not in hand: {0}.'
@@ -1600,9 +2411,8 @@ class Game(object):
 
         revealed_materials = [c.material for c in p.revealed]
 
-        self._log('Rome demands {0}! (revealing {1})'
-            .format(', '.join(revealed_materials), 
-                ', '.join(map(str, p.revealed))))
+        self._log('Rome demands {0}! (revealing {1})',
+            ', '.join(revealed_materials), ', '.join(map(str, p.revealed)))
 
         # Get cards from other players, but only neighbors without Bridge.
 
@@ -1617,7 +2427,7 @@ class Game(object):
             responding_players.pop(0)
 
         for player in responding_players[::-1]:
-            self.stack.push_frame('_await_action', message.GIVECARDS, player)
+            self._push_frame(stack.AWAIT_ACTION, player, message.GIVECARDS)
                 
         self.legionary_player = p
         self.expected_action = message.TAKEPOOLCARDS
@@ -1635,13 +2445,13 @@ class Game(object):
             raise GTRError('Cards specified that aren\'t in pool ({0}).'
                     .format(', '.join(map(str, pool_matches))))
 
-        for c in pool_matches:
-            self.pool.move_card(c, self.legionary_player.stockpile)
+        self.pool.move_cards(pool_matches, self.legionary_player.stockpile,
+                trusted=True)
 
         if pool_matches:
-            self._log('{0} collected {1} from the pool.'
-                .format(self.legionary_player.name,
-                    ', '.join([c.material for c in pool_matches])))
+            self._log('{0} collected {1} from the pool.',
+                self.legionary_player.name,
+                ', '.join([c.material for c in pool_matches]))
 
         self._pump()
 
@@ -1653,7 +2463,7 @@ class Game(object):
         from stockpile or clientele.
         """
         cards = a.args
-        lg.debug('Received GIVECARDS(' + ','.join(map(str, cards))+')')
+        lg.debug('Received GIVECARDS(%s)', ','.join(map(str, cards)))
 
         p = self.active_player
 
@@ -1662,10 +2472,7 @@ class Game(object):
         has_bridge = self._player_has_active_building(leg_p, 'Bridge')
         has_coliseum = self._player_has_active_building(leg_p, 'Coliseum')
 
-        has_wall = self._player_has_active_building(p, 'Wall')
-        has_palisade = self._player_has_active_building(p, 'Palisade')
-
-        is_immune = has_wall or (has_palisade and not has_bridge)
+        is_immune = self._immune_to_legionary(p, has_bridge)
 
         self._move_legionary_cards(p, leg_p, cards, is_immune,
                 has_bridge, has_coliseum)
@@ -1677,9 +2484,20 @@ class Game(object):
         """Moves the cards from p's zones according to leg_p's revealed
         cards and the flags for Bridge and Coliseum.
         """
-        cards_in_hand = [c for c in cards if c in p.hand]
-        cards_in_stockpile = [c for c in cards if c in p.stockpile]
-        cards_in_clientele = [c for c in cards if c in p.clientele]
+        where = self._locations.where
+        i_p = self.players.index(p)
+
+        cards_in_hand, cards_in_stockpile, cards_in_clientele = [], [], []
+        for c in cards:
+            kind, i, _ = where(c)
+            if i != i_p:
+                continue
+            elif kind == location.HAND:
+                cards_in_hand.append(c)
+            elif kind == location.STOCKPILE:
+                cards_in_stockpile.append(c)
+            elif kind == location.CLIENTELE:
+                cards_in_clientele.append(c)
 
         if cards_in_stockpile and not has_bridge:
             raise GTRError('Cannot give cards from stockpile if '
@@ -1715,11 +2533,11 @@ class Game(object):
             ungiven_mats = unmatched_mats & remaining_mats # Set intersection
 
             if len(extra_mats):
-                lg.debug('Too many cards given : ' + str(extra_mats))
+                lg.debug('Too many cards given : %s', extra_mats)
                 raise GTRError('Extra cards given for Legionary.')
 
             if len(ungiven_mats) and not immune:
-                lg.debug('Require more cards : ' + str(ungiven_mats))
+                lg.debug('Require more cards : %s', ungiven_mats)
                 raise GTRError('Not enough cards given for Legionary.')
 
             return given
@@ -1741,28 +2559,22 @@ class Game(object):
         if hand_cards_to_move or stockpile_cards_to_move or \
                 clientele_cards_to_move:
             if len(hand_cards_to_move):
-                self._log('{0} gives {1} from their hand.'
-                        .format(p.name,
-                            ', '.join(map(str, hand_cards_to_move))))
+                self._log('{0} gives {1} from their hand.',
+                        p.name, ', '.join(map(str, hand_cards_to_move)))
             if len(stockpile_cards_to_move):
-                self._log('{0} gives {1} from their stockpile.'
-                        .format(p.name,
-                            ', '.join(map(str, stockpile_cards_to_move))))
+                self._log('{0} gives {1} from their stockpile.',
+                        p.name, ', '.join(map(str, stockpile_cards_to_move)))
             if len(clientele_cards_to_move):
-                self._log('{0} feeds {1} to the lions.'
-                        .format(p.name,
-                            ', '.join(map(str, clientele_cards_to_move))))
+                self._log('{0} feeds {1} to the lions.',
+                        p.name, ', '.join(map(str, clientele_cards_to_move)))
         else:
             self._log('{0}: "Glory to Rome!"')
 
-        for c in hand_cards_to_move:
-            p.hand.move_card(c, leg_p.stockpile)
-
-        for c in stockpile_cards_to_move:
-            p.stockpile.move_card(c, leg_p.stockpile)
-
-        for c in clientele_cards_to_move:
-            p.clientele.move_card(c, leg_p.vault)
+        p.hand.move_cards(hand_cards_to_move, leg_p.stockpile, trusted=True)
+        p.stockpile.move_cards(stockpile_cards_to_move, leg_p.stockpile,
+                trusted=True)
+        p.clientele.move_cards(clientele_cards_to_move, leg_p.vault,
+                trusted=True)
 
 
     def _handle_merchant(self, a):
@@ -1804,7 +2616,7 @@ class Game(object):
                   int(hand_card is not None) + \
                   int(from_deck)
 
-        if n_cards + len(p.vault) > self._vault_limit(p):
+        if n_cards and n_cards + len(p.vault) > self._vault_limit(p):
             raise GTRError('Not enough room in {0}\'s vault for {1:d} cards.'
                 .format(p.name, n_cards))
 
@@ -1827,10 +2639,14 @@ class Game(object):
                       + ' and a card from their hand.' if hand_card else '.')
                       .format(p.name))
         elif hand_card:
-            self._log('{0} performs Merchant, selling a card from their hand.'
-                .format(p.name))
+            self._log('{0} performs Merchant, selling a card from their hand.',
+                p.name)
         else:
-            self._log('{0} skips Merchant action.')
+            self._log('{0} skips Merchant action.', p.name)
+
+        if from_deck and len(self.library) == 0:
+            self._log('{0} has sold the last Orders card. Game Over.', p.name)
+            self._end_game()
 
         self._pump()
 
@@ -1842,11 +2658,11 @@ class Game(object):
         """
         self._log('Kids in the pool.')
         for p in self._players_in_turn_order()[::-1]:
-            self.stack.push_frame('_do_kids_in_pool', p)
+            self._push_frame(stack.DO_KIDS_IN_POOL, p)
 
         for p in self._players_in_turn_order()[::-1]:
             if self._player_has_active_building(p, 'Senate'):
-                self.stack.push_frame('_await_action', message.USESENATE, p)
+                self._push_frame(stack.AWAIT_ACTION, p, message.USESENATE)
 
         self._pump()
 
@@ -1857,31 +2673,34 @@ class Game(object):
             self.expected_action = message.USESEWER
 
         else:
-            self._handle_usesewer(message.GameAction(message.USESEWER))
+            self._handle_usesewer(message.GameAction.trusted(message.USESEWER))
 
 
     def _handle_usesenate(self, a):
         jacks = a.args
         p = self.active_player
 
-        jacks_in_camps = [] # list of (player, jack) tuples
+        jacks_in_camps = [] # list of (player, jacks) tuples
+        n_jacks_in_camps = 0
 
         players = self._players_in_turn_order(p)
         players.pop(0)
 
         for player in players:
             camp_jacks = [j for j in jacks if j in player.camp]
-            for j in camp_jacks:
-                jacks_in_camps.append( (player, j) )
+            if camp_jacks:
+                jacks_in_camps.append( (player, camp_jacks) )
+                n_jacks_in_camps += len(camp_jacks)
 
-        if len(jacks) > len(jacks_in_camps):
+        if len(jacks) > n_jacks_in_camps:
             raise GTRError('Too many Jacks specified with Senate ({0:d}).'
                     .format(len(jacks)))
         else:
-            for player, jack in jacks_in_camps:
-                self._log('{0} takes {1}\'s Jack with Senate.'
-                        .format(p.name, player.name))
-                player.camp.move_card(jack, p.hand)
+            for player, camp_jacks in jacks_in_camps:
+                for jack in camp_jacks:
+                    self._log('{0} takes {1}\'s Jack with Senate.',
+                            p.name, player.name)
+                player.camp.move_cards(camp_jacks, p.hand, trusted=True)
 
         if self._player_has_active_building(p, 'Sewer'):
             self.active_player = p
@@ -1901,18 +2720,15 @@ class Game(object):
                 raise GTRError('Card not in camp for use with Sewer ({0})'
                         .format(c.name))
 
-        for c in cards:
-            p.camp.move_card(c, p.stockpile)
+        p.camp.move_cards(cards, p.stockpile)
 
         if len(cards):
-            self._log('{0} flushes cards down the Sewer: {1}'
-                    .format(p.name, ', '.join(map(str, cards))))
+            self._log('{0} flushes cards down the Sewer: {1}',
+                    p.name, ', '.join(map(str, cards)))
 
-        for c in p.camp.cards[:]: # Copy since we're removing
-            if c.name == 'Jack':
-                p.camp.move_card(c, self.jacks)
-            else:
-                p.camp.move_card(c, self.pool)
+        camp_jacks = [c for c in p.camp if c.name == 'Jack']
+        p.camp.move_cards(camp_jacks, self.jacks, trusted=True)
+        p.camp.move_all(self.pool)
 
         self._pump()
 
@@ -1923,8 +2739,8 @@ class Game(object):
 
         if building is None:
             self._log('{0} doesn\'t steal anything with Prison, keeping the '
-                    'influence points.'
-                    .format(player.name))
+                    'influence points.',
+                    player.name)
         else:
             p, b = self._find_players_building(building)
             if p is None or b is None:
@@ -1937,12 +2753,13 @@ class Game(object):
             else:
                 i = p.buildings.index(b)
                 player.buildings.append(p.buildings.pop(i))
+                self._track_building(self.players.index(player), b)
                 
                 i = player.influence.index('Stone')
                 p.influence.append(player.influence.pop(i))
 
-                self._log('{0} steals {1}\'s {2} with Prison.'
-                        .format(player.name, p.name, str(b)))
+                self._log('{0} steals {1}\'s {2} with Prison.',
+                        player.name, p.name, str(b))
 
                 self._resolve_building(player, b)
 
@@ -1954,7 +2771,7 @@ class Game(object):
         players = self._players_in_turn_order()[::-1]
 
         for p in players:
-            self.stack.push_frame('_do_end_turn', p)
+            self._push_frame(stack.DO_END_TURN, p)
 
         self._pump()
 
@@ -1967,8 +2784,8 @@ class Game(object):
         p.n_camp_actions = 0
 
         if p.performed_craftsman and has_academy:
-            p.peformed_craftsman = False
-            self.stack.push_frame('_await_action', message.SKIPTHINKER, p)
+            p.performed_craftsman = False
+            self._push_frame(stack.AWAIT_ACTION, p, message.SKIPTHINKER)
 
         self._pump()
 
@@ -1983,11 +2800,12 @@ class Game(object):
         if len(players) <= 1:
             return players
 
-        max_score = self._player_score(players[0])
+        scores = self.scores()
+        max_score = scores[self.players.index(players[0])]['total']
         winners = [players[0]]
 
         for p in players[1:]:
-            score = self._player_score(p)
+            score = scores[self.players.index(p)]['total']
 
             if score > max_score:
                 max_score = score
@@ -2022,19 +2840,21 @@ class Game(object):
     def _end_game(self):
         """The game is over. This determines a winner.
         """
-        for p in self.players:
-            self._log('Player {0} scores {1}'.format(p.name, self._player_score(p)))
+        totals = [parts['total'] for parts in self.scores()]
+        for p, total in zip(self.players, totals):
+            self._log('Player {0} scores {1}', p.name, total)
         lg.info('\n')
 
         winners = self._calc_winners()
+        score = totals[self.players.index(winners[-1])] if winners else None
         if len(winners) == 1:
-            self._log('{0} has won the game with {1} points.'
-                    .format(winners[0].name, self._player_score(winners[0])))
+            self._log('{0} has won the game with {1} points.',
+                    winners[0].name, score)
         elif len(winners) > 1:
             self._log('There is a TIE between players ' +
                     ', '.join([p.name for p in winners[:-1]]) + 
                     ' and {0} with {1} points.'
-                    .format(winners[-1].name, self._player_score(winners[-1])))
+                    .format(winners[-1].name, score))
 
         self._log('Game over. Glory to Rome!')
         self.winners = winners
@@ -2058,13 +2878,13 @@ class Game(object):
             real_winners = self._calc_winners(winners)
 
         if len(real_winners) == 1:
-            self._log('{0} has won the game by building a Forum ({1} points).'
-                    .format(winners[0].name, self._player_score(winners[0])))
+            self._log('{0} has won the game by building a Forum ({1} points).',
+                    winners[0].name, self._player_score(winners[0]))
         elif len(winners) > 1:
             self._log('There is a TIE between players {0}'
-                    ', all of whom have built a Forum and have {1} points.'
-                    .format(', '.join([p.name for p in real_winners]),
-                        self._player_score(real_winners[0])))
+                    ', all of whom have built a Forum and have {1} points.',
+                    ', '.join([p.name for p in real_winners]),
+                    self._player_score(real_winners[0]))
 
         self._log('Game over. Glory to Rome!')
         self.winners = real_winners
@@ -2076,51 +2896,361 @@ class Game(object):
         """Switch on completed building to resolve the "On Completion" effects.
         """
         if str(building_obj) == 'Catacomb':
-            self._log('{0} completed Catacomb, ending the game immediately.'
-                .format(player.name))
+            self._log('{0} completed Catacomb, ending the game immediately.',
+                player.name)
 
             self._end_game()
 
         elif str(building_obj) == 'Foundry':
             n = player.influence_points
 
-            self._log('{0} completed Foundry, performing {1} Laborer actions.'
-                .format(player.name, n))
+            self._log('{0} completed Foundry, performing {1} Laborer actions.',
+                player.name, n)
 
             for _ in range(n):
-                self.stack.push_frame('_await_action', message.LABORER, player)
+                self._push_frame(stack.AWAIT_ACTION, player, message.LABORER)
 
         elif str(building_obj) == 'Garden':
             n = player.influence_points
 
-            self._log('{0} completed Garden, performing {1} Patron actions.'
-                .format(player.name, n))
+            self._log('{0} completed Garden, performing {1} Patron actions.',
+                player.name, n)
 
             for _ in range(n):
-                self.stack.push_frame('_perform_patron_action', player)
+                self._push_frame(stack.PERFORM_PATRON_ACTION, player)
 
         elif str(building_obj) == 'School':
             n = player.influence_points
 
-            self._log('{0} completed School, think {1} times.'
-                .format(player.name, n))
+            self._log('{0} completed School, think {1} times.',
+                player.name, n)
 
             for _ in range(n):
-                self.stack.push_frame('_await_action', message.SKIPTHINKER, player)
+                self._push_frame(stack.AWAIT_ACTION, player, message.SKIPTHINKER)
 
         elif str(building_obj) == 'Amphitheatre':
             n = player.influence_points
 
-            self._log('{0} completed Amphitheatre, performing {1} Craftsman actions.'
-                .format(player.name, n))
+            self._log('{0} completed Amphitheatre, performing {1} Craftsman actions.',
+                player.name, n)
 
             for _ in range(n):
-                self.stack.push_frame('_perform_role_action', player, 'Craftsman')
+                self._push_frame(stack.PERFORM_ROLE_ACTION, player, 'Craftsman')
 
         elif str(building_obj) == 'Prison':
-            self.stack.push_frame('_await_action', message.PRISON, player)
+            self._push_frame(stack.AWAIT_ACTION, player, message.PRISON)
 
         elif str(building_obj) in ('Forum', 'Ludus Magna', 'Gate', 'Storeroom'):
             self._check_forum()
 
+    def _immune_to_legionary(self, player, has_bridge):
+        """True if player needn't give cards to a Legionary demand. A
+        Palisade doesn't protect against a Legionary leader with a Bridge.
+        """
+        return self._player_has_active_building(player, 'Wall') or \
+                (self._player_has_active_building(player, 'Palisade') and
+                        not has_bridge)
+
+
+    # The _legal_<action> methods generate the args of each legal action
+    # of that type for player p. See legal_actions().
+
+    def _legal_yes_or_no(self, p):
+        yield (True,)
+        yield (False,)
+
+    _legal_skipthinker = _legal_yes_or_no
+    _legal_usevomitorium = _legal_yes_or_no
+    _legal_baroraqueduct = _legal_yes_or_no
+
+    def _legal_thinkerorlead(self, p):
+        yield (True,)
+        if len(p.hand):
+            yield (False,)
+
+    def _legal_thinkertype(self, p):
+        if len(self.jacks):
+            yield (True,)
+        if len(self.library):
+            yield (False,)
+
+    def _legal_uselatrine(self, p):
+        yield (None,)
+        for group in _group_by_name(c for c in p.hand if c.name != 'Jack'):
+            yield (group[0],)
+
+    def _legal_leadrole(self, p):
+        for role in cm.get_all_roles():
+            for n_actions, cards in self._legal_action_units(p, role):
+                yield (role, n_actions) + cards
+
+    def _legal_followrole(self, p):
+        yield (0,)
+        for n_actions, cards in self._legal_action_units(p, self.role_led):
+            yield (n_actions,) + cards
+
+    def _legal_action_units(self, player, role_led):
+        """Yield (n_actions, cards) for each way player can lead or
+        follow role_led. See _check_action_units().
+
+        Without a Palace, this is a Jack, a card of role_led or a petition.
+        With one, every number of Jacks and cards of each role is checked
+        with gtrutils.check_petition_combos(), for every n_actions.
+        """
+        has_palace = self._player_has_active_building(player, 'Palace')
+        has_circus = self._player_has_active_building(player, 'Circus')
+
+        roles = [role_led] + [r for r in cm.get_all_roles() if r != role_led]
+        jacks = []
+        by_role = dict((role, []) for role in roles)
+        for c in player.hand:
+            if c.name == 'Jack':
+                jacks.append(c)
+            else:
+                by_role[c.role].append(c)
+        groups = dict((role, _group_by_name(cards))
+                for role, cards in by_role.items())
+
+        if not has_palace:
+            if jacks:
+                yield 1, (jacks[0],)
+            for group in groups[role_led]:
+                yield 1, (group[0],)
+            for n_cards in ((2, 3) if has_circus else (3,)):
+                for role in roles:
+                    for cards in _choices(groups[role], n_cards):
+                        yield 1, cards
+            return
+
+        sizes = [len(jacks)] + [len(by_role[r]) for r in roles]
+        for counts in itertools.product(*[range(n+1) for n in sizes]):
+            n_jacks, n_on, n_off = counts[0], counts[1], list(counts[2:])
+            n_max = n_jacks + n_on + sum(n_off)/2
+            role_choices = None
+            for n_actions in range(max(n_jacks, 1), n_max+1):
+                if not gtrutils.check_petition_combos(n_actions - n_jacks,
+                        n_on, n_off, has_circus, True):
+                    continue
+
+                if role_choices is None:
+                    role_choices = [list(_choices(groups[r], n))
+                            for r, n in zip(roles, counts[1:])]
+
+                for cards in itertools.product(*role_choices):
+                    yield n_actions, tuple(jacks[:n_jacks]) + sum(cards, ())
+
+    def _legal_patronfrompool(self, p):
+        yield (None,)
+        if len(p.clientele) < self._clientele_limit(p):
+            for group in _group_by_name(self.pool):
+                yield (group[0],)
+
+    def _legal_patronfromdeck(self, p):
+        yield (False,)
+        if len(self.library) and len(p.clientele) < self._clientele_limit(p):
+            yield (True,)
+
+    def _legal_patronfromhand(self, p):
+        yield (None,)
+        if len(p.clientele) < self._clientele_limit(p):
+            for group in _group_by_name(c for c in p.hand if c.name != 'Jack'):
+                yield (group[0],)
+
+    def _legal_laborer(self, p):
+        pool_cards = [None] + [g[0] for g in _group_by_name(self.pool)]
+        hand_cards = [None]
+        if self._player_has_active_building(p, 'Dock'):
+            hand_cards.extend(g[0] for g in _group_by_name(
+                c for c in p.hand if c.name != 'Jack'))
+
+        for pool_c in pool_cards:
+            for hand_c in hand_cards:
+                yield tuple(c for c in (pool_c, hand_c) if c is not None)
+
+    def _legal_merchant(self, p):
+        room = self._vault_limit(p) - len(p.vault)
+
+        # (from_deck, stockpile cards), then a card from hand with Basilica.
+        sources = [(False, ())]
+        sources.extend((False, (g[0],)) for g in _group_by_name(p.stockpile))
+        if len(self.library) and \
+                self._player_has_active_building(p, 'Atrium'):
+            sources.append((True, ()))
+
+        hand_cards = [()]
+        if self._player_has_active_building(p, 'Basilica'):
+            hand_cards.extend((g[0],) for g in _group_by_name(
+                c for c in p.hand if c.name != 'Jack'))
+
+        for from_deck, cards in sources:
+            for hand_c in hand_cards:
+                n_cards = int(from_deck) + len(cards) + len(hand_c)
+                if n_cards == 0 or n_cards <= room:
+                    yield (from_deck,) + cards + hand_c
+
+    def _legal_sites(self, p, foundation):
+        """Yield the sites on which p can start foundation."""
+        if foundation.name == 'Statue':
+            sites = catalog.MATERIALS
+        else:
+            sites = (foundation.material,)
+
+        for site in sites:
+            try:
+                self._check_building_start_legal(p, foundation, site)
+            except GTRError:
+                continue
+            yield site
+
+    def _legal_additions(self, p, groups):
+        """Yield (building, material) for each of p's incomplete buildings
+        and the first card of each list in groups that can be added to it.
+        """
+        for b in p.incomplete_buildings:
+            for group in groups:
+                try:
+                    self._check_building_add_legal(p, b.foundation, group[0])
+                except GTRError:
+                    continue
+                yield b, group[0]
+
+    def _legal_craftsman(self, p):
+        yield (None, None, None)
+        groups = _group_by_name(c for c in p.hand if c.name != 'Jack')
+        for group in groups:
+            for site in self._legal_sites(p, group[0]):
+                yield (group[0], None, site)
+        for b, material in self._legal_additions(p, groups):
+            yield (b.foundation, material, None)
+
+    def _legal_usefountain(self, p):
+        yield (False,)
+        if len(self.library):
+            yield (True,)
+
+    def _legal_fountain(self, p):
+        yield (None, None, None)
+        card = p.fountain_card
+        for site in self._legal_sites(p, card):
+            yield (card, None, site)
+        for b, material in self._legal_additions(p, [[card]]):
+            yield (b.foundation, material, None)
+
+    def _legal_architect(self, p):
+        yield (None, None, None)
+        for group in _group_by_name(c for c in p.hand if c.name != 'Jack'):
+            for site in self._legal_sites(p, group[0]):
+                yield (group[0], None, site)
+
+        # Pool and stockpile cards aren't interchangeable even if
+        # they have the same name.
+        groups = _group_by_name(p.stockpile)
+        if self._player_has_active_building(p, 'Archway'):
+            groups.extend(_group_by_name(self.pool))
+        for b, material in self._legal_additions(p, groups):
+            yield (b.foundation, material, None)
+
+    def _legal_stairway(self, p):
+        yield (None, None)
+        materials = [g[0] for g in _group_by_name(p.stockpile)]
+        if self._player_has_active_building(p, 'Archway'):
+            materials.extend(g[0] for g in _group_by_name(self.pool))
+
+        for player in self.players:
+            if player is p:
+                continue
+            for b in player.complete_buildings:
+                if b.is_stairwayed:
+                    continue
+                for material in materials:
+                    if b.composed_of(material.material):
+                        yield (b.foundation, material)
+
+    def _legal_prison(self, p):
+        yield (None,)
+        for player in self.players:
+            if player is p:
+                continue
+            for b in player.complete_buildings:
+                if not p.owns_building(b.foundation):
+                    yield (b.foundation,)
+
+    def _legal_legionary(self, p):
+        prev_revealed = Counter(p.prev_revealed)
+        cards = []
+        for c in p.hand:
+            if c.name == 'Jack':
+                continue
+            elif prev_revealed[c]:
+                prev_revealed[c] -= 1
+            else:
+                cards.append(c)
+
+        groups = _group_by_name(cards)
+        for n in range(min(self.legionary_count, len(cards)) + 1):
+            for demand in _choices(groups, n):
+                yield demand
+
+    def _legal_demanded(self, demanded, zone, immune=False):
+        """Return the choices of cards from zone that meet the demand for
+        the materials of the cards in demanded. Unless immune, as many
+        cards as possible must be given for each material.
+        """
+        choices = []
+        for material, n in Counter(c.material for c in demanded).items():
+            groups = _group_by_name(c for c in zone if c.material == material)
+            n_given = min(n, sum(map(len, groups)))
+            sizes = range(n_given+1) if immune else (n_given,)
+            choices.append([cards for k in sizes
+                for cards in _choices(groups, k)])
+        return choices
+
+    def _legal_takepoolcards(self, p):
+        choices = self._legal_demanded(p.revealed, self.pool)
+        for cards in itertools.product(*choices):
+            yield sum(cards, ())
+
+    def _legal_givecards(self, p):
+        leg_p = self.legionary_player
+        has_bridge = self._player_has_active_building(leg_p, 'Bridge')
+        has_coliseum = self._player_has_active_building(leg_p, 'Coliseum')
+        immune = self._immune_to_legionary(p, has_bridge)
+
+        zones = [p.hand]
+        if has_bridge:
+            zones.append(p.stockpile)
+        if has_coliseum:
+            zones.append(p.clientele)
+
+        choices = []
+        for zone in zones:
+            choices.extend(self._legal_demanded(leg_p.revealed, zone, immune))
+        for cards in itertools.product(*choices):
+            yield sum(cards, ())
+
+    def _legal_usesenate(self, p):
+        camps = []
+        for player in self._players_in_turn_order(p)[1:]:
+            camps.append([c for c in player.camp if c.name == 'Jack'])
+        return _subsets(camps)
+
+    def _legal_usesewer(self, p):
+        return _subsets(_group_by_name(c for c in p.camp if c.name != 'Jack'))
+
+
+
+# Game methods for the frame opcodes, see Game._run().
+_frame_functions = tuple(Game.__dict__[name] for name in stack.FUNCTION_NAMES)
+
+# Game methods that handle each action type, see Game.handle().
+_action_functions = dict(
+        (k, Game.__dict__['_handle_' + name])
+        for k, name in message.action_names().items()
+        if '_handle_' + name in Game.__dict__)
 
+# Game methods that generate the legal args of each action type, see
+# Game.legal_actions().
+_legal_functions = dict(
+        (k, Game.__dict__['_legal_' + name])
+        for k, name in message.action_names().items()
+        if '_legal_' + name in Game.__dict__)
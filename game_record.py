@@ -5,11 +5,12 @@ class GameRecord(object):
     """A record suitable for sending over the network to describe games.
     """
 
-    def __init__(self, game_id, players, started, host):
+    def __init__(self, game_id, players, started, host, finished=False):
         self.game_id = game_id
         self.players = players
         self.started = started
         self.host = host
+        self.finished = finished
 
     def __str__(self):
         s = ('Game {0!s}  Host: {1!s}  Started: {2!s}  Players: {3!s}'
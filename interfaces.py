@@ -16,6 +16,10 @@ class IGTRService(Interface):
         """Unegister a user id with the server. (Delete user.)
         """
 
+    def disconnect_user(uid):
+        """Tell the server that the user's connection was lost.
+        """
+
 
 class IGTRFactory(Interface):
 
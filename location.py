@@ -0,0 +1,100 @@
+"""Track where each card of a game is.
+
+A CardLocations object maps every card ident to the kind of zone that
+holds it, the index of the player that owns the zone, and for building
+zones the ident of the building's foundation. The tables are small
+arrays indexed by ident, so a query is a couple of array lookups.
+
+Zones that are attached to a CardLocations object with Zone.track()
+record the cards added to them. Cards outside tracked zones, eg. the
+cards in a player's revealed zone, which are copies of cards in hand,
+are not recorded.
+"""
+
+from array import array
+
+import cloaca.catalog as catalog
+
+# Kinds of zone
+UNKNOWN     =  0
+LIBRARY     =  1
+JACKS       =  2
+POOL        =  3
+HAND        =  4
+STOCKPILE   =  5
+CLIENTELE   =  6
+VAULT       =  7
+CAMP        =  8
+FOUNTAIN    =  9
+FOUNDATION  = 10
+MATERIALS   = 11
+STAIRWAY    = 12
+
+# Player zones, by attribute name of the Player.
+PLAYER_ZONES = (
+        ('hand', HAND),
+        ('stockpile', STOCKPILE),
+        ('clientele', CLIENTELE),
+        ('vault', VAULT),
+        ('camp', CAMP),
+        )
+
+NO_PLAYER = -1
+NO_BUILDING = -1
+
+
+class CardLocations(object):
+    """Ident-indexed location of every card in one game.
+
+    Attributes:
+        kinds -- array of zone kind for each ident, eg. HAND.
+        players -- array of owning player index, or NO_PLAYER.
+        buildings -- array of the foundation ident for cards in a
+            building's materials or stairway materials, else NO_BUILDING.
+    """
+
+    def __init__(self):
+        n = len(catalog.deck)
+        self.kinds = array('b', [UNKNOWN]*n)
+        self.players = array('b', [NO_PLAYER]*n)
+        self.buildings = array('h', [NO_BUILDING]*n)
+
+    def copy(self):
+        """Return a copy of the tables."""
+        c = CardLocations.__new__(CardLocations)
+        c.kinds = self.kinds[:]
+        c.players = self.players[:]
+        c.buildings = self.buildings[:]
+        return c
+
+    def place(self, cards, kind, player=NO_PLAYER, building=NO_BUILDING):
+        """Record that the cards are now in the specified zone.
+
+        Anonymous cards (negative idents) are ignored.
+        """
+        kinds, players, buildings = self.kinds, self.players, self.buildings
+        for c in cards:
+            i = c.ident
+            if i >= 0:
+                kinds[i] = kind
+                players[i] = player
+                buildings[i] = building
+
+    def where(self, card):
+        """Return (kind, player_index, foundation_ident) for the card.
+
+        For an anonymous card, return (UNKNOWN, NO_PLAYER, NO_BUILDING).
+        """
+        i = card.ident
+        if i < 0:
+            return UNKNOWN, NO_PLAYER, NO_BUILDING
+
+        return self.kinds[i], self.players[i], self.buildings[i]
+
+    def kind(self, card):
+        """Return the kind of zone that holds the card."""
+        return self.kinds[card.ident] if card.ident >= 0 else UNKNOWN
+
+    def player(self, card):
+        """Return the index of the player holding the card or NO_PLAYER."""
+        return self.players[card.ident] if card.ident >= 0 else NO_PLAYER
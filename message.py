@@ -41,6 +41,9 @@ GAMELIST        = 33
 SERVERERROR     = 34
 PRISON          = 35
 TAKEPOOLCARDS   = 36
+PREMOVE         = 37
+CLEARPREMOVES   = 38
+GAMESTATEPATCH  = 39
 
 # A dictionary of the number of arguments for each action type
 # and their signature.
@@ -116,6 +119,10 @@ _action_args_dict = {
     REQGAMELIST    : GTRActionSpec('reqgamelist',    (), () ),
     GAMELIST       : GTRActionSpec('gamelist',       ( (str, 'game_list'), ), () ),
     SERVERERROR    : GTRActionSpec('servererror',    ( (str, 'err_msg'), ), () ),
+    PREMOVE        : GTRActionSpec('premove',
+        (   (str, 'action_json'), (str, 'role'), (bool, 'keep') ), () ),
+    CLEARPREMOVES  : GTRActionSpec('clearpremoves',  (), () ),
+    GAMESTATEPATCH : GTRActionSpec('gamestatepatch', ( (str,  'patch'), ), () ),
 
     THINKERORLEAD  : GTRActionSpec('thinkerorlead',  ( (bool, 'do_thinker'), ), () ),
     THINKERTYPE    : GTRActionSpec('thinkertype',    ( (bool, 'for_jack'), ), () ),
@@ -159,6 +166,13 @@ _action_args_dict = {
     }
 
 
+def action_names():
+    """Return a dict of the name of each action type,
+    eg. {THINKERORLEAD: 'thinkerorlead', ...}.
+    """
+    return dict((k, spec.name) for k, spec in _action_args_dict.items())
+
+
 class Command(object):
     """Command passed to the game server or client.
 
@@ -233,6 +247,18 @@ class GameAction(object):
         self.check_args()
         self.convert_args()
 
+    @classmethod
+    def trusted(cls, action, *args):
+        """Return a GameAction without checking or converting the args.
+
+        This is for actions made by the game engine itself, whose args
+        are already the right types (eg. Card objects, not ints).
+        """
+        a = cls.__new__(cls)
+        a.action = action
+        a.args = list(args)
+        return a
+
     def check_type(self):
         """ Raises an InvalidGameActionError if this is not a valid game
         action.
@@ -10,21 +10,78 @@ import cloaca.card_manager as card_manager
 from cloaca.building import Building
 from cloaca.zone import Zone
 from cloaca.error import GTRError
+from cloaca.slots import SlotsObject
 
 import logging
 
 lg = logging.getLogger(__name__)
 lg.addHandler(logging.NullHandler())
 
-class Player:
-    """ Contains the piles and items controlled by a player. """
+def _notify_after(name):
+    """Return a wrapper for the list method that calls on_change()."""
+    method = getattr(list, name)
+    def wrapper(self, *args):
+        result = method(self, *args)
+        self.on_change()
+        return result
+    wrapper.__name__ = name
+    return wrapper
+
+
+class ObservedList(list):
+    """A list that calls on_change(), a function of no arguments, after
+    every change to its items.
+
+    It pickles and copies as a plain list.
+    """
+
+    __slots__ = ('on_change',)
+
+    def __init__(self, items=(), on_change=None):
+        list.__init__(self, items)
+        self.on_change = on_change if on_change is not None else lambda: None
+
+    def __reduce__(self):
+        return (list, (list(self),))
+
+for _name in ('append', 'extend', 'insert', 'pop', 'remove', 'reverse',
+        'sort', '__setitem__', '__delitem__', '__setslice__', '__delslice__',
+        '__iadd__', '__imul__'):
+    setattr(ObservedList, _name, _notify_after(_name))
+
+
+class Player(SlotsObject):
+    """ Contains the piles and items controlled by a player.
+
+    The building_names, complete_buildings, incomplete_buildings,
+    stairwayed_buildings and influence_points properties are cached. The
+    buildings and influence lists and the buildings themselves tell the
+    player when they change, which clears the cache. Set
+    Player.debug_cache to True to recompute the properties on every
+    access and raise AssertionError if the cache is out of date.
+
+    The game can set on_buildings_change to a function of no arguments,
+    which is called after any change to the player's buildings.
+    """
     max_hand_size = 5
 
+    debug_cache = False
+
+    __slots__ = ('name', 'uid', 'hand', 'stockpile', 'clientele', 'vault',
+            'camp', 'fountain_card', 'n_camp_actions', '_buildings',
+            '_influence', 'revealed', 'prev_revealed', 'performed_craftsman',
+            '_cache', 'on_buildings_change')
+    _fields = ('name', 'uid', 'hand', 'stockpile', 'clientele', 'vault',
+            'camp', 'fountain_card', 'n_camp_actions', 'buildings',
+            'influence', 'revealed', 'prev_revealed', 'performed_craftsman')
+
     def __init__(self, uid, name, hand=None, stockpile=None, clientele=None,
             vault=None, camp=None, fountain_card=None, n_camp_actions=0,
             buildings=None, influence=None, revealed=None, prev_revealed=None,
             performed_craftsman=False):
 
+        self._cache = None
+        self.on_buildings_change = None
         self.name = name
         self.uid = uid
         self.hand = hand if hand is not None else Zone(name='hand')
@@ -39,9 +96,121 @@ class Player:
         self.revealed = revealed if revealed is not None else Zone(name='revealed')
         self.prev_revealed = prev_revealed if prev_revealed is not None else Zone(name='prev_revealed')
         self.performed_craftsman = performed_craftsman
+        self._keep_tallies()
+
+    def __setstate__(self, state):
+        self._cache = None
+        self.on_buildings_change = None
+        SlotsObject.__setstate__(self, state)
+        self._keep_tallies()
+
+    def _keep_tallies(self):
+        """Keep the counts used for scoring and the Forum up to date in
+        the vault and clientele. See Zone.keep_tally().
+        """
+        self.vault.keep_tally()
+        self.clientele.keep_tally()
+
+    def clone(self, locations=None):
+        """Return a copy of this player, sharing the Card objects. See
+        Zone.clone() for locations. The copy has no on_buildings_change
+        function.
+        """
+        p = Player.__new__(Player)
+        p._cache = None
+        p.on_buildings_change = None
+        p.name = self.name
+        p.uid = self.uid
+        p.hand = self.hand.clone(locations)
+        p.stockpile = self.stockpile.clone(locations)
+        p.clientele = self.clientele.clone(locations)
+        p.vault = self.vault.clone(locations)
+        p.camp = self.camp.clone(locations)
+        p.fountain_card = self.fountain_card
+        p.n_camp_actions = self.n_camp_actions
+        p.revealed = self.revealed.clone(locations)
+        p.prev_revealed = self.prev_revealed.clone(locations)
+        p.performed_craftsman = self.performed_craftsman
+
+        buildings = [b.clone(locations) for b in self._buildings]
+        for b in buildings:
+            b.owner = p
+        p._buildings = ObservedList(buildings, p.buildings_changed)
+        p._influence = ObservedList(self._influence, p.influence_changed)
+        return p
 
     def __repr__(self):
-        return 'Player({uid!r}, {name!r})'.format(**self.__dict__)
+        return 'Player({uid!r}, {name!r})'.format(uid=self.uid, name=self.name)
+
+    @property
+    def buildings(self):
+        """List of the player's Building objects."""
+        return self._buildings
+
+    @buildings.setter
+    def buildings(self, buildings):
+        self._buildings = ObservedList(buildings, self.buildings_changed)
+        self.buildings_changed()
+
+    @property
+    def influence(self):
+        """List of the material names of the player's influence."""
+        return self._influence
+
+    @influence.setter
+    def influence(self, influence):
+        self._influence = ObservedList(influence, self.influence_changed)
+        self.influence_changed()
+
+    def buildings_changed(self):
+        """Called when buildings are added, removed, completed or
+        stairwayed. Claim the buildings and clear the cached properties.
+        """
+        for b in self._buildings:
+            b.owner = self
+        self._cache = None
+
+        if self.on_buildings_change is not None:
+            self.on_buildings_change()
+
+    def influence_changed(self):
+        """Called when the influence changes. Clear the cached properties.
+        """
+        self._cache = None
+
+    def _derived(self):
+        """Return the tuple of cached properties, computing them if
+        necessary.
+        """
+        cache = self._cache
+        if cache is None:
+            cache = self._cache = self._compute_derived()
+        elif Player.debug_cache:
+            fresh = self._compute_derived()
+            if fresh != cache:
+                raise AssertionError('Cached properties of {0} are out of date: '
+                        '{1!r} != {2!r}'.format(self.name, cache, fresh))
+        return cache
+
+    def _compute_derived(self):
+        """Return the tuple (building_names, complete_buildings,
+        incomplete_buildings, stairwayed_buildings, influence_points).
+        """
+        buildings = self._buildings
+        building_names = tuple(b.foundation.name for b in buildings)
+        complete = tuple(b for b in buildings if b.complete)
+        incomplete = tuple(b for b in buildings if not b.complete)
+        stairwayed = tuple(b for b in buildings if b.is_stairwayed)
+
+        influence = 2
+        for card in self._influence:
+            value = card_manager.get_value_of_material(card)
+            if value is None:
+                lg.error('Unexpected card {0} in influence'.format(card))
+            else:
+                influence += value
+
+        return building_names, complete, incomplete, stairwayed, influence
 
     def __str__(self):
         return self.name
@@ -54,22 +223,22 @@ class Player:
 
     @property
     def building_names(self):
-        """ Returns a list of the names of all buildings this
+        """ Returns a tuple of the names of all buildings this
         player owns, complete or incomplete.
         """
-        return [b.foundation.name for b in self.buildings]
+        return self._derived()[0]
 
     @property
     def complete_buildings(self):
-        """Returns a list of all owned complete Building objects.
+        """Returns a tuple of all owned complete Building objects.
         """
-        return filter(lambda x: x.complete, self.buildings)
+        return self._derived()[1]
 
     @property
     def incomplete_buildings(self):
-        """Returns a list of all incomplete Building objects.
+        """Returns a tuple of all incomplete Building objects.
         """
-        return [b for b in self.buildings if not b.complete]
+        return self._derived()[2]
 
     def get_building(self, foundation):
         """Gets the Building object from foundation card of the building.
@@ -84,10 +253,10 @@ class Player:
 
     @property
     def stairwayed_buildings(self):
-        """ Returns a list of Building objects that have a material added
+        """ Returns a tuple of Building objects that have a material added
         via the Stairway.
         """
-        return [b for b in self.buildings if b.is_stairwayed]
+        return self._derived()[3]
 
     @property
     def is_following_or_leading(self):
@@ -95,11 +264,4 @@ class Player:
 
     @property
     def influence_points(self):
-        influence = 2
-        for card in self.influence:
-            value = card_manager.get_value_of_material(card)
-            if value is None:
-                lg.error('Unexpected card {0} in influence'.format(card))
-            else:
-                influence += value
-        return influence
+        return self._derived()[4]
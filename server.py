@@ -1,11 +1,19 @@
 from cloaca.game import Game
+import cloaca.game
 from cloaca.player import Player
-from cloaca.game_record import GameRecord
 from cloaca.message import GameAction, Command
 import cloaca.message as message
 from cloaca.error import GTRError, GameOver
+from cloaca.backup import BackupWriter, GameStore
+import cloaca.backup as backup
+from cloaca.expiry import ExpiryIndex
+from cloaca.delta import json_default
+import cloaca.delta as delta
 
 import uuid
+import os
+import threading
+import time
 
 import json
 import pickle
@@ -69,6 +77,7 @@ class GTRServer(object):
             {'game_id': <id>,
              'players': <player_list>,
              'started': <started>,
+             'finished': <finished>,
              'host' : <host_uid>}
 
         Errors
@@ -81,7 +90,8 @@ class GTRServer(object):
         Response
         GAMESTATE: The GameState object is serialized to JSON using each
         object's __dict__. Thus, an object Card(ident=20) is
-        represented as {'ident': 20}.
+        represented as {'ident': 20}. Its 'version' is the version of
+        the game, see GAMESTATEPATCH.
 
         Errors
         Game ID isn't a valid game.
@@ -124,13 +134,37 @@ class GTRServer(object):
         Game is already started.
 
 
+    PREMOVE: Queue a game action to be handled when the game expects it
+        from the user. See Game.queue_premove().
+        Parameters: the GameAction as JSON, eg. '{"action": 21, "args":
+        [1, 45]}', the role that must be led or None, and whether to keep
+        the premove after it's used. Game ID required.
+
+        Response
+        GAMESTATEPATCH: If the action was handled right away, the changes
+            are sent to all players. Otherwise they're only sent to the
+            user, with their queued premoves.
+
+        Errors
+        You aren't playing in this game.
+        The action is invalid, or the game expects it now and rejects it.
+
+
+    CLEARPREMOVES: Drop the user's premoves.
+        No parameters, game ID required
+
+        Response
+        GAMESTATEPATCH: The changes are sent to the user.
+
+
     [GameAction]: Any other commands are considered GameAction commands.
             These are passed to the specified game to handle.
         GameAction parameters, game ID required
 
         Response
-        GAMESTATE: If the action is successfully handled, an updated
-            GameState is sent to all players.
+        GAMESTATEPATCH: The changes to the GameState are sent to each
+            player whose view of the game changed. If there was an
+            error, the user is sent the whole GAMESTATE instead.
 
         Errors
         You aren't playing in this game.
@@ -140,23 +174,181 @@ class GTRServer(object):
         The action is invalid.
         The action is not the expected action for this game.
         There was a GameRulesError while processing the action.
+
+
+    Game state patches
+
+    Every change to a game increases its version. After a game action,
+    the server sends each player a GAMESTATEPATCH with the changes to
+    their view of the game since the last state it sent them, from that
+    state's version to the new one (see delta.make_patch()). A player
+    who hasn't been sent the state of the game gets a full GAMESTATE
+    instead. GAMESTATE is also sent on REQGAMESTATE, on joining a
+    started game and when the game starts. A client that gets a patch
+    that doesn't start from the version it has should send REQGAMESTATE.
+
+
+    Backups
+
+    If a backup directory is given, each game is written to its own file
+    there by a BackupWriter thread after it changes, at most once every
+    backup_interval seconds. handle_command() holds the server's lock,
+    so the writer can take snapshots between commands. Call close() to
+    stop the writer and write the last changes.
+
+    load_backup_file can be a backup directory or a file with a pickled
+    list of games written by older servers. From a directory, only the
+    index of the games is read at startup. Each game is loaded the first
+    time it's used. See backup.GameStore.
+
+
+    Archive
+
+    If an archive directory is given, games are written there gzipped
+    and dropped from memory when they finish, and when nobody has used
+    them for idle_timeout seconds. evict_idle_games() must be called
+    regularly for the latter. Archived games keep their game ids, and are
+    reloaded when they're asked for. At most cache_size finished games
+    are kept in memory.
+
+
+    Expiry
+
+    Games that nobody joins for lobby_ttl seconds after they're created
+    or last joined, and games whose players have all been disconnected
+    for abandoned_ttl seconds, expire. Unstarted games that expire are
+    removed. Started games that expire are archived, if there's an
+    archive directory. The deadlines are kept in an ExpiryIndex, and
+    reap() must be called at next_expiry() to expire the games.
+    register_user() marks a user connected, and disconnect_user() or
+    unregister_user() disconnected.
         
     """
 
-    def __init__(self, backup_file=None, load_backup_file=None):
-        self.games = [] # Games database
+    def __init__(self, backup_dir=None, load_backup_file=None,
+            auto_resolve=False, concurrent_follow=False, backup_interval=1.0,
+            archive_dir=None, idle_timeout=None, cache_size=100,
+            lobby_ttl=None, abandoned_ttl=None):
+        self._archive_dir = archive_dir
+        self._cache_size = cache_size
+        self.idle_timeout = idle_timeout
+
+        # Game expiry. The keys of the index are ('lobby', game_id) and
+        # ('abandoned', game_id).
+        self.lobby_ttl = lobby_ttl
+        self.abandoned_ttl = abandoned_ttl
+        self._expiry = ExpiryIndex()
+        self._connected = set()
+        self._user_games = {} # The game_ids of each uid's games.
+
+        # The version and the flattened state (see delta.flatten()) last
+        # sent to each user, as {game_id: {uid: (version, leaves)}}.
+        self._sent_states = {}
+
+        self.games = GameStore(None, archive_dir, cache_size) # Games database
         self._users = {} # User database
-        self._backup_file = backup_file
         self._load_backup_file = load_backup_file
 
+        # Held while handling a command, and by the backup writer while
+        # it copies the games it's going to write.
+        self._lock = threading.RLock()
+
+        # Setting for new games: handle actions with only one legal
+        # choice without asking the player. See Game.auto_resolve.
+        self.auto_resolve = auto_resolve
+
+        # Setting for new games: let all followers decide at once.
+        # See Game.concurrent_follow.
+        self.concurrent_follow = concurrent_follow
+
         if self._load_backup_file:
             self._load_backup()
 
+        self._backup = None
+        if backup_dir:
+            # Saves reading the index again if the games came from there.
+            index = None
+            if (self.games.directory and os.path.abspath(backup_dir)
+                    == os.path.abspath(self.games.directory)):
+                index = self.games.index()
+
+            self._backup = BackupWriter(backup_dir, backup_interval,
+                    self._lock, index)
+
+            # Games from a single backup file aren't in any directory
+            # yet, so write them all once.
+            if self.games.directory is None:
+                for game in self.games:
+                    self._backup.mark_dirty(game)
+
+            self._backup.start()
+
         self.send_command = lambda _ : None
 
+    def close(self):
+        """Stop the backup writer, writing the games that have changed
+        since its last write.
+        """
+        if self._backup is not None:
+            self._backup.stop()
+
+    def evict_idle_games(self, now=None):
+        """Archive the games nobody has used for idle_timeout seconds.
+        Return their game ids.
+        """
+        if self.idle_timeout is None:
+            return []
+
+        with self._lock:
+            game_ids = self.games.evict_idle(self.idle_timeout, now)
+
+            for game_id in game_ids:
+                self._sent_states.pop(game_id, None)
+
+        if game_ids:
+            lg.info('Archived {0:d} idle games.'.format(len(game_ids)))
+        return game_ids
+
+    def next_expiry(self):
+        """Return the time when the next game expires, or None."""
+        with self._lock:
+            return self._expiry.next_deadline()
+
+    def reap(self, now=None):
+        """Expire the games whose deadlines have passed. Return their
+        game ids.
+        """
+        if now is None:
+            now = time.time()
+
+        expired = []
+        with self._lock:
+            for kind, game_id in self._expiry.pop_expired(now):
+                if game_id not in self.games:
+                    continue
+                if kind == 'abandoned' and not self.games.is_loaded(game_id):
+                    # Already archived.
+                    continue
+
+                game = self.games[game_id]
+                if not game.started:
+                    lg.info('Removing {0} game {1:d}.'.format(kind, game_id))
+                    self._remove_game(game)
+                    expired.append(game_id)
+                elif not game.finished and self.games.evict(game_id):
+                    lg.info('Archived abandoned game {0:d}.'.format(game_id))
+                    self._sent_states.pop(game_id, None)
+                    expired.append(game_id)
+
+        return expired
+
     def handle_command(self, user, command):
         """Muliplexes the action to helper functions.
         """
+        with self._lock:
+            self._handle_command(user, command)
+
+    def _handle_command(self, user, command):
         game_id = command.game
         action = command.action.action
         args = command.action.args
@@ -209,8 +401,25 @@ class GTRServer(object):
             resp = Command(game_id, GameAction(message.JOINGAME))
             self.send_command(user, resp)
 
+        elif action in (message.PREMOVE, message.CLEARPREMOVES):
+            try:
+                handled = self._premove(user, game_id, command.action)
+            except GTRError as e:
+                lg.warning(e.message)
+                self._send_error(user, e.message)
+            else:
+                self._mark_dirty(self.games[game_id])
+
+                # Only the user needs to see a premove that was queued.
+                game = self.games[game_id]
+                users = [p.uid for p in game.players] if handled else [user]
+                if game.started:
+                    for u in users:
+                        self._send_update(u, game_id)
+
         elif action in (message.CREATEGAME, message.JOINGAME,
-                        message.GAMESTATE, message.GAMELIST,
+                        message.GAMESTATE, message.GAMESTATEPATCH,
+                        message.GAMELIST,
                         message.STARTGAME, message.LOGIN):
             # Todo: send error to client.
             # It would be better to check if the action is a GameAction
@@ -221,11 +430,12 @@ class GTRServer(object):
             try:
                 game = self.games[game_id]
             except IndexError as e:
-                msg = ("Couldn't find game {0:d} in {1!s}"
-                        ).format(game_id, self.games[:10])
+                msg = ("Couldn't find game {0!s} in {1:d} games"
+                        ).format(game_id, len(self.games))
 
                 lg.warning(msg)
                 self._send_error(user, msg)
+                return
 
             name = self._userinfo(user)['name']
             player_index = game.find_player_index(name)
@@ -242,20 +452,26 @@ class GTRServer(object):
             lg.debug('Handling action: {0}'.format(repr(action)))
 
             i_active_p = game.active_player_index
+            error = False
 
             if game.finished:
                 self._send_error(user, 'Game {0} has finished.'.format(game_id))
+                error = True
+
+            # Usually this is just the active player. See Game.waiting_for().
+            waiting_for = [game.players.index(p) for p in game.waiting_for()]
 
-            if i_active_p == player_index:
+            if player_index in waiting_for:
                 try:
-                    game.handle(command.action)
+                    game.handle(command.action, game.players[player_index])
                 except GTRError as e:
                     lg.warning(e.message)
                     self._send_error(user, e.message)
+                    error = True
                 except GameOver:
                     lg.info('Game {0} has ended.'.format(game_id))
 
-                self._save_backup()
+                self._mark_dirty(game)
 
             else:
                 msg = ('Received action for player {0!s}, '
@@ -264,10 +480,15 @@ class GTRServer(object):
 
                 lg.warning(msg)
                 self._send_error(user, msg)
+                error = True
 
+            # After an error, the user gets the whole state to undo
+            # whatever their client did with the rejected action.
             for u in [p.uid for p in game.players]:
-                gs = self._get_game_state(u, game_id)
-                self._send_gamestate(u, game_id)
+                if error and u == user:
+                    self._send_gamestate(u, game_id)
+                else:
+                    self._send_update(u, game_id)
 
     def register_user(self, uid, userinfo):
         """Register the dictionary <userinfo> with the unique
@@ -283,18 +504,45 @@ class GTRServer(object):
             lg.warning('  userinfo dict: ' +str(userinfo))
             return
 
-        self._users[uid] = userinfo
+        with self._lock:
+            self._users[uid] = userinfo
+            self._connected.add(uid)
+            for game_id in self._user_games.get(uid, ()):
+                self._expiry.discard(('abandoned', game_id))
 
     def unregister_user(self, uid):
         """Remove the user identified by uid from the the registry.
 
         If the user doesn't exist, this does nothing.
         """
+        self.disconnect_user(uid)
         try:
             del self._users[uid]
         except KeyError:
             pass
 
+    def disconnect_user(self, uid):
+        """Mark the user disconnected, keeping their userinfo. Their
+        games expire after abandoned_ttl seconds if none of their players
+        reconnect.
+        """
+        with self._lock:
+            self._connected.discard(uid)
+            if self.abandoned_ttl is None:
+                return
+
+            deadline = time.time() + self.abandoned_ttl
+            for game_id in self._user_games.get(uid, ()):
+                if not self.games.is_loaded(game_id):
+                    continue
+
+                game = self.games[game_id]
+                if game.finished:
+                    continue
+
+                if not any(p.uid in self._connected for p in game.players):
+                    self._expiry.set(('abandoned', game_id), deadline)
+
     def _get_game_state(self, user, game_id):
         try:
             game = self.games[game_id]
@@ -308,6 +556,8 @@ class GTRServer(object):
             lg.warning('User {0:s} is not part of game {1:d}'.format(username, game_id))
             return None
 
+        self._track(user, game_id)
+
         if game.started:
             username = self._userinfo(user)['name']
 
@@ -323,9 +573,58 @@ class GTRServer(object):
         GAMESTATE command.
         """
         gs = self._get_game_state(user, game)
-        gs_json = json.dumps(gs, sort_keys=True, default=lambda o:o.__dict__)
-        resp = Command(game, GameAction(message.GAMESTATE, gs_json))
+        gs_json = json.dumps(gs, sort_keys=True, default=json_default)
+        resp = Command(game, GameAction.trusted(message.GAMESTATE, gs_json))
         self.send_command(user, resp)
+        self._record_sent_state(user, game, gs, delta.flatten(gs)
+                if gs is not None else None)
+
+    def _send_update(self, user, game_id):
+        """Send the user a GAMESTATEPATCH with the changes to the game
+        since the last state sent to them, if there are any, or the
+        GAMESTATE if they haven't been sent one.
+        """
+        try:
+            version, leaves = self._sent_states[game_id][user]
+        except KeyError:
+            self._send_gamestate(user, game_id)
+            return
+
+        gs = self._get_game_state(user, game_id)
+        if gs is None:
+            return
+
+        new_leaves = delta.flatten(gs)
+        patch = delta.make_patch(leaves, new_leaves, game_id, version,
+                gs.version)
+        if patch is not None:
+            resp = Command(game_id,
+                    GameAction.trusted(message.GAMESTATEPATCH, patch))
+            self.send_command(user, resp)
+            self._record_sent_state(user, game_id, gs, new_leaves)
+
+    def _record_sent_state(self, user, game_id, gs, leaves):
+        """Keep the state sent to the user to make the next patch. The
+        last state of a finished game isn't kept.
+        """
+        if gs is None or gs.finished:
+            sent = self._sent_states.get(game_id)
+            if sent is not None:
+                sent.pop(user, None)
+                if not sent:
+                    del self._sent_states[game_id]
+        else:
+            self._sent_states.setdefault(game_id, {})[user] = (
+                    gs.version, leaves)
+
+    def handler_stats(self):
+        """Return the calls to each game action handler and their total
+        time in seconds, eg. {'thinkertype': {'calls': 10, 'time': 0.002}}.
+
+        The stats are only recorded while Game.profile_handlers is True.
+        They are shared by all the games in the process.
+        """
+        return cloaca.game.handler_stats()
 
     def _send_error(self, user, msg):
         resp = Command(None, GameAction(message.SERVERERROR, msg))
@@ -356,6 +655,9 @@ class GTRServer(object):
             # Send error to client.
             raise
 
+        self._track(user, game_id)
+        self._touch_lobby(game)
+        self._mark_dirty(game)
         return game_id
 
     def _create_game(self, user):
@@ -366,22 +668,54 @@ class GTRServer(object):
         lg.info('Creating new game {0:d}'.format(game_id))
         game.game_id = game_id
         game.host = user
+        game.auto_resolve = self.auto_resolve
+        game.concurrent_follow = self.concurrent_follow
 
         username = self._userinfo(user)['name']
         player_index = game.add_player(user, username)
+        self._track(user, game_id)
+        self._touch_lobby(game)
+        self._mark_dirty(game)
 
         return game_id
         
+    def _premove(self, user, game_id, action):
+        """Queue or clear the user's premoves in a game. Return True if
+        a premove was handled right away, so the game state changed for
+        all players.
+        """
+        try:
+            game = self.games[game_id]
+        except (IndexError, TypeError):
+            raise GTRError('Game {0!s} does not exist.'.format(game_id))
+
+        name = self._userinfo(user)['name']
+        player_index = game.find_player_index(name)
+        if player_index is None:
+            raise GTRError('User {0} is not part of game {1:d}'
+                    .format(name, game_id))
+        player = game.players[player_index]
+
+        if action.action == message.CLEARPREMOVES:
+            game.clear_premoves(player)
+            return False
+
+        action_json, role, keep = action.args
+        try:
+            d = json.loads(action_json)
+            premove = GameAction(d['action'], *d['args'])
+        except (ValueError, KeyError, TypeError):
+            raise GTRError('Invalid premove action: {0}'.format(action_json))
+
+        try:
+            return game.queue_premove(player, premove, role, keep)
+        except GameOver:
+            lg.info('Game {0} has ended.'.format(game_id))
+            return True
+
     def _get_game_list(self):
         """Return list of games"""
-        game_list = []
-        for i, game in enumerate(self.games):
-            players = [p.name for p in game.players]
-            started = game.started
-            host = game.host
-            game_list.append(GameRecord(i, players, started, host))
-        
-        return game_list
+        return self.games.records()
 
     def _start_game(self, user, game_id):
         """Request that specified game starts"""
@@ -405,49 +739,70 @@ class GTRServer(object):
                     .format(name, game_id, game.host))
 
         game.start()
-        self._save_backup()
+        self._expiry.discard(('lobby', game_id))
+        self._mark_dirty(game)
         
         return None
 
     def _load_backup(self):
-        """ Loads backup from JSON-encoded constructed file.
+        """Load the games from a backup directory, or from a file with a
+        pickled list of games.
         """
-        if self.games:
+        if self.games.n_loaded():
             lg.warning('Error! Can\'t load backup file if games already exist')
             return
 
+        if os.path.isdir(self._load_backup_file):
+            self.games = GameStore(self._load_backup_file,
+                    self._archive_dir, self._cache_size)
+            return
+
         try:
-            f = open(self._load_backup_file, 'r')
+            f = open(self._load_backup_file, 'rb')
         except IOError:
             lg.warning('Can\'t open backup file: ' + self._load_backup_file)
             return
 
         with f:
             try:
-                game_states = pickle.load(f)
-            except pickle.PickleError:
-                lg.warning('Error! Couldn\'t load games from backup file: ' + self._load_backup_file)
+                game_states = backup.load_pickle(f)
+            except Exception:
+                lg.exception('Error! Couldn\'t load games from backup file: ' + self._load_backup_file)
                 return
 
-            self.games = [gs for gs in game_states]
-
-    def _save_backup(self):
-        """ Writes pickled list of game states to backup file.
+            for game in game_states:
+                self.games.append(game)
+
+    def _track(self, user, game_id):
+        """Note that the user plays in the game."""
+        self._user_games.setdefault(user, set()).add(game_id)
+
+    def _touch_lobby(self, game):
+        """Restart the lobby_ttl of an unstarted game."""
+        if self.lobby_ttl is not None and not game.started:
+            self._expiry.set(('lobby', game.game_id),
+                    time.time() + self.lobby_ttl)
+
+    def _remove_game(self, game):
+        """Delete the game, and its backup."""
+        game_id = game.game_id
+        self.games.remove(game_id)
+        if self._backup is not None:
+            self._backup.mark_removed(game_id)
+
+        self._expiry.discard(('lobby', game_id))
+        self._expiry.discard(('abandoned', game_id))
+        self._sent_states.pop(game_id, None)
+        for p in game.players:
+            self._user_games.get(p.uid, set()).discard(game_id)
+
+    def _mark_dirty(self, game):
+        """Increase the version of the game that changed, have it written
+        to the backup directory, and archive it if it has finished.
         """
-        if self._backup_file:
-
-            game_states = [g for g in self.games]
-
-            try:
-                f = open(self._backup_file, 'w')
-            except IOError:
-                lg.warning('Can\'t write to file ' + self._backup_file)
-                return
-            
-            with f:
-                try:
-                    pickle.dump(game_states, f)
-                except pickle.PickleError:
-                    lg.warning('Error writing backup: ' + self._backup_file)
-                    return
+        game.version += 1
+        if self._backup is not None:
+            self._backup.mark_dirty(game)
 
+        if game.finished:
+            self.games.evict(game.game_id)
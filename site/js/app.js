@@ -29,11 +29,53 @@ function($, _, SockJS, Util, Display, Games, FSM, Game, Net){
             $list[0].scrollTop = $list[0].scrollHeight;
         }
 
+        // The last game state received for each game id, kept to apply
+        // GAMESTATEPATCH messages to.
+        var gameStates = {};
+
+        // Apply a patch from the server to the game state. Returns false,
+        // leaving the state unchanged, if the patch doesn't start from the
+        // state's version. Then the whole state must be requested.
+        function applyPatch(state, patch) {
+            if(state.version !== patch.from) {
+                return false;
+            }
+
+            patch.set.forEach(function(s) {
+                var path = s[0], obj = state;
+                for(var i=0; i<path.length-1; i++) {
+                    obj = obj[path[i]];
+                }
+                obj[path[path.length-1]] = s[1];
+            });
+
+            patch.splice.forEach(function(s) {
+                var path = s[0], obj = state;
+                for(var i=0; i<path.length; i++) {
+                    obj = obj[path[i]];
+                }
+                Array.prototype.splice.apply(obj, [s[1], s[2]].concat(s[3]));
+            });
+
+            state.version = patch.to;
+            return true;
+        }
+
         // Handle messages sent by the server.
         function handleCommand(game, action, args) {
             
             if (action == Util.Action.GAMESTATE) {
-                update_game_state(game, JSON.parse(args[0]));
+                gameStates[game] = JSON.parse(args[0]);
+                update_game_state(game, gameStates[game]);
+
+            } else if (action == Util.Action.GAMESTATEPATCH) {
+                var state = gameStates[game];
+                if(state && applyPatch(state, JSON.parse(args[0]))) {
+                    update_game_state(game, state);
+                } else {
+                    console.log('Missed an update to game '+game+'.');
+                    sendAction(game, Util.Action.REQGAMESTATE);
+                }
 
             } else if (action == Util.Action.GAMELIST) {
                 update_game_list(args);
@@ -224,7 +224,8 @@ function($){
         STARTGAME       : 31,
         REQGAMELIST     : 32,
         GAMELIST        : 33,
-        SERVERERROR     : 34
+        SERVERERROR     : 34,
+        GAMESTATEPATCH  : 39
     };
 
     util._cardDictionary = {
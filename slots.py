@@ -0,0 +1,40 @@
+"""Base class for the game objects that use __slots__.
+
+A game server holds many Game objects, each with its players, buildings
+and zones, so these classes use __slots__ rather than an instance
+__dict__. SlotsObject keeps the rest of the code working as if they
+didn't:
+
+    - obj.__dict__ is a property that builds a dict of the attributes
+      named in the class's _fields. This is what encode.encode() and
+      the JSON encoders in server.py use, so their output is the same.
+    - __getstate__ and __setstate__ use the same dict, so pickles (of
+      any protocol) and copy.deepcopy() work, and objects pickled before
+      the class had __slots__ can still be loaded.
+"""
+
+class SlotsObject(object):
+    """Subclasses define __slots__ for their storage and _fields, the
+    names of the attributes (slots or properties) that make up their
+    state, in the order of the old instance __dict__.
+    """
+
+    __slots__ = ()
+    _fields = ()
+
+    @property
+    def __dict__(self):
+        d = {}
+        for k in self._fields:
+            try:
+                d[k] = getattr(self, k)
+            except AttributeError:
+                pass
+        return d
+
+    def __getstate__(self):
+        return self.__dict__
+
+    def __setstate__(self, state):
+        for k, v in state.items():
+            setattr(self, k, v)
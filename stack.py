@@ -1,9 +1,54 @@
-class Stack(object):
+"""The Game's stack of frames, the steps of a turn still to be executed.
+
+A frame is an opcode naming a Game method, the index of the player it
+applies to, and at most one other argument, such as a role name or a
+message action code. Frames hold only small ints and strings, so the
+stack is cheap to copy and pickle and can be encoded in JSON.
+"""
+
+from cloaca.slots import SlotsObject
+
+# Frame opcodes. The Game method for each is in FUNCTION_NAMES.
+TAKE_TURN_STACKED           =  0
+AWAIT_ACTION                =  1
+PERFORM_THINKER_ACTION      =  2
+PERFORM_ROLE_BEING_LED      =  3
+PERFORM_ROLE_ACTION         =  4
+PERFORM_CLIENTELE_ACTION    =  5
+PERFORM_PATRON_ACTION       =  6
+KIDS_IN_POOL                =  7
+DO_KIDS_IN_POOL             =  8
+END_TURN                    =  9
+DO_END_TURN                 = 10
+ADVANCE_TURN                = 11
+
+FUNCTION_NAMES = (
+        '_take_turn_stacked',
+        '_await_action',
+        '_perform_thinker_action',
+        '_perform_role_being_led',
+        '_perform_role_action',
+        '_perform_clientele_action',
+        '_perform_patron_action',
+        '_kids_in_pool',
+        '_do_kids_in_pool',
+        '_end_turn',
+        '_do_end_turn',
+        '_advance_turn',
+        )
+
+NO_PLAYER = -1
+
+
+class Stack(SlotsObject):
+    __slots__ = ('stack',)
+    _fields = __slots__
+
     def __init__(self, stack=None):
         self.stack = stack if stack else []
 
-    def push_frame(self, function_name, *args):
-        self.stack.append(Frame(function_name, *args))
+    def push_frame(self, opcode, player=NO_PLAYER, arg=None):
+        self.stack.append(Frame(opcode, player, arg))
 
     def remove(self, item):
         self.stack.remove(item)
@@ -15,14 +60,61 @@ class Stack(object):
         return 'Stack({0!r})'.format(self.stack)
 
 
-class Frame(object):
-    def __init__(self, function_name, *args):
-        self.function_name = function_name
-        self.args = args
-        self.executed = False
+class Frame(SlotsObject):
+    """One step of a turn.
+
+    Attributes:
+        opcode -- (int) one of the opcodes above.
+        player -- (int) index of the player in Game.players, or NO_PLAYER.
+        arg -- the other argument of the function, or None.
+
+    The Game method is called as method(), method(player) or
+    method(player, arg), depending on which of player and arg are set.
+    """
+
+    __slots__ = ('opcode', 'player', 'arg')
+    _fields = __slots__
+
+    def __init__(self, opcode, player=NO_PLAYER, arg=None):
+        self.opcode = opcode
+        self.player = player
+        self.arg = arg
+
+    def __setstate__(self, state):
+        if 'function_name' in state:
+            self._set_old_state(state)
+        else:
+            SlotsObject.__setstate__(self, state)
+
+    def _set_old_state(self, state):
+        """Convert the state of a frame pickled by older versions, the
+        function name and its args. The player is left as the Player
+        object for Game.__setstate__() to replace with its index.
+        """
+        name, args = state['function_name'], state['args']
+        self.opcode = FUNCTION_NAMES.index(name)
+        if self.opcode == AWAIT_ACTION:
+            # This one took (action, player).
+            args = args[::-1]
+        self.player = args[0] if args else NO_PLAYER
+        self.arg = args[1] if len(args) > 1 else None
+
+    @property
+    def function_name(self):
+        return FUNCTION_NAMES[self.opcode]
+
+    def to_list(self):
+        """Return [opcode, player, arg], eg. for encoding in JSON."""
+        return [self.opcode, self.player, self.arg]
+
+    @classmethod
+    def from_list(cls, l):
+        """Inverse of to_list()."""
+        return cls(*l)
 
     def __str__(self):
         return 'Frame({0})'.format(self.function_name)
 
     def __repr__(self):
-        return 'Frame({0}, {1})'.format(self.function_name, self.args)
+        return 'Frame({0}, {1!r}, {2!r})'.format(
+                self.function_name, self.player, self.arg)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+
+from cloaca.game import Game
+import cloaca.game
+from cloaca.error import GameOver, GTRError
+import cloaca.encode as encode
+
+import cloaca.message as message
+
+import cloaca.test.test_setup as test_setup
+from cloaca.test.test_setup import TestDeck
+
+import pickle
+import random
+import unittest
+
+
+class TestAutoResolve(unittest.TestCase):
+    """Test handling actions with only one legal choice automatically.
+    """
+
+    def setUp(self):
+        self.deck = TestDeck()
+        d = self.deck
+
+        self.game = test_setup.two_player_lead('Legionary', deck=d)
+        self.p1, self.p2 = self.game.players
+        self.p1.hand.set_content([d.atrium0])
+        self.p2.hand.set_content([d.road0])
+
+    def test_off_by_default(self):
+        d = self.deck
+        self.game.handle(message.GameAction(message.LEGIONARY, d.atrium0))
+        self.assertEqual(self.game.expected_action, message.TAKEPOOLCARDS)
+
+    def test_nothing_to_give(self):
+        """The empty pool and p2's hand don't have what's demanded, so
+        the game goes on to the next turn.
+        """
+        d = self.deck
+        self.game.auto_resolve = True
+        self.game.handle(message.GameAction(message.LEGIONARY, d.atrium0))
+
+        self.assertEqual(self.game.expected_action, message.THINKERORLEAD)
+        self.assertIs(self.game.leader, self.p2)
+        self.assertIn(d.road0, self.p2.hand)
+
+    def test_forced_give(self):
+        """A player with only one way to give cards gives them."""
+        d = self.deck
+        self.p2.hand.set_content([d.road0, d.shrine0])
+        self.game.auto_resolve = True
+        self.game.handle(message.GameAction(message.LEGIONARY, d.atrium0))
+
+        self.assertIn(d.shrine0, self.p1.stockpile)
+        self.assertEqual(self.game.expected_action, message.THINKERORLEAD)
+
+    def test_forced_error(self):
+        """An error from a forced action isn't raised for the action that
+        led to it, and the game waits for the forced one instead.
+        """
+        d = self.deck
+        self.p2.hand.set_content([d.road0, d.shrine0])
+        self.game.auto_resolve = True
+
+        def fail(game, a):
+            raise GTRError('Forced action failed.')
+        handlers = cloaca.game._action_functions
+        self.addCleanup(handlers.__setitem__, message.GIVECARDS,
+                handlers[message.GIVECARDS])
+        handlers[message.GIVECARDS] = fail
+
+        self.game.handle(message.GameAction(message.LEGIONARY, d.atrium0))
+
+        self.assertEqual(self.game.expected_action, message.GIVECARDS)
+        self.assertIs(self.game.active_player, self.p2)
+        self.assertIn(d.shrine0, self.p2.hand)
+
+    def test_start(self):
+        """With no cards in hand, the first leader has to think. They
+        can choose Jack or cards, so the game waits for that.
+        """
+        g = Game()
+        g.auto_resolve = True
+        g.add_player(0, 'p1')
+        g.add_player(1, 'p2')
+        g.controlled_start()
+
+        self.assertEqual(g.expected_action, message.THINKERTYPE)
+        self.assertIs(g.active_player, g.players[0])
+
+    def test_saved(self):
+        self.game.auto_resolve = True
+
+        self.assertTrue(self.game.clone().auto_resolve)
+        self.assertTrue(pickle.loads(pickle.dumps(self.game)).auto_resolve)
+        self.assertTrue(encode.json_to_game(
+            encode.game_to_json(self.game)).auto_resolve)
+
+    def test_old_save(self):
+        """Games saved before the setting existed have it off."""
+        state = self.game.__getstate__()
+        del state['auto_resolve']
+        g = Game.__new__(Game)
+        g.__setstate__(state)
+        self.assertFalse(g.auto_resolve)
+
+
+class TestAutoResolveGames(unittest.TestCase):
+    """Random games play the same with and without auto-resolution,
+    with fewer actions from the players.
+    """
+
+    def play(self, seed, auto_resolve):
+        rng = random.Random(seed)
+        random.seed(seed)
+
+        g = Game()
+        g.headless = True
+        g.auto_resolve = auto_resolve
+        for i in range(3):
+            g.add_player(i, 'p{0:d}'.format(i+1))
+        g.start()
+
+        n_actions = 0
+        try:
+            while g.turn_number < 20:
+                actions = list(g.legal_actions(g.active_player))
+                a = actions[0] if len(actions) == 1 else rng.choice(actions)
+                g.handle(a)
+                n_actions += 1
+        except GameOver:
+            pass
+
+        return g, n_actions
+
+    def test_same_game(self):
+        g1, n1 = self.play(0, False)
+        g2, n2 = self.play(0, True)
+
+        g1.auto_resolve = True
+        self.assertEqual(encode.game_to_json(g1), encode.game_to_json(g2))
+        self.assertLess(n2, n1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,567 @@
+#!/usr/bin/env python
+
+from cloaca.server import GTRServer
+from cloaca.game import Game
+from cloaca.message import GameAction, Command
+import cloaca.message as m
+import cloaca.backup as backup
+from cloaca.backup import BackupWriter, GameStore
+from cloaca.player import Player
+from cloaca.building import Building
+from cloaca.card import Card
+import cloaca.stack as stack
+
+import os
+import pickle
+from StringIO import StringIO
+import shutil
+import json
+import tempfile
+import time
+import unittest
+from uuid import uuid4
+
+
+def new_game(game_id):
+    g = Game()
+    g.game_id = game_id
+    g.add_player(uuid4().int, 'p1')
+    return g
+
+
+class TestBackupWriter(unittest.TestCase):
+    """Test writing dirty games to a backup directory.
+    """
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_write_atomically(self):
+        path = os.path.join(self.dir, 'a.pickle')
+        backup.write_atomically(path, [1, 2])
+        backup.write_atomically(path, [3])
+
+        with open(path, 'rb') as f:
+            self.assertEqual(pickle.load(f), [3])
+        self.assertEqual(os.listdir(self.dir), ['a.pickle'])
+
+    def test_flush(self):
+        w = BackupWriter(self.dir)
+        g0, g1 = new_game(0), new_game(1)
+        w.mark_dirty(g0)
+        w.mark_dirty(g1)
+        w.mark_dirty(g0)
+        w.flush()
+
+        self.assertEqual(w.n_writes, 2)
+        games = backup.load_games(self.dir)
+        self.assertEqual([g.game_id for g in games], [0, 1])
+        self.assertEqual(games[1].players[0].name, 'p1')
+
+        # Nothing is dirty anymore.
+        w.flush()
+        self.assertEqual(w.n_writes, 2)
+
+    def test_snapshot(self):
+        """Changes made after the game was marked are written if they're
+        made before the write.
+        """
+        w = BackupWriter(self.dir)
+        g = new_game(0)
+        w.mark_dirty(g)
+        g.add_player(uuid4().int, 'p2')
+        w.flush()
+
+        g.add_player(uuid4().int, 'p3')
+        game = backup.load_games(self.dir)[0]
+        self.assertEqual([p.name for p in game.players], ['p1', 'p2'])
+
+    def test_coalesce(self):
+        """A game changed many times within the interval is written at
+        most once per interval.
+        """
+        w = BackupWriter(self.dir, interval=0.2)
+        w.start()
+        g = new_game(0)
+        for _ in range(100):
+            w.mark_dirty(g)
+            time.sleep(0.001)
+        w.stop()
+
+        self.assertGreaterEqual(w.n_writes, 1)
+        self.assertLessEqual(w.n_writes, 3)
+
+    def test_stop(self):
+        """Stopping writes the games that are still dirty."""
+        w = BackupWriter(self.dir, interval=60)
+        w.start()
+        g = new_game(0)
+        w.mark_dirty(g)
+        time.sleep(0.05)
+        g.add_player(uuid4().int, 'p2')
+        w.mark_dirty(g)
+        w.stop()
+
+        game = backup.load_games(self.dir)[0]
+        self.assertEqual(len(game.players), 2)
+
+    def test_retry(self):
+        """A game that couldn't be written stays dirty and is written in
+        the next round.
+        """
+        w = BackupWriter(self.dir)
+        # Nothing can be moved onto a directory.
+        os.mkdir(backup.game_file(self.dir, 0))
+        w.mark_dirty(new_game(0))
+        w.mark_dirty(new_game(1))
+        w.flush()
+
+        self.assertEqual(w.n_writes, 1)
+        self.assertEqual(sorted(backup.load_index(self.dir)), [1])
+
+        os.rmdir(backup.game_file(self.dir, 0))
+        w.flush()
+
+        self.assertEqual(w.n_writes, 2)
+        self.assertEqual(sorted(backup.load_index(self.dir)), [0, 1])
+        self.assertEqual(backup.load_games(self.dir)[0].game_id, 0)
+
+    def test_removed(self):
+        w = BackupWriter(self.dir)
+        w.mark_dirty(new_game(0))
+        w.mark_dirty(new_game(1))
+        w.flush()
+        w.mark_removed(0)
+        w.flush()
+
+        self.assertEqual(sorted(os.listdir(self.dir)),
+                ['game-1.pickle', 'index.pickle'])
+        self.assertEqual(sorted(backup.load_index(self.dir)), [1])
+
+    def test_load_gap(self):
+        w = BackupWriter(self.dir)
+        w.mark_dirty(new_game(0))
+        w.mark_dirty(new_game(2))
+        w.flush()
+
+        with open(os.path.join(self.dir, 'game-3.pickle.tmp'), 'w') as f:
+            f.write('partial')
+
+        games = backup.load_games(self.dir)
+        self.assertEqual(len(games), 3)
+        self.assertIsNone(games[1])
+        self.assertEqual(games[2].game_id, 2)
+
+
+class TestGameStore(unittest.TestCase):
+    """Test the lobby index and loading games when they're first used.
+    """
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+        w = BackupWriter(self.dir)
+        g = new_game(0)
+        g.add_player(uuid4().int, 'p2')
+        g.start()
+        w.mark_dirty(g)
+        w.mark_dirty(new_game(2))
+        w.flush()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_records(self):
+        store = GameStore(self.dir)
+        self.assertEqual(len(store), 3)
+
+        records = store.records()
+        self.assertEqual([r.game_id for r in records], [0, 2])
+        self.assertEqual(records[0].players, ['p1', 'p2'])
+        self.assertTrue(records[0].started)
+        self.assertFalse(records[0].finished)
+        self.assertFalse(records[1].started)
+
+        self.assertFalse(any(store.is_loaded(i) for i in range(3)))
+
+    def test_lazy(self):
+        store = GameStore(self.dir)
+        g = store[0]
+        self.assertTrue(store.is_loaded(0))
+        self.assertFalse(store.is_loaded(2))
+        self.assertIs(store[0], g)
+        self.assertEqual([p.name for p in g.players], ['p1', 'p2'])
+
+        # The records follow the loaded games.
+        g.players.pop()
+        self.assertEqual(store.records()[0].players, ['p1'])
+
+    def test_missing(self):
+        """Game ids that aren't in the index don't exist, and games that
+        can't be loaded are replaced by empty games.
+        """
+        os.remove(backup.game_file(self.dir, 2))
+        store = GameStore(self.dir)
+        self.assertEqual(store[2].game_id, 2)
+        self.assertEqual(store[2].players, [])
+
+        for game_id in (1, 3, -1, None):
+            self.assertNotIn(game_id, store)
+            with self.assertRaises(IndexError):
+                store[game_id]
+
+    def test_remove(self):
+        store = GameStore(self.dir)
+        store[0]
+        store.remove(0)
+        store.remove(2)
+
+        self.assertEqual(store.records(), [])
+        self.assertEqual(store.n_loaded(), 0)
+        self.assertEqual(len(store), 3)
+        with self.assertRaises(IndexError):
+            store[0]
+
+        # Game ids aren't reused.
+        store.append(new_game(3))
+        self.assertEqual([r.game_id for r in store.records()], [3])
+
+    def test_append(self):
+        store = GameStore(self.dir)
+        store.append(new_game(3))
+        self.assertEqual(len(store), 4)
+        self.assertEqual(store[3].game_id, 3)
+        self.assertEqual([g.game_id for g in store], [0, 2, 3])
+
+    def test_no_index(self):
+        """The index is built for directories written without one."""
+        os.remove(os.path.join(self.dir, backup.INDEX_FILE))
+
+        store = GameStore(self.dir)
+        self.assertEqual(len(store), 3)
+        self.assertEqual(store.records()[0].players, ['p1', 'p2'])
+
+        w = BackupWriter(self.dir)
+        w.mark_dirty(new_game(4))
+        w.flush()
+        self.assertEqual(sorted(backup.load_index(self.dir)), [0, 2, 4])
+
+
+class TestArchive(unittest.TestCase):
+    """Test evicting games from memory to the archive.
+    """
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.store = GameStore(archive_dir=self.dir, cache_size=2)
+        for game_id in range(4):
+            self.store.append(new_game(game_id))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def finish(self, game_id):
+        g = self.store[game_id]
+        g.winners = [g.players[0]]
+
+    def test_evict(self):
+        store = self.store
+        self.assertTrue(store.evict(1))
+        self.assertFalse(store.is_loaded(1))
+        self.assertTrue(os.path.exists(backup.archive_file(self.dir, 1)))
+        self.assertEqual(store.records()[1].players, ['p1'])
+        self.assertFalse(store.evict(1))
+
+        # An unfinished game is back for good, so its archive is removed.
+        g = store[1]
+        self.assertEqual(g.game_id, 1)
+        self.assertTrue(store.is_loaded(1))
+        self.assertFalse(os.path.exists(backup.archive_file(self.dir, 1)))
+
+    def test_no_archive(self):
+        store = GameStore()
+        store.append(new_game(0))
+        self.assertFalse(store.evict(0))
+        self.assertEqual(store.evict_idle(0), [])
+        self.assertTrue(store.is_loaded(0))
+
+    def test_evict_idle(self):
+        store = self.store
+        now = time.time()
+        store[2]
+        store._last_used[2] = now + 100
+
+        self.assertEqual(sorted(store.evict_idle(50, now + 60)), [0, 1, 3])
+        self.assertEqual(store.n_loaded(), 1)
+        self.assertTrue(store.is_loaded(2))
+
+    def test_cache(self):
+        """Finished games are kept in a bounded cache."""
+        store = self.store
+        for game_id in range(3):
+            self.finish(game_id)
+            store.evict(game_id)
+
+        self.assertEqual(store.n_loaded(), 3)
+        self.assertFalse(store.is_loaded(0))
+
+        self.assertTrue(store[0].finished)
+        self.assertTrue(os.path.exists(backup.archive_file(self.dir, 0)))
+        self.assertFalse(store.is_loaded(1))
+        self.assertTrue(store.is_loaded(2))
+        self.assertEqual(store.records()[0].finished, True)
+
+    def test_restart(self):
+        self.finish(0)
+        self.store.evict(0)
+        self.store.evict(3)
+
+        store = GameStore(archive_dir=self.dir)
+        self.assertEqual(len(store), 4)
+        self.assertTrue(store[0].finished)
+        self.assertEqual(store[3].players[0].name, 'p1')
+
+
+class OldStyle:
+    """Stands in for Player and Building, which were old-style classes
+    in older backups.
+    """
+
+
+def old_style_pickle(obj, module, name):
+    """Return obj pickled the way an old-style class instance was."""
+    old = OldStyle()
+    old.__dict__.update(obj.__dict__)
+    return pickle.dumps(old, 0).replace(
+            '{0}\nOldStyle\n'.format(__name__), '{0}\n{1}\n'.format(module, name))
+
+
+class TestLegacyUnpickler(unittest.TestCase):
+    """Test loading objects pickled by older versions.
+    """
+
+    def load(self, data):
+        return backup.load_pickle(StringIO(data))
+
+    def test_player(self):
+        p = Player(1, 'p1')
+        p.hand.set_content([Card(30), Card(50)])
+        p.buildings.append(Building(Card(60), 'Wood', [Card(70)]))
+        data = old_style_pickle(p, 'cloaca.player', 'Player')
+
+        p2 = self.load(data)
+        self.assertIsInstance(p2, Player)
+        self.assertEqual(p2.name, 'p1')
+        self.assertEqual(p2.hand, p.hand)
+        self.assertEqual(p2.buildings, p.buildings)
+        self.assertEqual(list(p2.building_names), ['Foundry'])
+
+    def test_building(self):
+        b = Building(Card(60), 'Wood', [Card(70)], complete=True)
+        b2 = self.load(old_style_pickle(b, 'cloaca.building', 'Building'))
+        self.assertIsInstance(b2, Building)
+        self.assertEqual(b2, b)
+        self.assertIsNone(b2.owner)
+        self.assertIs(b2.foundation, Card(60))
+
+
+class TestServerBackup(unittest.TestCase):
+    """Test restarting a server from its backups.
+    """
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.uids = [uuid4().int for _ in range(2)]
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def server(self, *args, **kwargs):
+        s = GTRServer(*args, **kwargs)
+        s.send_command = lambda uid, command: None
+        for i, uid in enumerate(self.uids):
+            s.register_user(uid, dict(name='p{0:d}'.format(i+1)))
+        return s
+
+    def play(self, s):
+        u1, u2 = self.uids
+        s.handle_command(u1, Command(None, GameAction(m.REQCREATEGAME)))
+        s.handle_command(u1, Command(None, GameAction(m.REQCREATEGAME)))
+        s.handle_command(u2, Command(1, GameAction(m.REQJOINGAME)))
+        s.handle_command(u1, Command(1, GameAction(m.REQSTARTGAME)))
+
+        game = s.games[1]
+        uid = game.players[game.active_player_index].uid
+        s.handle_command(uid, Command(1,
+                GameAction(m.THINKERORLEAD, True)))
+
+    def test_restart(self):
+        backup_dir = os.path.join(self.dir, 'backup')
+        s = self.server(backup_dir, backup_interval=60)
+        self.play(s)
+        s.close()
+
+        self.assertEqual(sorted(os.listdir(backup_dir)),
+                ['game-0.pickle', 'game-1.pickle', 'index.pickle'])
+
+        s2 = self.server(None, backup_dir)
+        self.assertEqual(len(s2.games), 2)
+        g = s2.games[1]
+        self.assertEqual([p.name for p in g.players], ['p1', 'p2'])
+        self.assertEqual(g.expected_action, m.THINKERTYPE)
+        self.assertEqual(g.game_log, s.games[1].game_log)
+
+    def test_lazy_restart(self):
+        """The game list comes from the index, and games are loaded when
+        they're used.
+        """
+        backup_dir = os.path.join(self.dir, 'backup')
+        s = self.server(backup_dir)
+        self.play(s)
+        s.close()
+
+        s2 = self.server(backup_dir, backup_dir)
+        responses = []
+        s2.send_command = lambda uid, command: responses.append(command)
+        u1, u2 = self.uids
+
+        s2.handle_command(u1, Command(None, GameAction(m.REQGAMELIST)))
+        records = json.loads(responses[-1].action.args[0])
+        self.assertEqual([r['players'] for r in records],
+                [['p1'], ['p1', 'p2']])
+        self.assertEqual([r['started'] for r in records], [False, True])
+        self.assertFalse(s2.games.is_loaded(0))
+        self.assertFalse(s2.games.is_loaded(1))
+
+        s2.handle_command(u2, Command(1, GameAction(m.REQGAMESTATE)))
+        self.assertEqual(responses[-1].action.action, m.GAMESTATE)
+        self.assertTrue(s2.games.is_loaded(1))
+        self.assertFalse(s2.games.is_loaded(0))
+        s2.close()
+
+    def test_missing_game(self):
+        """A game missing from the backup is replaced by an empty one."""
+        backup_dir = os.path.join(self.dir, 'backup')
+        s = self.server(backup_dir)
+        self.play(s)
+        s.close()
+        os.remove(backup.game_file(backup_dir, 0))
+
+        s2 = self.server(None, backup_dir)
+        self.assertEqual(len(s2.games), 2)
+        self.assertEqual(s2.games[0].players, [])
+        self.assertEqual(s2.games[0].game_id, 0)
+        self.assertEqual(s2.games[1].game_id, 1)
+
+    def test_old_backup_file(self):
+        """A pickled list of games from older servers can be loaded."""
+        path = os.path.join(self.dir, 'backup.dat')
+        s = self.server()
+        self.play(s)
+        with open(path, 'w') as f:
+            pickle.dump(s.games, f)
+
+        s2 = self.server(None, path)
+        self.assertEqual(len(s2.games), 2)
+        self.assertEqual(s2.games[1].expected_action, m.THINKERTYPE)
+
+    def test_pre_slots_backup(self):
+        """A backup written before the game objects had __slots__, with
+        a 2-player game in the middle of a turn and an unstarted one,
+        loads and can be played on.
+        """
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                'old_backup.pickle')
+        s = GTRServer(load_backup_file=path)
+        errors = []
+        s.send_command = lambda uid, command: errors.extend(
+                command.action.args if command.action.action == m.SERVERERROR
+                else [])
+
+        self.assertEqual(len(s.games), 2)
+        self.assertFalse(s.games[1].started)
+        self.assertEqual([p.name for p in s.games[1].players], ['p3'])
+
+        g = s.games[0]
+        self.assertEqual([p.name for p in g.players], ['p1', 'p2'])
+        self.assertEqual(g.expected_action, m.FOLLOWROLE)
+        self.assertEqual([(f.opcode, f.player) for f in g.stack.stack][-2:],
+                [(stack.PERFORM_ROLE_BEING_LED, 0),
+                 (stack.PERFORM_ROLE_BEING_LED, 1)])
+        self.assertEqual(list(g.players[0].building_names), ['Road'])
+        for zone in [g.library, g.jacks, g.pool] + [p.hand for p in g.players]:
+            for c in zone:
+                self.assertIs(c, Card(c.ident))
+
+        for uid in (1, 2):
+            s.register_user(uid, dict(name='p{0:d}'.format(uid)))
+        p = g.waiting_for()[0]
+        s.handle_command(p.uid, Command(0, GameAction(m.FOLLOWROLE, 0)))
+        self.assertEqual(errors, [])
+        self.assertNotEqual(g.expected_action, m.FOLLOWROLE)
+
+    def test_old_backup_to_dir(self):
+        """Games loaded from a backup file are written to the backup
+        directory, so a restart from the directory has them.
+        """
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                'old_backup.pickle')
+        backup_dir = os.path.join(self.dir, 'backup')
+        s = GTRServer(backup_dir, path, backup_interval=60)
+        s.close()
+
+        self.assertEqual(sorted(os.listdir(backup_dir)),
+                ['game-0.pickle', 'game-1.pickle', 'index.pickle'])
+
+        s2 = GTRServer(None, backup_dir)
+        self.assertEqual(len(s2.games), 2)
+        self.assertEqual([p.name for p in s2.games[0].players], ['p1', 'p2'])
+        self.assertEqual(s2.games[0].expected_action, m.FOLLOWROLE)
+        self.assertEqual([p.name for p in s2.games[1].players], ['p3'])
+
+    def test_bad_backup_file(self):
+        """A backup file that can't be loaded is logged and skipped."""
+        path = os.path.join(self.dir, 'backup.dat')
+        with open(path, 'w') as f:
+            f.write("(lp0\nccloaca.card_manager\nNoSuchClass\np1\na.")
+
+        s = self.server(None, path)
+        self.assertEqual(len(s.games), 0)
+
+    def test_archive(self):
+        """Finished and idle games are archived and reloaded when
+        they're used.
+        """
+        archive_dir = os.path.join(self.dir, 'archive')
+        s = self.server(archive_dir=archive_dir, idle_timeout=60)
+        self.play(s)
+        responses = []
+        s.send_command = lambda uid, command: responses.append(command)
+
+        self.assertEqual(s.evict_idle_games(time.time() + 30), [])
+        self.assertEqual(sorted(s.evict_idle_games(time.time() + 90)),
+                [0, 1])
+        self.assertEqual(s.games.n_loaded(), 0)
+
+        # The game ends when the leader draws from the empty library.
+        game = s.games[1]
+        game.library.set_content([])
+        uid = game.players[game.active_player_index].uid
+        s.handle_command(uid, Command(1, GameAction(m.THINKERTYPE, False)))
+
+        self.assertTrue(game.finished)
+        self.assertEqual(sorted(os.listdir(archive_dir)),
+                ['game-0.pickle.gz', 'game-1.pickle.gz'])
+        self.assertEqual(responses[-1].action.action, m.GAMESTATE)
+
+        s.handle_command(uid, Command(None, GameAction(m.REQGAMELIST)))
+        records = json.loads(responses[-1].action.args[0])
+        self.assertEqual([r['finished'] for r in records], [False, True])
+        self.assertFalse(s.games.is_loaded(0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -553,6 +553,18 @@ class TestAtrium(unittest.TestCase):
 
         self.assertNotIn(d.dock0, self.game.library)
         self.assertIn(d.dock0, self.p1.vault)
+
+    def test_merchant_last_card(self):
+        """Taking the last card from the deck ends the game."""
+        d = self.deck
+        self.game.library.set_content([d.dock0])
+
+        a = message.GameAction(message.MERCHANT, True)
+        with self.assertRaises(GameOver):
+            self.game.handle(a)
+
+        self.assertIn(d.dock0, self.p1.vault)
+        self.assertTrue(self.game.finished)
     
 
 class TestBar(unittest.TestCase):
@@ -566,7 +578,7 @@ class TestBar(unittest.TestCase):
 
         self.p1, self.p2 = self.game.players
 
-        self.game.library.set_content([d.dock0])
+        self.game.library.set_content([d.dock0, d.road0])
         self.game.pool.set_content([d.wall0])
 
         self.assertTrue(self.game._player_has_active_building(self.p1, 'Bar'))
@@ -608,6 +620,22 @@ class TestBar(unittest.TestCase):
         self.assertEqual(self.game.expected_action, message.THINKERORLEAD)
         self.assertEqual(self.game.active_player, self.p2)
 
+
+    def test_patron_last_card(self):
+        """Hiring the last card from the deck ends the game."""
+        d = self.deck
+        self.game.library.set_content([d.dock0])
+
+        a = message.GameAction(message.PATRONFROMPOOL, None)
+        self.game.handle(a)
+
+        a = message.GameAction(message.PATRONFROMDECK, True)
+        with self.assertRaises(GameOver):
+            self.game.handle(a)
+
+        self.assertIn(d.dock0, self.p1.clientele)
+        self.assertTrue(self.game.finished)
+
     
     def test_skip_all_patrons(self):
         d = self.deck
@@ -2667,6 +2695,7 @@ class TestVomitorium(unittest.TestCase):
 
         self.assertIn(d.road0, self.game.pool)
         self.assertIn(d.jack0, self.game.jacks)
+        self.assertNotIn(d.jack0, self.game.pool)
         self.assertNotIn(d.road0, self.p1.hand)
         self.assertNotIn(d.jack0, self.p1.hand)
 
@@ -2696,6 +2725,7 @@ class TestVomitorium(unittest.TestCase):
 
         self.assertIn(d.road1, self.game.pool)
         self.assertIn(d.jack1, self.game.jacks)
+        self.assertNotIn(d.jack1, self.game.pool)
         self.assertNotIn(d.road1, self.p2.hand)
         self.assertNotIn(d.jack1, self.p2.hand)
 
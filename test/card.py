@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+
+from cloaca.card import Card
+import cloaca.card_manager as cm
+
+import unittest
+import copy
+import pickle
+
+
+class TestCard(unittest.TestCase):
+    """Tests for the interned Card objects.
+    """
+
+    def test_interned(self):
+        self.assertIs(Card(12), Card(12))
+        self.assertIs(Card(-1), Card(-1))
+        self.assertIs(cm.get_card('Dock'), Card(cm.get_card('Dock').ident))
+
+    def test_copy(self):
+        c = Card(30)
+        self.assertIs(copy.copy(c), c)
+        self.assertIs(copy.deepcopy(c), c)
+        self.assertIs(copy.deepcopy([c, c])[1], c)
+
+    def test_pickle(self):
+        c = Card(30)
+        for protocol in range(pickle.HIGHEST_PROTOCOL+1):
+            self.assertIs(pickle.loads(pickle.dumps(c, protocol)), c)
+
+    def test_old_pickle(self):
+        """Cards pickled with their __dict__ before they were interned
+        load as the interned cards, and keep shared references.
+        """
+        from cloaca.backup import LegacyUnpickler
+        from StringIO import StringIO
+
+        # [c, c] with c = Card(30), as pickled by older versions.
+        old = ("(lp0\nccopy_reg\n_reconstructor\np1\n"
+                "(ccloaca.card_manager\nCard\np2\nc__builtin__\nobject\np3\n"
+                "Ntp4\nRp5\n(dp6\nS'ident'\np7\nI30\nsbag5\na.")
+
+        cards = LegacyUnpickler(StringIO(old)).load()
+        self.assertIs(cards[0], Card(30))
+        self.assertIs(cards[1], Card(30))
+
+        # Plain pickle makes a separate instance that still works.
+        c = pickle.loads(old)[0]
+        self.assertEqual(c.ident, 30)
+        self.assertEqual(c.name, Card(30).name)
+
+    def test_anonymous(self):
+        """All negative idents are the anonymous card."""
+        n_interned = len(cm._interned_cards)
+        for i in range(1, 100):
+            self.assertIs(Card(-i), Card(-1))
+        self.assertEqual(len(cm._interned_cards), n_interned)
+
+    def test_immutable(self):
+        c = Card(30)
+        with self.assertRaises(AttributeError):
+            c.ident = 31
+
+        with self.assertRaises(AttributeError):
+            c.foo = 1
+
+    def test_invalid_ident(self):
+        with self.assertRaises(TypeError):
+            Card('12')
+
+        with self.assertRaises(TypeError):
+            Card(True)
+
+        with self.assertRaises(TypeError):
+            Card(len(cm.standard_deck()))
+
+
+if __name__ == '__main__':
+    unittest.main()
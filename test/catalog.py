@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+
+import cloaca.catalog as catalog
+import cloaca.card_manager as cm
+from cloaca.card import Card
+
+import unittest
+
+
+class TestCatalog(unittest.TestCase):
+    """Tests for the card property tables.
+    """
+
+    def test_tables_match_json(self):
+        d = cm.get_cards_dict_from_json_file()
+
+        for ident in range(6, len(cm.standard_deck())):
+            c = Card(ident)
+            material = str(d[c.name]['material'])
+
+            self.assertEqual(c.material, material)
+            self.assertEqual(c.role, cm.get_role_of_material(material))
+            self.assertEqual(c.value, cm.get_value_of_material(material))
+            self.assertEqual(c.text, str(d[c.name]['function']))
+
+    def test_jack(self):
+        c = cm.get_card('Jack')
+
+        self.assertEqual(c.name, 'Jack')
+        self.assertIsNone(c.material)
+        self.assertIsNone(c.role)
+        self.assertIsNone(c.value)
+
+    def test_anonymous_card(self):
+        c = Card(-1)
+
+        self.assertEqual(c.name, 'Card')
+        self.assertIsNone(c.material)
+        self.assertIsNone(c.value)
+
+    def test_tables_are_immutable(self):
+        with self.assertRaises(TypeError):
+            catalog.materials[6] = 'Wood'
+
+
+class TestCardLookup(unittest.TestCase):
+    """Tests for the card_manager name, material and role indexes.
+    """
+
+    def test_get_card(self):
+        deck = cm.standard_deck()
+        first = deck.index('Dock')
+
+        self.assertEqual(cm.get_card('Dock').ident, first)
+        self.assertEqual(cm.get_card('Dock', 2).ident, first+2)
+
+        with self.assertRaises(IndexError):
+            cm.get_card('Dock', deck.count('Dock'))
+
+        with self.assertRaises(ValueError):
+            cm.get_card('Not a card')
+
+    def test_cards_and_ids(self):
+        deck = cm.standard_deck()
+        for name in set(deck):
+            ids = [i for i, n in enumerate(deck) if n == name]
+            self.assertEqual(list(cm.card_ids(name)), ids)
+            self.assertEqual([c.ident for c in cm.cards(name)], ids)
+
+    def test_get_cards(self):
+        cards = cm.get_cards(['Road', 'Jack', 'Road'])
+        road0, road1 = cm.cards('Road')[:2]
+
+        self.assertEqual(cards, (road0, cm.get_card('Jack'), road1))
+
+        with self.assertRaises(ValueError):
+            cm.get_cards(['Statue']*4)
+
+    def test_cards_of_material(self):
+        for material in cm.get_all_materials():
+            cards = cm.get_cards_of_material(material)
+            expected = [c for c in cm.get_orders_card_set()
+                    if c.material == material]
+
+            self.assertEqual(cards, expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
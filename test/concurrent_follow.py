@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+
+from cloaca.game import Game
+from cloaca.error import GTRError, GameOver
+import cloaca.encode as encode
+
+import cloaca.message as message
+
+import cloaca.test.test_setup as test_setup
+from cloaca.test.test_setup import TestDeck
+
+import random
+import unittest
+
+
+class TestConcurrentFollow(unittest.TestCase):
+    """Test followers deciding before their turn with concurrent_follow.
+    """
+
+    def setUp(self):
+        self.deck = TestDeck()
+        d = self.deck
+
+        self.game = test_setup.simple_n_player(4)
+        self.game.concurrent_follow = True
+        self.p1, self.p2, self.p3, self.p4 = self.game.players
+
+        self.p1.hand.set_content([d.jack0])
+        self.p2.hand.set_content([d.latrine0])
+        self.p3.hand.set_content([d.road0, d.shrine0])
+        self.p4.hand.set_content([d.insula0])
+
+        self.game.handle(message.GameAction(message.THINKERORLEAD, False))
+
+    def lead(self):
+        a = message.GameAction(message.LEADROLE, 'Laborer', 1, self.deck.jack0)
+        self.game.handle(a)
+
+    def test_not_before_lead(self):
+        self.assertEqual(self.game.waiting_for(), [self.p1])
+
+        a = message.GameAction(message.FOLLOWROLE, 0)
+        with self.assertRaises(GTRError):
+            self.game.handle(a, self.p3)
+
+    def test_waiting_for(self):
+        self.lead()
+        self.assertEqual(self.game.waiting_for(),
+                [self.p2, self.p3, self.p4])
+        self.assertEqual(
+                [a.args for a in self.game.legal_actions(self.p3)],
+                [[0], [1, self.deck.road0]])
+
+    def test_off(self):
+        self.game.concurrent_follow = False
+        self.lead()
+        self.assertEqual(self.game.waiting_for(), [self.p2])
+
+        a = message.GameAction(message.FOLLOWROLE, 0)
+        with self.assertRaises(GTRError):
+            self.game.handle(a, self.p3)
+
+    def test_any_order(self):
+        d = self.deck
+        self.lead()
+
+        self.game.handle(message.GameAction(message.FOLLOWROLE, 1, d.insula0),
+                self.p4)
+        self.game.handle(message.GameAction(message.FOLLOWROLE, 1, d.road0),
+                self.p3)
+        self.assertEqual(self.game.waiting_for(), [self.p2])
+
+        # Decisions aren't applied before p2's.
+        self.assertIn(d.road0, self.p3.hand)
+
+        self.game.handle(message.GameAction(message.FOLLOWROLE, 1, d.latrine0),
+                self.p2)
+
+        for p, c in ((self.p2, d.latrine0), (self.p3, d.road0),
+                (self.p4, d.insula0)):
+            self.assertIn(c, p.camp)
+        self.assertIsNone(self.game.follow_decisions)
+        self.assertEqual(self.game.expected_action, message.LABORER)
+        self.assertIs(self.game.active_player, self.p1)
+
+    def test_think_in_turn_order(self):
+        """An early thinker is asked for the type of thinker when it's
+        their turn.
+        """
+        d = self.deck
+        self.lead()
+
+        self.game.handle(message.GameAction(message.FOLLOWROLE, 0), self.p3)
+        self.game.handle(message.GameAction(message.FOLLOWROLE, 0), self.p2)
+
+        self.assertEqual(self.game.expected_action, message.THINKERTYPE)
+        self.assertIs(self.game.active_player, self.p2)
+        self.assertEqual(self.game.waiting_for(), [self.p2, self.p4])
+
+        self.game.handle(message.GameAction(message.THINKERTYPE, True))
+        self.assertEqual(self.game.expected_action, message.THINKERTYPE)
+        self.assertIs(self.game.active_player, self.p3)
+
+    def test_illegal_early_follow(self):
+        d = self.deck
+        self.lead()
+
+        for a in (message.GameAction(message.FOLLOWROLE, 1, d.shrine0),
+                message.GameAction(message.FOLLOWROLE, 1, d.latrine0),
+                message.GameAction(message.THINKERTYPE, True)):
+            with self.assertRaises(GTRError):
+                self.game.handle(a, self.p3)
+
+        self.assertEqual(self.game.waiting_for(),
+                [self.p2, self.p3, self.p4])
+
+    def test_decide_once(self):
+        self.lead()
+        self.game.handle(message.GameAction(message.FOLLOWROLE, 0), self.p3)
+
+        with self.assertRaises(GTRError):
+            self.game.handle(message.GameAction(message.FOLLOWROLE, 0), self.p3)
+
+    def test_hidden(self):
+        d = self.deck
+        self.lead()
+        self.game.handle(message.GameAction(message.FOLLOWROLE, 1, d.road0),
+                self.p3)
+
+        gs = self.game.privatized_game_state_copy('p3')
+        self.assertEqual(gs.follow_decisions, [None, None, [1, d.road0.ident], None])
+
+        gs = self.game.privatized_game_state_copy('p2')
+        self.assertEqual(gs.follow_decisions, [None, None, [], None])
+
+    def test_saved(self):
+        d = self.deck
+        self.lead()
+        self.game.handle(message.GameAction(message.FOLLOWROLE, 1, d.road0),
+                self.p3)
+
+        g = encode.json_to_game(encode.game_to_json(self.game))
+        self.assertTrue(g.concurrent_follow)
+        self.assertEqual(g.waiting_for(), [g.players[1], g.players[3]])
+
+        g.handle(message.GameAction(message.FOLLOWROLE, 0))
+        self.assertEqual(g.expected_action, message.THINKERTYPE)
+        g.handle(message.GameAction(message.THINKERTYPE, True))
+        self.assertIn(d.road0, g.players[2].camp)
+
+
+class TestConcurrentFollowGames(unittest.TestCase):
+    """Random games end the same when the followers decide at once, in
+    random order, as when they decide one by one.
+    """
+
+    def play(self, seed, n_players, concurrent):
+        random.seed(seed)
+        g = Game()
+        g.concurrent_follow = concurrent
+        for i in range(n_players):
+            g.add_player(i, 'p{0:d}'.format(i+1))
+        g.start()
+
+        # Each player's choices depend only on the order of their own
+        # prompts, not on when they're made.
+        prompts = {}
+        def choose(p):
+            actions = list(g.legal_actions(p))
+            key = (g.turn_number, p.name)
+            n = prompts[key] = prompts.get(key, 0) + 1
+            rng = random.Random('{0} {1} {2} {3}'.format(seed, key[0], key[1], n))
+            return rng.choice(actions)
+
+        order = random.Random(seed)
+        try:
+            while g.turn_number < 25:
+                early = g.waiting_for()[1:]
+                order.shuffle(early)
+                for p in early:
+                    g.handle(choose(p), p)
+                g.handle(choose(g.active_player))
+        except GameOver:
+            pass
+
+        return g
+
+    def check(self, seed, n_players):
+        g1 = self.play(seed, n_players, False)
+        g2 = self.play(seed, n_players, True)
+        g1.concurrent_follow = True
+        # The log entries are timestamped.
+        for g in (g1, g2):
+            g.game_log = [entry.split(' ', 1)[1] for entry in g.game_log]
+        self.assertEqual(encode.game_to_json(g1), encode.game_to_json(g2))
+
+    def test_three_players(self):
+        self.check(0, 3)
+
+    def test_five_players(self):
+        self.check(1, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -233,7 +233,7 @@ class TestFountain(unittest.TestCase):
         drawing the card.
         """
         bath = cm.get_card('Bath')
-        self.game.library.cards.insert(0,bath)
+        self.game.library.put_on_top(bath)
 
         a = message.GameAction(message.USEFOUNTAIN, True)
         self.game.handle(a)
@@ -254,7 +254,7 @@ class TestFountain(unittest.TestCase):
         building with it.
         """
         bath = cm.get_card('Bath')
-        self.game.library.cards.insert(0,bath)
+        self.game.library.put_on_top(bath)
 
         a = message.GameAction(message.USEFOUNTAIN, True)
         self.game.handle(a)
@@ -278,7 +278,7 @@ class TestFountain(unittest.TestCase):
         a material to a building, completing it.
         """
         bath, atrium, foundry = cm.get_cards(['Bath', 'Atrium', 'Foundry'])
-        self.game.library.cards.insert(0,bath)
+        self.game.library.put_on_top(bath)
 
         self.p1.buildings.append(Building(atrium, 'Brick', materials=[foundry]))
 
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+
+from cloaca.game import Game
+from cloaca.card import Card
+import cloaca.delta as delta
+from cloaca.delta import json_default
+
+import test_setup
+
+import copy
+import json
+import unittest
+
+
+def state_json(game):
+    return json.dumps(game, sort_keys=True, default=json_default)
+
+
+class TestPatch(unittest.TestCase):
+    """Test making and applying patches between game states.
+    """
+
+    def setUp(self):
+        self.game = test_setup.simple_two_player()
+        self.game.version = 1
+        self.old_json = state_json(self.game)
+        self.old = delta.flatten(self.game)
+
+    def patch(self):
+        """Bump the version and return the decoded patch from the state
+        in setUp().
+        """
+        self.game.version += 1
+        new = delta.flatten(self.game)
+        patch = delta.make_patch(self.old, new, 0, 1, self.game.version)
+        return patch if patch is None else json.loads(patch)
+
+    def assertPatches(self, patch):
+        """The patch turns the old state into the new one."""
+        state = json.loads(self.old_json)
+        self.assertTrue(delta.apply_patch(state, patch))
+        self.assertEqual(state, json.loads(state_json(self.game)))
+
+    def test_no_change(self):
+        self.assertIsNone(self.patch())
+
+    def test_set(self):
+        self.game.turn_number += 1
+        self.game.expected_action = None
+
+        patch = self.patch()
+        self.assertEqual(patch['from'], 1)
+        self.assertEqual(patch['to'], 2)
+        self.assertEqual(sorted(p for p, v in patch['set']),
+                [['expected_action'], ['turn_number']])
+        self.assertEqual(patch['splice'], [])
+        self.assertPatches(patch)
+
+    def test_splice_log(self):
+        """A new log line is sent by itself."""
+        self.game.game_log.append('A new line.')
+
+        patch = self.patch()
+        self.assertEqual(patch['set'], [])
+        self.assertEqual(patch['splice'], [[['game_log'],
+                len(self.game.game_log)-1, 0, ['A new line.']]])
+        self.assertPatches(patch)
+
+    def test_splice_zones(self):
+        """Moving a card from the library to a hand only sends that card.
+        """
+        p = self.game.players[0]
+        card = self.game.library.pop(0)
+        p.hand.append(card)
+
+        patch = self.patch()
+        splices = dict((tuple(path), (start, n, items))
+                for path, start, n, items in patch['splice'])
+        self.assertEqual(splices[('library', 'cards')], (0, 1, []))
+        self.assertEqual(splices[('players', 0, 'hand', 'cards')],
+                (len(p.hand)-1, 0, [{'ident': card.ident}]))
+        self.assertPatches(patch)
+
+    def test_many_changes(self):
+        p0, p1 = self.game.players
+        p0.camp.append(self.game.library.pop(3))
+        p1.hand.set_content([self.game.library.pop(), Card(0)])
+        p1.influence.append('Wood')
+        self.game.pool.append(self.game.library.pop(0))
+        self.game.jacks.pop()
+        self.game.leader_index = 1
+        self.game.stack.stack.pop()
+
+        self.assertPatches(self.patch())
+
+    def test_wrong_version(self):
+        self.game.turn_number += 1
+        patch = self.patch()
+
+        state = json.loads(self.old_json)
+        state['version'] = 0
+        before = copy.deepcopy(state)
+        self.assertFalse(delta.apply_patch(state, patch))
+        self.assertEqual(state, before)
+
+
+class TestVersion(unittest.TestCase):
+    """The game version is kept by clones and pickles.
+    """
+
+    def test_clone(self):
+        g = Game()
+        g.version = 7
+        self.assertEqual(g.clone().version, 7)
+
+    def test_old_pickle(self):
+        g = Game()
+        state = g.__getstate__()
+        del state['version']
+
+        g2 = Game.__new__(Game)
+        g2.__setstate__(state)
+        self.assertEqual(g2.version, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -33,5 +33,26 @@ class TestEncodeGame(unittest.TestCase):
 
         self.assertEqual(game_json, game_json2)
 
+    def test_stack(self):
+        """The stack is encoded, so a decoded game can continue."""
+        game = encode.json_to_game(encode.game_to_json(self.game))
+
+        self.assertEqual([f.to_list() for f in game.stack.stack],
+                [f.to_list() for f in self.game.stack.stack])
+        self.assertEqual(game.expected_action, message.CRAFTSMAN)
+
+        for g in (self.game, game):
+            g.handle(message.GameAction(message.CRAFTSMAN, None, None, None))
+
+        self.assertEqual(encode.game_to_json(game),
+                encode.game_to_json(self.game))
+
+    def test_frames(self):
+        """Frames hold player indices, not Player objects."""
+        for f in self.game.stack.stack + [self.game._current_frame]:
+            self.assertIsInstance(f.opcode, int)
+            self.assertIsInstance(f.player, int)
+            self.assertNotIsInstance(f.arg, Player)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+
+from cloaca.expiry import ExpiryIndex
+from cloaca.server import GTRServer
+from cloaca.message import GameAction, Command
+import cloaca.message as m
+
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from uuid import uuid4
+
+
+class TestExpiryIndex(unittest.TestCase):
+    """Test the heap of deadlines.
+    """
+
+    def test_pop_expired(self):
+        index = ExpiryIndex()
+        index.set('a', 3)
+        index.set('b', 1)
+        index.set('c', 2)
+
+        self.assertEqual(index.next_deadline(), 1)
+        self.assertEqual(index.pop_expired(2), ['b', 'c'])
+        self.assertEqual(len(index), 1)
+        self.assertEqual(index.pop_expired(2), [])
+        self.assertEqual(index.pop_expired(10), ['a'])
+        self.assertIsNone(index.next_deadline())
+
+    def test_reset(self):
+        index = ExpiryIndex()
+        index.set('a', 1)
+        index.set('b', 2)
+        index.set('a', 5)
+        index.discard('b')
+
+        self.assertEqual(index.get('a'), 5)
+        self.assertNotIn('b', index)
+        self.assertEqual(index.next_deadline(), 5)
+        self.assertEqual(index.pop_expired(4), [])
+        self.assertEqual(index.pop_expired(5), ['a'])
+
+    def test_rebuild(self):
+        """Out of date entries don't pile up in the heap."""
+        index = ExpiryIndex()
+        for t in range(1000):
+            index.set('a', t)
+            index.set('b', t)
+
+        self.assertLessEqual(len(index._heap), 20)
+        self.assertEqual(index.pop_expired(999), ['a', 'b'])
+
+
+class TestReaper(unittest.TestCase):
+    """Test expiring lobby and abandoned games on the server.
+    """
+
+    def setUp(self):
+        self.uids = [uuid4().int for _ in range(3)]
+
+    def server(self, **kwargs):
+        s = GTRServer(**kwargs)
+        s.send_command = lambda uid, command: None
+        for i, uid in enumerate(self.uids):
+            s.register_user(uid, dict(name='p{0:d}'.format(i+1)))
+        return s
+
+    def command(self, s, uid, game_id, action):
+        s.handle_command(uid, Command(game_id, GameAction(action)))
+
+    def game_list(self, s):
+        responses = []
+        s.send_command = lambda uid, command: responses.append(command)
+        self.command(s, self.uids[0], None, m.REQGAMELIST)
+        return [r['game_id'] for r in json.loads(responses[-1].action.args[0])]
+
+    def test_lobby(self):
+        u1, u2, u3 = self.uids
+        s = self.server(lobby_ttl=60)
+        self.command(s, u1, None, m.REQCREATEGAME)
+        self.command(s, u2, None, m.REQCREATEGAME)
+        self.command(s, u3, None, m.REQCREATEGAME)
+        self.command(s, u3, 2, m.REQSTARTGAME)
+
+        deadline = s.next_expiry()
+        self.assertAlmostEqual(deadline, time.time() + 60, delta=5)
+        self.assertEqual(s.reap(deadline - 1), [])
+
+        s._expiry.set(('lobby', 1), deadline + 30)
+        self.assertEqual(s.reap(deadline), [0])
+        self.assertEqual(self.game_list(s), [1, 2])
+
+        # Starting a game stops its TTL.
+        self.command(s, u2, 1, m.REQSTARTGAME)
+        self.assertIsNone(s.next_expiry())
+        self.assertEqual(s.reap(deadline + 100), [])
+
+        # Game ids aren't reused.
+        self.command(s, u1, None, m.REQCREATEGAME)
+        self.assertEqual(self.game_list(s), [1, 2, 3])
+
+    def test_join_touches(self):
+        u1, u2, u3 = self.uids
+        s = self.server(lobby_ttl=60)
+        self.command(s, u1, None, m.REQCREATEGAME)
+        first = s.next_expiry()
+        time.sleep(0.01)
+        self.command(s, u2, 0, m.REQJOINGAME)
+        self.assertGreater(s.next_expiry(), first)
+
+    def test_abandoned(self):
+        u1, u2, u3 = self.uids
+        archive_dir = tempfile.mkdtemp()
+        try:
+            s = self.server(abandoned_ttl=60, archive_dir=archive_dir)
+            self.command(s, u1, None, m.REQCREATEGAME)
+            self.command(s, u2, 0, m.REQJOINGAME)
+            self.command(s, u1, 0, m.REQSTARTGAME)
+            self.command(s, u3, None, m.REQCREATEGAME)
+
+            s.disconnect_user(u1)
+            self.assertIsNone(s.next_expiry())
+
+            s.disconnect_user(u2)
+            s.disconnect_user(u3)
+            deadline = s.next_expiry()
+            self.assertIsNotNone(deadline)
+
+            # A player reconnecting saves the game.
+            s.register_user(u2, dict(name='p2'))
+            self.assertEqual(s.reap(deadline + 1), [1])
+
+            s.disconnect_user(u2)
+            expired = s.reap(s.next_expiry())
+            self.assertEqual(expired, [0])
+            self.assertFalse(s.games.is_loaded(0))
+            self.assertTrue(os.path.exists(
+                    os.path.join(archive_dir, 'game-0.pickle.gz')))
+
+            # The archived game comes back.
+            self.assertTrue(s.games[0].started)
+            self.assertEqual(self.game_list(s), [0])
+        finally:
+            shutil.rmtree(archive_dir)
+
+    def test_removed_game_command(self):
+        u1, u2, u3 = self.uids
+        s = self.server(lobby_ttl=0)
+        self.command(s, u1, None, m.REQCREATEGAME)
+        s.reap()
+
+        responses = []
+        s.send_command = lambda uid, command: responses.append(command)
+        s.handle_command(u1, Command(0, GameAction(m.THINKERORLEAD, True)))
+        self.assertEqual(responses[-1].action.action, m.SERVERERROR)
+
+    def test_disabled(self):
+        u1, u2, u3 = self.uids
+        s = self.server()
+        self.command(s, u1, None, m.REQCREATEGAME)
+        s.disconnect_user(u1)
+        self.assertIsNone(s.next_expiry())
+        self.assertEqual(s.reap(time.time() + 1e6), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,6 +3,13 @@
 from cloaca.game import Game
 from cloaca import message
 from cloaca.error import GTRError
+from cloaca.building import Building
+import cloaca.stack as stack
+import cloaca.test.test_setup as test_setup
+from cloaca.test.slots import thinker_game
+import cloaca.encode as encode
+
+import copy
 
 import unittest
 from uuid import uuid4
@@ -100,5 +107,192 @@ class TestGame(unittest.TestCase):
             g.add_player(uuid4(), 'p1')
 
 
+class TestRunLoop(unittest.TestCase):
+    """The frames on the stack are executed by a loop, not recursively.
+    """
+
+    def test_many_frames(self):
+        """More frames than the recursion limit run without error."""
+        g = test_setup.simple_two_player()
+        n = g.frames_executed
+
+        for i in range(5000):
+            g.stack.push_frame(stack.DO_END_TURN, 0)
+        g._pump()
+
+        # The frames left on the stack after them run as well.
+        self.assertGreaterEqual(g.frames_executed - n, 5000)
+        self.assertFalse(g._running)
+
+    def test_frames_per_action(self):
+        g = test_setup.simple_two_player()
+
+        g.handle(message.GameAction(message.THINKERORLEAD, True))
+        self.assertEqual(g.expected_action, message.THINKERTYPE)
+
+        g.handle(message.GameAction(message.THINKERTYPE, True))
+
+        # The turn ends and the next player is asked to think or lead.
+        self.assertGreater(g.last_action_frames, 1)
+        self.assertEqual(g.expected_action, message.THINKERORLEAD)
+        self.assertEqual(g.leader_index, 1)
+        self.assertFalse(g._running)
+
+
+class TestHeadless(unittest.TestCase):
+    """A headless game plays the same but keeps no log.
+    """
+
+    def test_headless(self):
+        games = []
+        for headless in (False, True):
+            g = test_setup.simple_two_player()
+            g.headless = headless
+            n_log = len(g.game_log)
+
+            g.handle(message.GameAction(message.THINKERORLEAD, True))
+            g.handle(message.GameAction(message.THINKERTYPE, True))
+            games.append((g, len(g.game_log) - n_log))
+
+        (g, n_log), (g_headless, n_log_headless) = games
+        self.assertGreater(n_log, 0)
+        self.assertEqual(n_log_headless, 0)
+        self.assertEqual(g_headless.leader_index, g.leader_index)
+        self.assertEqual(g_headless.expected_action, g.expected_action)
+        self.assertEqual(list(g_headless.players[0].hand),
+                list(g.players[0].hand))
+
+    def test_log_format(self):
+        g = Game()
+        g._log('{0} thinks for {1} cards.', 'p1', 3)
+        self.assertTrue(g.game_log[-1].endswith('p1 thinks for 3 cards.'))
+
+
+class TestClone(unittest.TestCase):
+    """Game.clone() makes an independent copy of the game.
+    """
+
+    def setUp(self):
+        self.game = thinker_game()
+
+    def test_same_state(self):
+        g = self.game
+        g2 = g.clone()
+        self.assertEqual(encode.game_to_json(g2), encode.game_to_json(g))
+        self.assertEqual(encode.game_to_json(g2),
+                encode.game_to_json(copy.deepcopy(g)))
+        g2.check_card_locations()
+
+    def test_independent(self):
+        g = self.game
+        json_before = encode.game_to_json(g)
+        g2 = g.clone()
+
+        p = g2.players[0]
+        p.hand.move_all(g2.pool)
+        g2.library.draw(3)
+        g2.stack.push_frame(stack.END_TURN)
+        g2.game_log.append('Extra log entry')
+        g2.players[1].influence.append('Wood')
+
+        self.assertEqual(encode.game_to_json(g), json_before)
+        g.check_card_locations()
+
+    def test_play_on(self):
+        """The clone plays on in the same way as the game."""
+        g = self.game
+        g2 = g.clone()
+        g2.check_invariants = True
+
+        for game in (g, g2):
+            game.handle(message.GameAction(message.THINKERORLEAD, True))
+            game.handle(message.GameAction(message.THINKERTYPE, False))
+
+        self.assertEqual(encode.game_to_json(g2), encode.game_to_json(g))
+
+    def test_buildings(self):
+        d = test_setup.TestDeck()
+        g = test_setup.simple_two_player()
+        g.players[0].buildings.append(Building(d.atrium0, 'Brick'))
+
+        g2 = g.clone()
+        p1 = g2.players[0]
+        b = p1.buildings[0]
+        self.assertIs(b.owner, p1)
+        self.assertIsNot(b, g.players[0].buildings[0])
+
+        b.complete = True
+        self.assertEqual(p1.complete_buildings, (b,))
+        self.assertTrue(g2._player_has_active_building(p1, 'Atrium'))
+        self.assertFalse(g._player_has_active_building(g.players[0], 'Atrium'))
+
+    def test_winners(self):
+        g = self.game
+        g.winners = [g.players[1]]
+        g2 = g.clone()
+        self.assertIs(g2.winners[0], g2.players[1])
+
+
+class TestActiveBuildingIndex(unittest.TestCase):
+    """The index of active buildings follows changes to the buildings.
+    """
+
+    def setUp(self):
+        Game.debug_active_buildings = True
+        self.d = test_setup.TestDeck()
+        self.game = test_setup.simple_two_player()
+        self.p1, self.p2 = self.game.players
+
+    def tearDown(self):
+        Game.debug_active_buildings = False
+
+    def test_complete(self):
+        g, d = self.game, self.d
+        b = Building(d.atrium0, 'Brick')
+        self.p1.buildings.append(b)
+        self.assertFalse(g._player_has_active_building(self.p1, 'Atrium'))
+
+        b.complete = True
+        self.assertTrue(g._player_has_active_building(self.p1, 'Atrium'))
+        self.assertFalse(g._player_has_active_building(self.p2, 'Atrium'))
+
+    def test_stairway(self):
+        g, d = self.game, self.d
+        b = Building(d.atrium0, 'Brick', complete=True)
+        self.p1.buildings.append(b)
+        self.assertFalse(g._player_has_active_building(self.p2, 'Atrium'))
+
+        b.stairway_materials.append(d.road0)
+        self.assertTrue(g._player_has_active_building(self.p2, 'Atrium'))
+
+    def test_gate(self):
+        g, d = self.game, self.d
+        self.p1.buildings.append(Building(d.temple0, 'Marble'))
+        self.assertFalse(g._player_has_active_building(self.p1, 'Temple'))
+
+        self.p1.buildings.append(Building(d.gate0, 'Marble', complete=True))
+        self.assertTrue(g._player_has_active_building(self.p1, 'Temple'))
+        self.assertFalse(g._player_has_active_building(self.p2, 'Temple'))
+
+    def test_move_building(self):
+        g, d = self.game, self.d
+        self.p1.buildings.append(Building(d.atrium0, 'Brick', complete=True))
+        self.assertTrue(g._player_has_active_building(self.p1, 'Atrium'))
+
+        self.p2.buildings.append(self.p1.buildings.pop())
+        self.assertFalse(g._player_has_active_building(self.p1, 'Atrium'))
+        self.assertTrue(g._player_has_active_building(self.p2, 'Atrium'))
+
+    def test_copy(self):
+        g, d = self.game, self.d
+        g2 = copy.deepcopy(g)
+        p1 = g2.players[0]
+
+        self.assertFalse(g2._player_has_active_building(p1, 'Atrium'))
+        p1.buildings.append(Building(d.atrium0, 'Brick', complete=True))
+        self.assertTrue(g2._player_has_active_building(p1, 'Atrium'))
+        self.assertFalse(g._player_has_active_building(self.p1, 'Atrium'))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -79,6 +79,20 @@ class TestGameActionJSON(unittest.TestCase):
             a = GameAction.from_json('{"action": 0, "args": [true, false]}')
 
 
+class TestTrustedGameAction(unittest.TestCase):
+    """GameAction.trusted() skips the checks and conversion of the args.
+    """
+
+    def test_trusted(self):
+        a = GameAction.trusted(message.USELATRINE, None)
+        self.assertEqual(a, GameAction(message.USELATRINE, None))
+
+    def test_no_conversion(self):
+        a = GameAction.trusted(message.PATRONFROMPOOL, 10)
+        self.assertEqual(a.args, [10])
+        self.assertEqual(str(a), 'patronfrompool')
+
+
 class TestCommandJSON(unittest.TestCase):
     """Test Command conversion to and from JSON.
     """
@@ -0,0 +1,350 @@
+#!/usr/bin/env python
+
+from cloaca.game import Game
+from cloaca.building import Building
+from cloaca.error import GTRError, GameOver
+
+import cloaca.catalog as catalog
+
+import cloaca.message as message
+
+import cloaca.test.test_setup as test_setup
+from cloaca.test.test_setup import TestDeck
+
+import random
+import unittest
+
+
+def legal_args(game, player=None):
+    """Return the args of each legal action as a list of tuples."""
+    if player is None:
+        player = game.active_player
+    return [tuple(a.args) for a in game.legal_actions(player)]
+
+
+def accepted(game, action):
+    """Return True if handle() accepts the action on a clone of game."""
+    g = game.clone()
+    try:
+        g.handle(action)
+    except GameOver:
+        pass
+    except GTRError:
+        return False
+    return True
+
+
+class TestThinkerOrLead(unittest.TestCase):
+    """Test the legal actions at the start of a turn.
+    """
+
+    def setUp(self):
+        self.deck = TestDeck()
+        self.game = test_setup.simple_two_player()
+        self.p1, self.p2 = self.game.players
+
+    def test_empty_hand(self):
+        """With no cards, the leader can only think."""
+        self.assertEqual(legal_args(self.game), [(True,)])
+
+    def test_lead(self):
+        d = self.deck
+        self.p1.hand.set_content([d.latrine0])
+        self.assertEqual(legal_args(self.game), [(True,), (False,)])
+
+    def test_not_active_player(self):
+        d = self.deck
+        self.p2.hand.set_content([d.latrine0])
+        self.assertEqual(legal_args(self.game, self.p2), [])
+
+    def test_finished(self):
+        self.game.winners = [self.p1]
+        self.assertEqual(legal_args(self.game), [])
+
+    def test_thinker_type(self):
+        self.game.handle(message.GameAction(message.THINKERORLEAD, True))
+        self.assertEqual(self.game.expected_action, message.THINKERTYPE)
+        self.assertEqual(legal_args(self.game), [(True,), (False,)])
+
+        self.game.jacks.set_content([])
+        self.assertEqual(legal_args(self.game), [(False,)])
+
+
+class TestLeadRole(unittest.TestCase):
+    """Test the Jacks, cards and petitions generated to lead a role.
+    """
+
+    def setUp(self):
+        self.deck = TestDeck()
+        self.game = test_setup.simple_two_player()
+        self.p1, self.p2 = self.game.players
+
+        self.game.handle(message.GameAction(message.THINKERORLEAD, False))
+
+    def lead_args(self, role):
+        return [args[1:] for args in legal_args(self.game) if args[0] == role]
+
+    def test_leader_is_active(self):
+        self.assertEqual(self.game.expected_action, message.LEADROLE)
+        self.assertIs(self.game.active_player, self.p1)
+
+    def test_no_palace(self):
+        d = self.deck
+        self.p1.hand.set_content(
+                [d.jack0, d.latrine0, d.latrine1, d.road0, d.shrine0])
+
+        petition = (1, d.latrine0, d.latrine1, d.road0)
+        self.assertEqual(sorted(self.lead_args('Laborer')), sorted([
+                (1, d.jack0), (1, d.latrine0), (1, d.road0), petition]))
+        self.assertEqual(sorted(self.lead_args('Patron')), sorted([
+                (1, d.jack0), petition]))
+        self.assertEqual(sorted(self.lead_args('Legionary')), sorted([
+                (1, d.jack0), (1, d.shrine0), petition]))
+
+        for a in self.game.legal_actions(self.p1):
+            self.assertTrue(accepted(self.game, a))
+
+    def test_circus(self):
+        """Two-card petitions are generated with a Circus."""
+        d = self.deck
+        self.p1.buildings.append(Building(d.circus0, 'Wood', complete=True))
+        self.p1.hand.set_content([d.latrine0, d.road0])
+
+        self.assertEqual(sorted(self.lead_args('Patron')),
+                [(1, d.latrine0, d.road0)])
+
+    def test_palace(self):
+        """With a Palace, three cards of the role can be one petition or
+        three actions, but not two actions without a Circus.
+        """
+        d = self.deck
+        self.p1.buildings.append(Building(d.palace0, 'Marble', complete=True))
+        self.p1.hand.set_content([d.latrine0, d.latrine1, d.latrine2])
+
+        args = self.lead_args('Laborer')
+        self.assertEqual(sorted(set(a[0] for a in args if len(a) == 4)),
+                [1, 3])
+        self.assertIn((3, d.latrine0, d.latrine1, d.latrine2), args)
+        self.assertIn((1, d.latrine0, d.latrine1, d.latrine2), args)
+        self.assertIn((2, d.latrine0, d.latrine1), args)
+        self.assertNotIn((2, d.latrine0, d.latrine1, d.latrine2), args)
+
+        self.p1.buildings.append(Building(d.circus0, 'Wood', complete=True))
+        args = self.lead_args('Laborer')
+        self.assertIn((2, d.latrine0, d.latrine1, d.latrine2), args)
+
+        for a in self.game.legal_actions(self.p1):
+            self.assertTrue(accepted(self.game, a))
+
+    def test_follow(self):
+        d = self.deck
+        self.p1.hand.set_content([d.jack0])
+        self.p2.hand.set_content([d.latrine0, d.shrine0])
+        self.game.handle(message.GameAction(message.LEADROLE,
+            'Laborer', 1, d.jack0))
+
+        self.assertEqual(self.game.expected_action, message.FOLLOWROLE)
+        self.assertEqual(legal_args(self.game, self.p2),
+                [(0,), (1, d.latrine0)])
+
+
+class TestCraftsmanSites(unittest.TestCase):
+    """Test the buildings and materials generated for Craftsman.
+    """
+
+    def setUp(self):
+        self.deck = TestDeck()
+        self.game = test_setup.two_player_lead('Craftsman', deck=self.deck)
+        self.p1, self.p2 = self.game.players
+
+    def test_start(self):
+        d = self.deck
+        self.p1.hand.set_content([d.latrine0, d.latrine1, d.statue0, d.jack1])
+
+        args = legal_args(self.game)
+        self.assertEqual(args[0], (None, None, None))
+        self.assertIn((d.latrine0, None, 'Rubble'), args)
+        self.assertNotIn((d.latrine1, None, 'Rubble'), args)
+        self.assertEqual(
+                sorted(site for f, m, site in args if f is d.statue0),
+                sorted(catalog.MATERIALS))
+        self.assertEqual(len(args), 1 + 1 + len(catalog.MATERIALS))
+
+    def test_add(self):
+        d = self.deck
+        self.p1.buildings.append(Building(d.road0, 'Rubble'))
+        self.p1.hand.set_content([d.latrine0, d.statue0])
+
+        args = legal_args(self.game)
+        self.assertIn((d.road0, d.latrine0, None), args)
+        self.assertNotIn((d.road0, d.statue0, None), args)
+
+    def test_owned_building(self):
+        d = self.deck
+        self.p1.buildings.append(Building(d.latrine1, 'Rubble', complete=True))
+        self.p1.hand.set_content([d.latrine0])
+
+        self.assertEqual(legal_args(self.game), [(None, None, None)])
+
+
+class TestArchitect(unittest.TestCase):
+
+    def setUp(self):
+        self.deck = TestDeck()
+        self.game = test_setup.two_player_lead('Architect', deck=self.deck)
+        self.p1, self.p2 = self.game.players
+
+        d = self.deck
+        self.p1.buildings.append(Building(d.road0, 'Rubble'))
+        self.p1.stockpile.set_content([d.latrine0])
+        self.game.pool.set_content([d.latrine1])
+
+    def test_stockpile(self):
+        d = self.deck
+        self.assertEqual(legal_args(self.game),
+                [(None, None, None), (d.road0, d.latrine0, None)])
+
+    def test_archway(self):
+        d = self.deck
+        self.p1.buildings.append(Building(d.archway0, 'Brick', complete=True))
+
+        args = legal_args(self.game)
+        self.assertIn((d.road0, d.latrine0, None), args)
+        self.assertIn((d.road0, d.latrine1, None), args)
+
+
+class TestMerchant(unittest.TestCase):
+
+    def setUp(self):
+        self.deck = TestDeck()
+        self.game = test_setup.two_player_lead('Merchant', deck=self.deck)
+        self.p1, self.p2 = self.game.players
+
+    def test_stockpile(self):
+        d = self.deck
+        self.p1.stockpile.set_content([d.atrium0, d.atrium1, d.road0])
+        self.p1.hand.set_content([d.latrine0])
+
+        self.assertEqual(legal_args(self.game),
+                [(False,), (False, d.atrium0), (False, d.road0)])
+
+    def test_vault_full(self):
+        d = self.deck
+        self.p1.stockpile.set_content([d.atrium0])
+        self.p1.vault.set_content([d.road0, d.road1])
+
+        self.assertEqual(legal_args(self.game), [(False,)])
+
+    def test_atrium_and_basilica(self):
+        d = self.deck
+        self.p1.buildings.append(Building(d.atrium2, 'Brick', complete=True))
+        self.p1.buildings.append(Building(d.basilica0, 'Marble', complete=True))
+        self.p1.stockpile.set_content([d.atrium0])
+        self.p1.hand.set_content([d.latrine0])
+
+        args = legal_args(self.game)
+        self.assertIn((True, d.latrine0), args)
+        self.assertIn((False, d.atrium0, d.latrine0), args)
+        self.assertNotIn((True, d.atrium0), args)
+
+        for a in self.game.legal_actions(self.p1):
+            self.assertTrue(accepted(self.game, a))
+
+
+class TestLegionary(unittest.TestCase):
+    """Test the demands, pool cards and given cards generated for a
+    Legionary.
+    """
+
+    def setUp(self):
+        self.deck = TestDeck()
+        d = self.deck
+        self.game = test_setup.two_player_lead('Legionary', deck=d)
+        self.p1, self.p2 = self.game.players
+
+        self.p1.hand.set_content([d.atrium0, d.latrine0, d.jack1])
+        self.game.pool.set_content([d.shrine0, d.shrine1, d.foundry0, d.road0])
+        self.p2.hand.set_content([d.school0, d.school1, d.academy0, d.road1])
+
+    def demand(self):
+        self.game.handle(message.GameAction(message.LEGIONARY, self.deck.atrium0))
+
+    def test_demand(self):
+        d = self.deck
+        self.assertEqual(legal_args(self.game),
+                [(), (d.atrium0,), (d.latrine0,)])
+
+    def test_take_pool_cards(self):
+        d = self.deck
+        self.demand()
+        self.assertEqual(legal_args(self.game),
+                [(d.shrine0,), (d.foundry0,)])
+
+    def test_give_cards(self):
+        d = self.deck
+        self.demand()
+        self.game.handle(message.GameAction(message.TAKEPOOLCARDS, d.shrine0))
+
+        self.assertEqual(self.game.expected_action, message.GIVECARDS)
+        self.assertEqual(legal_args(self.game, self.p2),
+                [(d.school0,), (d.academy0,)])
+
+    def test_give_cards_wall(self):
+        d = self.deck
+        self.p2.buildings.append(Building(d.wall0, 'Concrete', complete=True))
+        self.demand()
+        self.game.handle(message.GameAction(message.TAKEPOOLCARDS, d.shrine0))
+
+        self.assertEqual(legal_args(self.game, self.p2),
+                [(), (d.school0,), (d.academy0,)])
+
+    def test_give_cards_bridge(self):
+        d = self.deck
+        self.p1.buildings.append(Building(d.bridge0, 'Concrete', complete=True))
+        self.p2.stockpile.set_content([d.shrine2])
+        self.demand()
+        self.game.handle(message.GameAction(message.TAKEPOOLCARDS, d.shrine0))
+
+        self.assertEqual(legal_args(self.game, self.p2),
+                [(d.school0, d.shrine2), (d.academy0, d.shrine2)])
+
+
+class TestRandomGames(unittest.TestCase):
+    """Play games choosing at random from the legal actions, checking that
+    every legal action is accepted.
+    """
+
+    def play(self, n_players, seed, n_turns=150):
+        rng = random.Random(seed)
+        g = Game()
+        g.headless = True
+        for i in range(n_players):
+            g.add_player(i, 'p{0:d}'.format(i+1))
+        g.start()
+
+        try:
+            for _ in range(n_turns):
+                p = g.active_player
+                actions = list(g.legal_actions(p))
+                self.assertTrue(actions)
+
+                for other in g.players:
+                    if other is not p:
+                        self.assertEqual(list(g.legal_actions(other)), [])
+
+                for a in actions:
+                    self.assertTrue(accepted(g, a))
+
+                g.handle(rng.choice(actions))
+        except GameOver:
+            pass
+
+    def test_two_players(self):
+        self.play(2, 0)
+
+    def test_four_players(self):
+        self.play(4, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+
+from cloaca.game import Game
+from cloaca.card import Card
+from cloaca.error import GTRError, GameOver
+import cloaca.location as location
+import cloaca.encode as encode
+import cloaca.message as message
+
+import cloaca.test.test_setup as test_setup
+
+import pickle
+import unittest
+
+def started_game(n_players=3):
+    g = Game()
+    for i in range(n_players):
+        g.add_player(i, 'p{0:d}'.format(i+1))
+    g.start()
+    return g
+
+
+class TestCardLocations(unittest.TestCase):
+    """Test the table of card locations kept by Game.
+    """
+
+    def test_started_game(self):
+        """Every card has exactly one location after starting a game.
+        """
+        g = started_game()
+        g.check_card_locations()
+
+        p = g.players[1]
+        for c in p.hand:
+            self.assertEqual(g.card_location(c), (location.HAND, p))
+
+        for c in g.pool:
+            self.assertEqual(g.card_location(c), (location.POOL, None))
+
+        for c in g.library:
+            self.assertEqual(g.card_location(c), (location.LIBRARY, None))
+
+    def test_anonymous_card(self):
+        g = started_game()
+        self.assertEqual(g.card_location(Card(-1)), (location.UNKNOWN, None))
+
+    def test_cards_follow_moves(self):
+        g = started_game()
+        p = g.players[0]
+        c = p.hand.cards[-1]
+
+        p.hand.move_card(c, g.pool)
+        self.assertEqual(g.card_location(c), (location.POOL, None))
+        g.check_card_locations()
+
+        g.pool.move_card(c, p.stockpile)
+        self.assertEqual(g.card_location(c), (location.STOCKPILE, p))
+        g.check_card_locations()
+
+    def test_thinker_turns(self):
+        """Check the invariant after every action of a game of thinkers.
+        """
+        g = started_game(4)
+        g.check_invariants = True
+
+        try:
+            for turn in range(60):
+                g.handle(message.GameAction(message.THINKERORLEAD, True))
+                for_jack = bool(turn % 3 == 1) and len(g.jacks) > 0
+                g.handle(message.GameAction(message.THINKERTYPE, for_jack))
+        except GameOver:
+            pass
+
+        g.check_card_locations()
+
+    def test_duplicate_card(self):
+        g = started_game()
+        g.pool.append(g.library.cards[0])
+
+        with self.assertRaises(GTRError):
+            g.check_card_locations()
+
+    def test_missing_card(self):
+        g = started_game()
+        g.library.pop()
+
+        with self.assertRaises(GTRError):
+            g.check_card_locations()
+
+    def test_untracked_change(self):
+        """Changing a zone's list directly leaves the table out of date.
+        """
+        g = started_game()
+        g.pool.cards.append(g.library.pop())
+
+        with self.assertRaises(GTRError):
+            g.check_card_locations()
+
+    def test_construct_tracks_building(self):
+        d = test_setup.TestDeck()
+        g = test_setup.two_player_lead('Architect', deck=d)
+        p1 = g.players[0]
+
+        p1.hand.set_content([d.latrine0])
+        g.handle(message.GameAction(message.ARCHITECT, d.latrine0, None, 'Rubble'))
+
+        self.assertEqual(g.card_location(d.latrine0), (location.FOUNDATION, p1))
+        self.assertEqual(g._find_players_building(d.latrine0),
+                (p1, p1.get_building(d.latrine0)))
+
+    def test_encode(self):
+        g = started_game()
+        g2 = encode.json_to_game(encode.game_to_json(g))
+        g2.check_card_locations()
+
+    def test_pickle(self):
+        g = started_game()
+        g2 = pickle.loads(pickle.dumps(g))
+        g2.check_card_locations()
+
+        c = g2.players[0].hand.cards[0]
+        g2.players[0].hand.move_card(c, g2.pool)
+        self.assertEqual(g2.card_location(c), (location.POOL, None))
+
+
+if __name__ == '__main__':
+    unittest.main()
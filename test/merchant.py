@@ -118,5 +118,29 @@ class TestMerchant(unittest.TestCase):
         self.assertIn(d.atrium0, self.p1.vault)
 
 
+    def test_skip_past_vault_limit(self):
+        """ Skip Merchant with more cards in the vault than the limit,
+        eg. after feeding clients to the lions with a Coliseum.
+        """
+        d = self.deck
+        self.p1.vault.set_content([d.insula, d.dock, d.palisade])
+
+        a = message.GameAction(message.MERCHANT, False)
+        self.game.handle(a)
+
+        self.assertEqual(self.game.expected_action, message.THINKERORLEAD)
+        self.assertEqual(len(self.p1.vault), 3)
+
+
+    def test_skip_log(self):
+        """ Skipping Merchant logs the player's name.
+        """
+        a = message.GameAction(message.MERCHANT, False)
+        self.game.handle(a)
+
+        self.assertTrue(any(entry.endswith('p1 skips Merchant action.')
+                            for entry in self.game.game_log))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+
+from cloaca.player import Player, ObservedList
+from cloaca.building import Building
+from cloaca.card import Card
+import cloaca.card_manager as cm
+
+import copy
+import pickle
+import unittest
+
+class TestPlayerCache(unittest.TestCase):
+    """The cached building and influence properties of Player follow
+    changes to the buildings and influence.
+    """
+
+    def setUp(self):
+        Player.debug_cache = True
+        self.p = Player(1, 'p1')
+        self.atrium = Building(cm.get_card('Atrium'), 'Brick')
+        self.bar = Building(cm.get_card('Bar'), 'Rubble')
+
+    def tearDown(self):
+        Player.debug_cache = False
+
+    def test_add_buildings(self):
+        p = self.p
+        self.assertEqual(p.building_names, ())
+
+        p.buildings.append(self.atrium)
+        self.assertEqual(p.building_names, ('Atrium',))
+        self.assertEqual(p.incomplete_buildings, (self.atrium,))
+
+        p.buildings.extend([self.bar])
+        self.assertEqual(p.building_names, ('Atrium', 'Bar'))
+
+        p.buildings.pop(0)
+        self.assertEqual(p.building_names, ('Bar',))
+
+        p.buildings = [self.atrium]
+        self.assertEqual(p.building_names, ('Atrium',))
+
+    def test_complete_building(self):
+        p = self.p
+        p.buildings.append(self.atrium)
+        self.assertEqual(p.complete_buildings, ())
+
+        self.atrium.complete = True
+        self.assertEqual(p.complete_buildings, (self.atrium,))
+        self.assertEqual(p.incomplete_buildings, ())
+
+    def test_stairway(self):
+        p = self.p
+        p.buildings.append(self.atrium)
+        self.assertEqual(p.stairwayed_buildings, ())
+
+        self.atrium.stairway_materials.append(cm.get_card('Road'))
+        self.assertEqual(p.stairwayed_buildings, (self.atrium,))
+
+        self.atrium.stairway_materials.set_content([])
+        self.assertEqual(p.stairwayed_buildings, ())
+
+    def test_building_changes_owner(self):
+        p2 = Player(2, 'p2')
+        self.p.buildings.append(self.atrium)
+        self.assertEqual(self.p.complete_buildings, ())
+
+        p2.buildings.append(self.p.buildings.pop())
+        self.atrium.complete = True
+        self.assertEqual(p2.complete_buildings, (self.atrium,))
+        self.assertEqual(self.p.building_names, ())
+
+    def test_influence(self):
+        p = self.p
+        self.assertEqual(p.influence_points, 2)
+
+        p.influence.append('Marble')
+        self.assertEqual(p.influence_points, 5)
+
+        p.influence = ['Wood', 'Stone']
+        self.assertEqual(p.influence_points, 6)
+
+        p.influence.remove('Stone')
+        self.assertEqual(p.influence_points, 3)
+
+    def test_debug_cache(self):
+        """Changes that bypass the notifications are detected."""
+        p = self.p
+        p.buildings.append(self.atrium)
+        self.assertEqual(p.complete_buildings, ())
+
+        self.atrium._complete = True
+
+        with self.assertRaises(AssertionError):
+            p.complete_buildings
+
+    def test_copy(self):
+        p = self.p
+        p.buildings.append(self.atrium)
+        p.influence.append('Wood')
+
+        for p2 in (copy.deepcopy(p), pickle.loads(pickle.dumps(p))):
+            self.assertIsInstance(p2.buildings, ObservedList)
+            self.assertEqual(p2.influence_points, 3)
+
+            p2.buildings[0].complete = True
+            self.assertEqual(len(p2.complete_buildings), 1)
+            self.assertEqual(p.complete_buildings, ())
+
+
+if __name__ == '__main__':
+    unittest.main()
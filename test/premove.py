@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+
+from cloaca.error import GTRError
+from cloaca.game import Game
+import cloaca.encode as encode
+
+import cloaca.message as message
+
+import cloaca.test.test_setup as test_setup
+from cloaca.test.test_setup import TestDeck
+
+import pickle
+import unittest
+
+
+class TestPremove(unittest.TestCase):
+    """Test actions queued by a player before the game expects them.
+    """
+
+    def setUp(self):
+        self.deck = TestDeck()
+        d = self.deck
+
+        self.game = test_setup.simple_two_player()
+        self.p1, self.p2 = self.game.players
+
+        self.p1.hand.set_content([d.jack0])
+        self.p2.hand.set_content([d.latrine0])
+
+    def follow(self, *cards):
+        return message.GameAction(message.FOLLOWROLE, len(cards), *cards)
+
+    def lead(self, role):
+        self.game.handle(message.GameAction(message.THINKERORLEAD, False))
+        self.game.handle(message.GameAction(message.LEADROLE,
+                role, 1, self.deck.jack0))
+
+    def think(self):
+        self.game.handle(message.GameAction(message.THINKERORLEAD, True))
+        self.game.handle(message.GameAction(message.THINKERTYPE, False))
+
+    def test_follow_when_led(self):
+        d = self.deck
+        queued = self.game.queue_premove(self.p2, self.follow(d.latrine0),
+                role='Laborer')
+        self.assertFalse(queued)
+
+        self.lead('Laborer')
+
+        self.assertIn(d.latrine0, self.p2.camp)
+        self.assertEqual(self.game.expected_action, message.LABORER)
+        self.assertIs(self.game.active_player, self.p1)
+        self.assertIsNone(self.game.premoves)
+
+    def test_other_role(self):
+        d = self.deck
+        self.game.queue_premove(self.p2, self.follow(d.latrine0),
+                role='Craftsman')
+
+        self.lead('Laborer')
+
+        self.assertEqual(self.game.expected_action, message.FOLLOWROLE)
+        self.assertIs(self.game.active_player, self.p2)
+        self.assertEqual(len(self.game.premoves[1]), 1)
+
+    def test_stale(self):
+        """A premove that isn't used is dropped at the end of the turn."""
+        d = self.deck
+        self.game.queue_premove(self.p2, self.follow(d.latrine0),
+                role='Laborer')
+
+        self.think()
+
+        self.assertIs(self.game.leader, self.p2)
+        self.assertIsNone(self.game.premoves)
+        self.assertIsNone(self.game.role_led)
+
+    def test_keep(self):
+        """A kept premove is used every time it matches."""
+        think = message.GameAction(message.THINKERORLEAD, True)
+        self.game.queue_premove(self.p2, think, keep=True)
+
+        self.think()
+        self.assertIs(self.game.active_player, self.p2)
+        self.assertEqual(self.game.expected_action, message.THINKERTYPE)
+
+        self.game.handle(message.GameAction(message.THINKERTYPE, False))
+        self.think()
+        self.assertIs(self.game.active_player, self.p2)
+        self.assertEqual(self.game.expected_action, message.THINKERTYPE)
+        self.assertEqual(len(self.game.premoves[1]), 1)
+
+        self.game.clear_premoves(self.p2)
+        self.assertIsNone(self.game.premoves)
+
+    def test_rejected(self):
+        """A premove that fails the checks is dropped and the game waits
+        for the player.
+        """
+        d = self.deck
+        self.game.queue_premove(self.p2, self.follow(d.road0), role='Laborer')
+
+        self.lead('Laborer')
+
+        self.assertEqual(self.game.expected_action, message.FOLLOWROLE)
+        self.assertIs(self.game.active_player, self.p2)
+        self.assertIsNone(self.game.premoves)
+
+    def test_expected_now(self):
+        """A premove for the action the game is waiting for is handled
+        right away, and errors are raised.
+        """
+        d = self.deck
+        self.lead('Laborer')
+
+        with self.assertRaises(GTRError):
+            self.game.queue_premove(self.p2, self.follow(d.road0))
+        self.assertIsNone(self.game.premoves)
+
+        self.assertTrue(self.game.queue_premove(self.p2,
+                self.follow(d.latrine0)))
+        self.assertIn(d.latrine0, self.p2.camp)
+        self.assertIsNone(self.game.premoves)
+
+    def test_not_game_action(self):
+        with self.assertRaises(GTRError):
+            self.game.queue_premove(self.p2,
+                    message.GameAction(message.REQGAMESTATE))
+
+        with self.assertRaises(GTRError):
+            self.game.queue_premove(self.p2, self.follow(), role='Juggler')
+
+    def test_concurrent_follow(self):
+        """With concurrent_follow, a follower's premove is their early
+        decision.
+        """
+        d = self.deck
+        g = test_setup.simple_n_player(3)
+        g.concurrent_follow = True
+        p1, p2, p3 = g.players
+        p1.hand.set_content([d.jack0])
+        p3.hand.set_content([d.latrine0])
+
+        g.queue_premove(p3, self.follow(d.latrine0))
+        g.handle(message.GameAction(message.THINKERORLEAD, False))
+        g.handle(message.GameAction(message.LEADROLE, 'Laborer', 1, d.jack0))
+
+        self.assertEqual(g.waiting_for(), [p2])
+        g.handle(self.follow())
+        g.handle(message.GameAction(message.THINKERTYPE, False))
+        self.assertIn(d.latrine0, p3.camp)
+
+    def test_hidden(self):
+        d = self.deck
+        self.game.queue_premove(self.p2, self.follow(d.latrine0))
+
+        gs = self.game.privatized_game_state_copy('p1')
+        self.assertEqual(gs.premoves, [[], []])
+
+        gs = self.game.privatized_game_state_copy('p2')
+        self.assertEqual(gs.premoves, self.game.premoves)
+
+    def test_saved(self):
+        d = self.deck
+        self.game.queue_premove(self.p2, self.follow(d.latrine0),
+                role='Laborer')
+
+        copies = (
+                self.game.clone(),
+                pickle.loads(pickle.dumps(self.game)),
+                encode.json_to_game(encode.game_to_json(self.game)),
+                )
+
+        for g in copies:
+            g.handle(message.GameAction(message.THINKERORLEAD, False))
+            g.handle(message.GameAction(message.LEADROLE,
+                    'Laborer', 1, d.jack0))
+            self.assertIn(d.latrine0, g.players[1].camp)
+
+        self.assertIsNotNone(self.game.premoves)
+
+    def test_before_join(self):
+        """A premove can be queued before the other players join."""
+        g = Game()
+        g.add_player(1, 'p1')
+        think = message.GameAction(message.THINKERORLEAD, True)
+        thinker_type = message.GameAction(message.THINKERTYPE, False)
+        g.queue_premove(g.players[0], think, keep=True)
+
+        g.add_player(2, 'p2')
+        self.assertEqual([len(q) for q in g.premoves], [1, 0])
+
+        g.controlled_start()
+        p1, p2 = g.players
+        self.assertIs(g.active_player, p1)
+        self.assertEqual(g.expected_action, message.THINKERTYPE)
+        g.handle(thinker_type)
+
+        # p2's turn, and then p1's premove again.
+        g.handle(think)
+        g.handle(thinker_type)
+        self.assertIs(g.active_player, p1)
+        self.assertEqual(g.expected_action, message.THINKERTYPE)
+
+        g.premoves.pop()
+        g2 = pickle.loads(pickle.dumps(g))
+        self.assertEqual([len(q) for q in g2.premoves], [1, 0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+
+from cloaca.building import Building
+from cloaca.error import GameOver
+import cloaca.encode as encode
+
+import cloaca.test.test_setup as test_setup
+from cloaca.test.test_setup import TestDeck
+
+import pickle
+import unittest
+
+
+class TestScore(unittest.TestCase):
+    """Test the score parts, merchant bonuses and winners.
+    """
+
+    def setUp(self):
+        self.deck = TestDeck()
+        self.game = test_setup.simple_n_player(3)
+        self.p1, self.p2, self.p3 = self.game.players
+
+    def totals(self, game=None):
+        g = game or self.game
+        return [parts['total'] for parts in g.scores()]
+
+    def test_start(self):
+        self.assertEqual(self.game.score(self.p1), dict(influence=2, statue=0,
+                wall=0, vault=0, merchant=0, total=2))
+
+    def test_vaults(self):
+        """Each player scores their own vault."""
+        d = self.deck
+        self.p1.vault.set_content([d.atrium0, d.statue0])
+        self.p2.vault.set_content([d.road0])
+
+        self.assertEqual(self.game.score(self.p1)['vault'], 5)
+        self.assertEqual(self.game.score(self.p2)['vault'], 1)
+        self.assertEqual(self.game.score(self.p3)['vault'], 0)
+
+        # Merchant bonuses for Brick and Marble, and Rubble.
+        self.assertEqual(self.totals(), [2+5+6, 2+1+3, 2])
+        self.assertEqual(self.game._player_score(self.p2), 6)
+
+    def test_merchant_bonus_tie(self):
+        """Nobody gets the bonus for a material they tie on."""
+        d = self.deck
+        self.p1.vault.set_content([d.atrium0])
+        self.p2.vault.set_content([d.shrine0])
+        self.assertEqual(self.totals(), [4, 4, 2])
+
+        self.p2.vault.append(d.shrine1)
+        self.assertEqual(self.totals(), [4, 2+4+3, 2])
+
+    def test_live(self):
+        """The scores follow the cards as they move."""
+        d = self.deck
+        self.p1.vault.set_content([d.atrium0, d.road0])
+        self.p1.vault.move_card(d.atrium0, self.p2.vault)
+
+        self.assertEqual(self.totals(), [2+1+3, 2+2+3, 2])
+
+    def test_buildings(self):
+        d = self.deck
+        self.p1.buildings.append(Building(d.statue0, 'Marble', complete=True))
+        self.p1.buildings.append(Building(d.wall0, 'Concrete', complete=True))
+        self.p1.influence = ['Marble', 'Concrete']
+        self.p1.stockpile.set_content([d.road0, d.road1, d.latrine0])
+
+        parts = self.game.score(self.p1)
+        self.assertEqual(parts['influence'], 2+3+2)
+        self.assertEqual(parts['statue'], 3)
+        self.assertEqual(parts['wall'], 1)
+        self.assertEqual(parts['total'], 11)
+
+    def test_end_game(self):
+        d = self.deck
+        self.p2.vault.set_content([d.road0])
+        self.p3.vault.set_content([d.road1, d.road2])
+
+        with self.assertRaises(GameOver):
+            self.game._end_game()
+        self.assertEqual(self.game.winners, [self.p3])
+        self.assertIn('p3 has won the game with 7 points.',
+                self.game.game_log[-2])
+
+    def test_saved(self):
+        d = self.deck
+        self.p1.vault.set_content([d.atrium0])
+        self.p2.clientele.set_content([d.road0])
+
+        copies = (
+                self.game.clone(),
+                pickle.loads(pickle.dumps(self.game)),
+                encode.json_to_game(encode.game_to_json(self.game)),
+                )
+
+        for g in copies:
+            g.players[0].vault.move_card(d.atrium0, g.players[1].vault)
+            self.assertEqual(self.totals(g), [2, 2+2+3, 2])
+            self.assertEqual(g.players[1].clientele.roles(), ['Laborer'])
+
+        self.assertEqual(self.totals(), [2+2+3, 2, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,13 @@
 #!/usr/bin/env python
 
 from cloaca.server import GTRServer
+from cloaca.game import Game
+import cloaca.game
 from cloaca.error import GTRError
 from cloaca.game_record import GameRecord
 from cloaca.message import GameAction, Command
 import cloaca.message as m
+import cloaca.delta as delta
 
 from test_setup import simple_two_player
 
@@ -89,6 +92,22 @@ class TestServerCommands(unittest.TestCase):
 
         return tup[0], tup[1].game, tup[1].action.action, tup[1].action.args
 
+    def get_state(self, user, game_id):
+        """Return the user's state of the game from the GAMESTATE and
+        GAMESTATEPATCH responses they were sent, as a client would.
+        """
+        state = None
+        for u, resp in self.responses:
+            if u != user or resp.game != game_id:
+                continue
+
+            if resp.action.action == m.GAMESTATE:
+                state = json.loads(resp.action.args[0])
+            elif resp.action.action == m.GAMESTATEPATCH:
+                patch = json.loads(resp.action.args[0])
+                self.assertTrue(delta.apply_patch(state, patch))
+
+        return state
 
     def setUp(self):
         """Set up a server with two players registered.
@@ -181,6 +200,15 @@ class TestServerCommands(unittest.TestCase):
         self.assertEqual(record.started, False)
 
 
+    def test_create_game_auto_resolve(self):
+        self.s.handle_command(self.uid1, Command(None, GameAction(m.REQCREATEGAME)))
+        self.assertFalse(self.s.games[0].auto_resolve)
+
+        self.s.auto_resolve = True
+        self.s.handle_command(self.uid1, Command(None, GameAction(m.REQCREATEGAME)))
+        self.assertTrue(self.s.games[1].auto_resolve)
+
+
     def test_join_game(self):
         self.s.handle_command(self.uid1, Command(None, GameAction(m.REQCREATEGAME)))
         self.s.handle_command(self.uid2, Command(0, GameAction(m.REQJOINGAME)))
@@ -366,11 +394,128 @@ class TestServerCommands(unittest.TestCase):
 
         self.assertEqual(user, self.uid1)
         self.assertEqual(game, 0)
-        self.assertEqual(action, m.GAMESTATE)
+        self.assertEqual(action, m.GAMESTATEPATCH)
         self.assertEqual(len(args), 1)
 
-        gs_dict = json.loads(args[0])
+        patch = json.loads(args[0])
+        self.assertEqual(patch['from'], gs_dict['version'])
+        self.assertEqual(patch['to'], self.s.games[0].version)
+
+        gs_dict = self.get_state(self.uid1, 0)
         self.assertEqual(gs_dict['expected_action'], m.THINKERTYPE)
+        self.assertEqual(gs_dict['version'], self.s.games[0].version)
+
+        # The patched state is the same as a new GAMESTATE.
+        self.s.handle_command(self.uid1, Command(0, GameAction(m.REQGAMESTATE)))
+        user, game, action, args = self.get_response(-1)
+        self.assertEqual(action, m.GAMESTATE)
+        self.assertEqual(json.loads(args[0]), gs_dict)
+
+
+    def test_concurrent_follow(self):
+        """With concurrent_follow, a follower can decide before their turn.
+        """
+        uid3 = uuid4().int
+        self.s.register_user(uid3, dict(name='p3'))
+        self.s.concurrent_follow = True
+
+        self.s.handle_command(self.uid1, Command(None, GameAction(m.REQCREATEGAME)))
+        self.s.handle_command(self.uid2, Command(0, GameAction(m.REQJOINGAME)))
+        self.s.handle_command(uid3, Command(0, GameAction(m.REQJOINGAME)))
+        self.s.handle_command(self.uid1, Command(0, GameAction(m.REQSTARTGAME)))
+
+        game = self.s.games[0]
+        uids = dict(p1=self.uid1, p2=self.uid2, p3=uid3)
+        leader = game.leader
+        second, last = game._following_players_in_order()
+
+        self.s.handle_command(uids[leader.name],
+                Command(0, GameAction(m.THINKERORLEAD, False)))
+        jack = game.jacks.pop()
+        leader.hand.append(jack)
+        self.s.handle_command(uids[leader.name],
+                Command(0, GameAction(m.LEADROLE, 'Laborer', 1, jack)))
+        self.assertEqual(game.waiting_for(), [second, last])
+
+        self.s.handle_command(uids[last.name],
+                Command(0, GameAction(m.FOLLOWROLE, 0)))
+
+        user, game_id, action, args = self.get_response(-1)
+        self.assertEqual(action, m.GAMESTATEPATCH)
+        self.assertEqual(game.waiting_for(), [second])
+
+        self.s.handle_command(uids[second.name],
+                Command(0, GameAction(m.FOLLOWROLE, 0)))
+        self.assertEqual(game.expected_action, m.THINKERTYPE)
+        self.assertIs(game.active_player, second)
+
+
+    def test_premove(self):
+        """A premove that's queued is only sent back to the user, and
+        it's handled when the game gets to it.
+        """
+        self.s.handle_command(self.uid1, Command(None, GameAction(m.REQCREATEGAME)))
+        self.s.handle_command(self.uid2, Command(0, GameAction(m.REQJOINGAME)))
+        self.s.handle_command(self.uid1, Command(0, GameAction(m.REQSTARTGAME)))
+
+        game = self.s.games[0]
+        uids = dict(p1=self.uid1, p2=self.uid2)
+        leader = game.leader
+        follower = game.players[1 - game.leader_index]
+        follower.hand.set_content([])
+
+        premove = json.dumps({'action': m.FOLLOWROLE, 'args': [0]})
+        n_responses = len(self.responses)
+        self.s.handle_command(uids[follower.name],
+                Command(0, GameAction(m.PREMOVE, premove, 'Laborer', False)))
+
+        self.assertEqual(len(self.responses), n_responses + 1)
+        user, game_id, action, args = self.get_response(-1)
+        self.assertEqual(user, uids[follower.name])
+        self.assertEqual(action, m.GAMESTATEPATCH)
+        self.assertEqual(len(self.get_state(user, 0)['premoves'][
+                game.players.index(follower)]), 1)
+
+        self.s.handle_command(uids[leader.name],
+                Command(0, GameAction(m.THINKERORLEAD, False)))
+        jack = game.jacks.pop()
+        leader.hand.append(jack)
+        self.s.handle_command(uids[leader.name],
+                Command(0, GameAction(m.LEADROLE, 'Laborer', 1, jack)))
+
+        self.assertEqual(game.expected_action, m.THINKERTYPE)
+        self.assertIs(game.active_player, follower)
+        self.assertIsNone(game.premoves)
+
+    def test_premove_error(self):
+        self.s.handle_command(self.uid1, Command(None, GameAction(m.REQCREATEGAME)))
+        self.s.handle_command(self.uid2, Command(0, GameAction(m.REQJOINGAME)))
+        self.s.handle_command(self.uid1, Command(0, GameAction(m.REQSTARTGAME)))
+
+        self.s.handle_command(self.uid1,
+                Command(0, GameAction(m.PREMOVE, 'not json', None, True)))
+
+        user, game_id, action, args = self.get_response(-1)
+        self.assertEqual(action, m.SERVERERROR)
+        self.assertIsNone(self.s.games[0].premoves)
+
+    def test_handler_stats(self):
+        """With Game.profile_handlers set, the server reports the calls
+        to each action handler.
+        """
+        Game.profile_handlers = True
+        self.addCleanup(setattr, Game, 'profile_handlers', False)
+        cloaca.game.reset_handler_stats()
+
+        self.s.handle_command(self.uid1, Command(None, GameAction(m.REQCREATEGAME)))
+        self.s.handle_command(self.uid1, Command(0, GameAction(m.REQSTARTGAME)))
+        self.s.handle_command(self.uid1, Command(0, GameAction(m.THINKERORLEAD, True)))
+        self.s.handle_command(self.uid1, Command(0, GameAction(m.THINKERTYPE, True)))
+
+        stats = self.s.handler_stats()
+        self.assertEqual(set(stats), set(['thinkerorlead', 'thinkertype']))
+        self.assertEqual(stats['thinkerorlead']['calls'], 1)
+        self.assertGreaterEqual(stats['thinkertype']['time'], 0)
 
 
     def test_handle_bad_action(self):
@@ -388,6 +533,41 @@ class TestServerCommands(unittest.TestCase):
         self.assertEqual(action, m.SERVERERROR)
         self.assertIsNone(game)
 
+        user, game, action, args = self.get_response(-1)
+        self.assertEqual(user, self.uid1)
+        self.assertEqual(action, m.GAMESTATE)
+
+    def test_patch_only_changes(self):
+        """A player whose view of the game didn't change isn't sent a
+        patch, and a patch has only what changed.
+        """
+        self.s.handle_command(self.uid1, Command(None, GameAction(m.REQCREATEGAME)))
+        self.s.handle_command(self.uid2, Command(0, GameAction(m.REQJOINGAME)))
+        self.s.handle_command(self.uid1, Command(0, GameAction(m.REQSTARTGAME)))
+
+        game = self.s.games[0]
+        uids = dict(p1=self.uid1, p2=self.uid2)
+        leader = uids[game.leader.name]
+        follower = uids[game.players[1 - game.leader_index].name]
+
+        # Only the follower sees their queued premove.
+        premove = json.dumps({'action': m.FOLLOWROLE, 'args': [0]})
+        n_responses = len(self.responses)
+        self.s.handle_command(follower,
+                Command(0, GameAction(m.PREMOVE, premove, 'Laborer', False)))
+        self.assertEqual([u for u, _ in self.responses[n_responses:]],
+                [follower])
+
+        n_responses = len(self.responses)
+        self.s.handle_command(leader,
+                Command(0, GameAction(m.THINKERORLEAD, True)))
+        for u, resp in self.responses[n_responses:]:
+            self.assertEqual(resp.action.action, m.GAMESTATEPATCH)
+            patch = json.loads(resp.action.args[0])
+            paths = [tuple(p[0]) for p in patch['set'] + patch['splice']]
+            self.assertIn(('expected_action',), paths)
+            self.assertNotIn(('players', 0, 'name'), paths)
+
 
     def test_handle_invalid_actions(self):
         """The server doens't handle GAMESTATE, CREATEGAME, etc.
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+
+from cloaca.game import Game
+from cloaca.player import Player
+from cloaca.building import Building
+from cloaca.zone import Zone, Library
+from cloaca.stack import Frame
+from cloaca.card import Card
+from cloaca.error import GameOver
+import cloaca.message as message
+
+import pickle
+import copy
+import unittest
+
+def thinker_game():
+    g = Game()
+    for i in range(3):
+        g.add_player(i, 'p{0:d}'.format(i+1))
+    g.start()
+
+    try:
+        for turn in range(12):
+            g.handle(message.GameAction(message.THINKERORLEAD, True))
+            for_jack = turn % 2 == 1 and len(g.jacks) > 0
+            g.handle(message.GameAction(message.THINKERTYPE, for_jack))
+    except GameOver:
+        pass
+
+    return g
+
+
+class TestSlots(unittest.TestCase):
+    """Game objects use __slots__ but keep their dict representation.
+    """
+
+    def test_no_new_attributes(self):
+        objects = [Game(), Player(1, 'p1'), Building(Card(10), 'Wood'),
+                Zone(), Library(), Frame(0)]
+
+        for o in objects:
+            with self.assertRaises(AttributeError):
+                o.not_an_attribute = 1
+
+    def test_dict(self):
+        p = Player(1, 'p1')
+        self.assertEqual(p.__dict__['uid'], 1)
+        self.assertIs(p.__dict__['hand'], p.hand)
+        self.assertEqual(vars(Building(Card(10), 'Wood'))['site'], 'Wood')
+
+        g = Game()
+        self.assertIn('in_town_sites', g.__dict__)
+        self.assertNotIn('_in_town_counts', g.__dict__)
+
+    def test_sites(self):
+        g = Game()
+        g.in_town_sites = ['Wood', 'Brick', 'Wood']
+        self.assertEqual(g.in_town_sites, ['Brick', 'Wood', 'Wood'])
+        self.assertEqual(g.out_of_town_sites, [])
+
+        g._init_sites(4)
+        self.assertEqual(g.in_town_sites.count('Marble'), 4)
+        self.assertEqual(g.out_of_town_sites.count('Marble'), 2)
+
+    def test_pickle(self):
+        g = thinker_game()
+        for protocol in range(pickle.HIGHEST_PROTOCOL+1):
+            g2 = pickle.loads(pickle.dumps(g, protocol))
+
+            self.assertEqual(sorted(g2.__dict__), sorted(g.__dict__))
+            self.assertEqual(g2.in_town_sites, g.in_town_sites)
+            self.assertEqual(g2.library, g.library)
+            self.assertEqual([p.hand for p in g2.players],
+                    [p.hand for p in g.players])
+            g2.check_card_locations()
+
+    def test_deepcopy(self):
+        g = thinker_game()
+        g2 = copy.deepcopy(g)
+
+        self.assertIsNot(g2.players[0].hand, g.players[0].hand)
+        self.assertEqual(g2.players[0].hand, g.players[0].hand)
+        g2.check_card_locations()
+
+    def test_building_equality(self):
+        b = Building(Card(10), 'Wood', [Card(20)])
+        self.assertEqual(b, Building(Card(10), 'Wood', [Card(20)]))
+        self.assertNotEqual(b, Building(Card(10), 'Wood'))
+        self.assertNotEqual(b, Building(Card(10), 'Rubble', [Card(20)]))
+
+
+if __name__ == '__main__':
+    unittest.main()
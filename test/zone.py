@@ -1,9 +1,11 @@
 #!/usr/bin/env python
 
-from cloaca.zone import Zone
+from cloaca.zone import Zone, Library
 import cloaca.card_manager as cm
 from cloaca.card import Card
+from cloaca.error import GTRError
 
+import pickle
 import unittest
 
 
@@ -37,6 +39,265 @@ class TestZone(unittest.TestCase):
         with self.assertRaises(ValueError):
             z.get_cards(['Latrine', 'Dock', 'Dock'])
 
+    def test_counts_follow_changes(self):
+        latrine0, latrine1, dock = cm.get_cards(['Latrine', 'Latrine', 'Dock'])
+        z = Zone([latrine0, dock])
+        z2 = Zone(name='other')
+
+        self.assertEqual(z.count('Latrine'), 1)
+        self.assertIn('Dock', z)
+        self.assertIn(latrine0, z)
+        self.assertNotIn(latrine1, z)
+
+        z.append(latrine1)
+        z.move_card('Dock', z2)
+
+        self.assertEqual(z.count('Latrine'), 2)
+        self.assertEqual(z.count('Dock'), 0)
+        self.assertNotIn('Dock', z)
+        self.assertNotIn(dock, z)
+        self.assertIn(dock, z2)
+
+        z.set_content([dock])
+
+        self.assertEqual(z.count('Latrine'), 0)
+        self.assertIn(dock, z)
+
+    def test_large_zone_counts(self):
+        """Counts stay right as a zone grows past the size that keeps
+        counts and shrinks back.
+        """
+        cards = cm.get_orders_card_set()[:24] + [Card(-1)]*3
+        z = Zone(cards[:4])
+        z2 = Zone(name='other')
+
+        def check():
+            names = [c.name for c in z.cards]
+            for c in set(cards):
+                self.assertEqual(c in z, c in z.cards)
+                self.assertEqual(z.count(c.name), names.count(c.name))
+                self.assertEqual(c.name in z, c.name in names)
+
+        check()
+        z.extend(cards[4:])
+        check()
+        z.move_cards(cards[:10], z2)
+        check()
+        while len(z) > 3:
+            z.pop()
+            check()
+        z2.move_all(z)
+        check()
+
+    def test_contains(self):
+        z = Zone(cm.get_cards(['Latrine', 'Latrine', 'Circus', 'Dock']))
+        latrine0, latrine1, circus, dock = z.cards
+
+        self.assertTrue(z.contains(['Latrine', 'Latrine', 'Dock']))
+        self.assertFalse(z.contains(['Latrine', 'Latrine', 'Latrine']))
+        self.assertTrue(z.contains([latrine1, dock]))
+        self.assertFalse(z.contains([dock, dock]))
+        self.assertTrue(z.contains([]))
+
+    def test_pop_name(self):
+        z = Zone(cm.get_cards(['Latrine', 'Dock', 'Latrine']))
+        first = z.cards[0]
+
+        self.assertIs(z.pop_name('Latrine'), first)
+        self.assertEqual(z.count('Latrine'), 1)
+        self.assertEqual([c.name for c in z], ['Dock', 'Latrine'])
+
+        with self.assertRaises(ValueError):
+            z.pop_name('Circus')
+
+
+class TestMoveCards(unittest.TestCase):
+    """Tests for the bulk moves Zone.move_cards() and Zone.move_all().
+    """
+
+    def setUp(self):
+        self.cards = list(cm.get_cards(['Latrine', 'Latrine', 'Circus', 'Dock', 'Road']))
+        self.source = Zone(self.cards, name='source')
+        self.target = Zone([Card(0)], name='target')
+
+    def test_move_cards(self):
+        latrine, latrine2, circus, dock, road = self.cards
+        self.source.move_cards([dock, latrine2], self.target)
+
+        self.assertEqual(self.source.cards, [latrine, circus, road])
+        self.assertEqual(self.target.cards, [Card(0), dock, latrine2])
+        self.assertEqual(self.source.count('Latrine'), 1)
+        self.assertNotIn(dock, self.source)
+        self.assertIn(dock, self.target)
+
+    def test_move_every_card(self):
+        self.source.move_cards(reversed(self.cards), self.target)
+
+        self.assertEqual(len(self.source), 0)
+        self.assertEqual(self.target.cards, [Card(0)] + self.cards[::-1])
+        self.assertNotIn('Latrine', self.source)
+
+    def test_move_missing_card(self):
+        """Nothing is moved if any card is missing."""
+        with self.assertRaises(GTRError):
+            self.source.move_cards([self.cards[0], Card(1)], self.target)
+
+        with self.assertRaises(GTRError):
+            self.source.move_cards([self.cards[2], self.cards[2]], self.target)
+
+        self.assertEqual(self.source.cards, self.cards)
+        self.assertEqual(self.target.cards, [Card(0)])
+
+    def test_move_non_card(self):
+        with self.assertRaises(GTRError):
+            self.source.move_cards(['Latrine'], self.target)
+
+    def test_move_no_cards(self):
+        self.source.move_cards([], self.target)
+        self.assertEqual(self.source.cards, self.cards)
+
+    def test_move_all(self):
+        self.source.move_all(self.target)
+
+        self.assertEqual(len(self.source), 0)
+        self.assertEqual(self.target.cards, [Card(0)] + self.cards)
+        self.assertEqual(self.target.count('Latrine'), 2)
+
+    def test_move_from_library(self):
+        l = Library(self.cards)
+        l.move_cards(self.cards[1:3], self.target)
+
+        self.assertEqual(l.cards, self.cards[:1] + self.cards[3:])
+        self.assertEqual(l.draw(), self.cards[:1])
+
+
+class TestTally(unittest.TestCase):
+    """The value and counts by material and role of a zone with a tally
+    follow the changes to its cards.
+    """
+
+    def setUp(self):
+        self.cards = cm.get_cards(['Jack', 'Latrine', 'Atrium', 'Statue'])
+        self.zone = Zone(self.cards)
+        self.zone.keep_tally()
+        self.other = Zone(name='other')
+
+    def check(self, zone):
+        """Compare the tally with the counts of an untallied copy."""
+        plain = Zone(zone.cards)
+        self.assertEqual(zone.value, plain.value)
+        self.assertEqual(sorted(zone.roles()), sorted(plain.roles()))
+        for material in cm.get_materials():
+            self.assertEqual(zone.material_count(material),
+                    plain.material_count(material))
+        for role in cm.get_all_roles():
+            self.assertEqual(zone.role_count(role), plain.role_count(role))
+
+    def test_counts(self):
+        z = self.zone
+        self.assertEqual(z.value, 1 + 2 + 3)
+        self.assertEqual(z.material_count('Brick'), 1)
+        self.assertEqual(z.role_count('Laborer'), 1)
+        self.assertEqual(sorted(z.roles()), ['Laborer', 'Legionary', 'Patron'])
+        self.check(z)
+
+    def test_moves(self):
+        z = self.zone
+        z.move_card('Atrium', self.other)
+        self.assertEqual(z.value, 4)
+        self.assertEqual(z.material_count('Brick'), 0)
+        self.assertNotIn('Legionary', z.roles())
+
+        z.extend(cm.get_cards(['Road', 'Road']))
+        self.assertEqual(z.material_count('Rubble'), 3)
+        self.check(z)
+
+        z.move_cards(z.cards[1:3], self.other)
+        self.check(z)
+
+        z.move_all(self.other)
+        self.assertEqual(z.value, 0)
+        self.assertEqual(z.roles(), [])
+
+        z.set_content(self.cards)
+        self.check(z)
+
+    def test_copies(self):
+        z = self.zone
+        for copy in (z.clone(), pickle.loads(pickle.dumps(z))):
+            copy.keep_tally()
+            copy.pop()
+            self.check(copy)
+        self.check(z)
+
+
+class TestLibrary(unittest.TestCase):
+    """Tests for the Library zone, which is stored bottom first.
+    """
+
+    def setUp(self):
+        self.cards = [Card(i) for i in range(10, 20)]
+        self.library = Library(self.cards)
+
+    def test_cards_top_first(self):
+        self.assertEqual(self.library.cards, self.cards)
+        self.assertEqual(list(self.library), self.cards)
+        self.assertEqual(self.library, Zone(self.cards, name='library'))
+
+    def test_draw(self):
+        self.assertEqual(self.library.draw(3), self.cards[:3])
+        self.assertEqual(self.library.draw(), self.cards[3:4])
+        self.assertEqual(self.library.draw(0), [])
+        self.assertEqual(self.library.cards, self.cards[4:])
+        self.assertNotIn(self.cards[0], self.library)
+        self.assertEqual(len(self.library), 6)
+
+    def test_draw_too_many(self):
+        with self.assertRaises(IndexError):
+            self.library.draw(11)
+
+        self.assertEqual(self.library.cards, self.cards)
+
+    def test_pop(self):
+        self.assertEqual(self.library.pop(), self.cards[0])
+        self.assertEqual(self.library.pop(-1), self.cards[-1])
+        self.assertEqual(self.library.pop(2), self.cards[3])
+        self.assertEqual(self.library.cards,
+                self.cards[1:3] + self.cards[4:-1])
+
+    def test_put_on_top(self):
+        c = Card(5)
+        self.library.put_on_top(c)
+        self.assertEqual(self.library.cards, [c] + self.cards)
+        self.assertIn(c, self.library)
+
+    def test_add_to_bottom(self):
+        self.library.append(Card(5))
+        self.library.extend([Card(4), Card(3)])
+        self.assertEqual(self.library.cards,
+                self.cards + [Card(5), Card(4), Card(3)])
+
+    def test_index(self):
+        self.assertEqual(self.library.index(self.cards[4]), 4)
+        self.assertEqual(self.library.index(self.cards[4].name),
+                [c.name for c in self.cards].index(self.cards[4].name))
+
+        with self.assertRaises(ValueError):
+            self.library.index(Card(5))
+
+    def test_cards_is_a_copy(self):
+        self.library.cards.pop()
+        self.assertEqual(len(self.library), 10)
+
+    def test_shuffle(self):
+        self.library.shuffle()
+        self.assertEqual(sorted(self.library.cards), self.cards)
+
+    def test_pickle(self):
+        l = pickle.loads(pickle.dumps(self.library))
+        self.assertEqual(l.cards, self.cards)
+        self.assertEqual(l.draw(2), self.cards[:2])
+
 
 if __name__ == '__main__':
     unittest.main()
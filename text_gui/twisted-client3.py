@@ -13,6 +13,7 @@ import collections
 
 import message
 from message import GameAction
+import delta
 import client3 as client
 from client3 import Choice
 from curses_gui import CursesGUI
@@ -23,6 +24,7 @@ from display import GameStateTextDisplay
 from fsm import StateMachine
 
 import pickle
+import json
 
 import logging
 import sys
@@ -304,6 +306,7 @@ class ServerProtocol(NetstringReceiver):
         """
         self._ui = ui
         self._ui.set_server_protocol(self)
+        self._game_state = None # Decoded GAMESTATE, kept to apply patches
 
     def connectionMade(self):
         """When connected, update game list.
@@ -345,15 +348,29 @@ class ServerProtocol(NetstringReceiver):
                 game_state = None
             else:
                 try:
-                    game_state = pickle.loads(a.args[0])
-                except PickleError:
-                    lg.warn('Failed to unpickle GameState object.')
+                    game_state = json.loads(a.args[0])
+                except ValueError:
+                    lg.warn('Failed to decode GameState JSON.')
                     game_state = None
+                else:
+                    lg.debug('Received game state version {0!s}'.format(
+                            game_state and game_state.get('version')))
 
-                lg.debug('Received game state: {0:10d}'.format(hash(game_state)))
-
+            self._game_state = game_state
             self._ui.update_game_state(game_state)
 
+        elif action == message.GAMESTATEPATCH:
+            patch = json.loads(a.args[0])
+            if (self._game_state is not None and
+                    delta.apply_patch(self._game_state, patch)):
+                lg.debug('Patched game state to version {0:d}'.format(
+                        patch['to']))
+                self._ui.update_game_state(self._game_state)
+            else:
+                lg.debug('Missed an update, requesting the game state.')
+                self.send_command(self._ui.username, patch['game_id'],
+                        GameAction(message.REQGAMESTATE))
+
         elif action == message.JOINGAME:
             game_id = a.args[0]
             lg.debug('Received acknowledgement of joining game ' + str(game_id))
@@ -1,20 +1,274 @@
 from cloaca.card import Card
 from cloaca.error import GTRError
+from cloaca.slots import SlotsObject
+import cloaca.catalog as catalog
 
 from collections import Counter
+import random
 
-class Zone(object):
+# Zones with fewer cards than this don't keep counts, and are searched
+# instead. Most zones hold a handful of cards or none, and two dicts
+# would take several times the memory of the cards themselves.
+_COUNTED_SIZE = 16
+
+def _count_cards(cards):
+    """Return dicts of the counts of the iterable of cards by Card and
+    by name.
+    """
+    card_counts = {}
+    for c in cards:
+        card_counts[c] = card_counts.get(c, 0) + 1
+
+    # Name counts from the distinct cards, eg. just one for the
+    # anonymous cards of a privatized library.
+    name_counts = {}
+    for c, n in card_counts.iteritems():
+        name_counts[c.name] = name_counts.get(c.name, 0) + n
+    return card_counts, name_counts
+
+def _new_tally(card_counts):
+    """Return [value, material counts, role counts] for the dict of
+    card counts of a zone.
+    """
+    tally = [0, {}, {}]
+    for c, n in card_counts.iteritems():
+        _tally_card(tally, c, n)
+    return tally
+
+def _tally_card(tally, card, n):
+    """Add n copies of the card to the tally, or remove them if n is
+    negative. Jacks and anonymous cards have no value, material or role.
+    """
+    i = card.ident
+    value = catalog.values[i]
+    if value is None:
+        return
+    tally[0] += n*value
+
+    counts = tally[1]
+    key = catalog.materials[i]
+    k = counts.get(key, 0) + n
+    if k > 0:
+        counts[key] = k
+    else:
+        del counts[key]
+
+    counts = tally[2]
+    key = catalog.roles[i]
+    k = counts.get(key, 0) + n
+    if k > 0:
+        counts[key] = k
+    else:
+        del counts[key]
+
+
+class Zone(SlotsObject):
     """An iterable container for Card objects.
+
+    Along with the ordered list of cards, a zone of at least
+    _COUNTED_SIZE cards keeps a count of its cards by name and by Card,
+    updated as cards are added and removed. This makes count(),
+    membership tests and contains() constant time in the size of the
+    zone. The counts are made the first time they're needed, so zones
+    that are never searched, like the library, don't keep them. Smaller
+    zones, which are most of them, are searched instead.
+
+    The cards attribute is the ordered list of cards. Modify the zone
+    with the methods here rather than by changing the list directly,
+    or the counts will be wrong.
+
+    A zone that belongs to a game can be attached to the game's
+    location.CardLocations table with track(). It then records every
+    card added to it in the table.
+
+    The owner of a zone can set on_change to a function of no arguments,
+    which is called after every change to the zone's cards.
+
+    After keep_tally(), the zone also keeps the total value of its cards
+    and their counts by material and by role, eg. for scoring a vault.
     """
 
+    __slots__ = ('cards', 'name', '_location', '_name_counts', '_card_counts',
+            'on_change', '_tally')
+    _fields = ('cards', 'name', '_location')
+
     def __init__(self, cards=[], name='zone'):
         """Initialize an instance with an iterable of Card objects.
 
         Additionally the "name" keyword argument is used as the name
-        attribute (defaults to "zone"). 
+        attribute (defaults to "zone").
         """
         self.cards = list(cards)
         self.name = name
+        self._location = None
+        self.on_change = None
+        self._tally = None
+        self._recount()
+
+    def __setstate__(self, state):
+        SlotsObject.__setstate__(self, state)
+        if '_location' not in state:
+            self._location = None
+        self.on_change = None
+        self._tally = None
+        self._recount()
+
+    def track(self, locations, kind, player=-1, building=-1):
+        """Record the cards in this zone, and cards added to it later, in
+        the CardLocations table as being in the specified zone kind and
+        owned by player. If locations is None, stop tracking.
+        """
+        if locations is None:
+            self._location = None
+        else:
+            self._location = (locations, kind, player, building)
+            locations.place(self.cards, kind, player, building)
+
+    def _recount(self):
+        """Drop the name and card counts after the list of cards has
+        been replaced, and rebuild the tally.
+        """
+        self._card_counts = self._name_counts = None
+
+        if self._tally is not None:
+            self._tally = _new_tally(self._get_card_counts())
+
+    def _kept_counts(self):
+        """Return the card and name counts of a zone of at least
+        _COUNTED_SIZE cards as a pair of dicts, counting the cards if
+        it's the first time. Return None for a smaller zone.
+        """
+        if self._card_counts is None:
+            if len(self) < _COUNTED_SIZE:
+                return None
+            self._card_counts, self._name_counts = _count_cards(self)
+
+        return self._card_counts, self._name_counts
+
+    def _get_card_counts(self):
+        """Return the dict of card counts, counting the cards now if the
+        zone doesn't keep them. Don't change the dict.
+        """
+        counts = self._kept_counts()
+        return (counts or _count_cards(self))[0]
+
+    def _get_name_counts(self):
+        """Return the dict of name counts, counting the cards now if the
+        zone doesn't keep them. Don't change the dict.
+        """
+        counts = self._kept_counts()
+        return (counts or _count_cards(self))[1]
+
+    def _count_in(self, cards):
+        """Count the cards, which have just been added to the zone."""
+        card_counts = self._card_counts
+        if card_counts is not None:
+            name_counts = self._name_counts
+            for c in cards:
+                card_counts[c] = card_counts.get(c, 0) + 1
+                name_counts[c.name] = name_counts.get(c.name, 0) + 1
+
+        if self._tally is not None:
+            for c in cards:
+                _tally_card(self._tally, c, 1)
+
+    def _count_out(self, cards):
+        """Uncount the cards, which have just been removed from the zone.
+
+        The counts are dropped once the zone is down to half the size
+        that keeps them, so that a zone going back and forth around
+        _COUNTED_SIZE doesn't rebuild them every time.
+        """
+        card_counts = self._card_counts
+        if card_counts is not None and len(self) < _COUNTED_SIZE // 2:
+            self._card_counts = self._name_counts = None
+        elif card_counts is not None:
+            name_counts = self._name_counts
+            for c in cards:
+                name = c.name
+                n = name_counts.get(name, 0) - 1
+                if n > 0:
+                    name_counts[name] = n
+                else:
+                    name_counts.pop(name, None)
+
+                n = card_counts.get(c, 0) - 1
+                if n > 0:
+                    card_counts[c] = n
+                else:
+                    card_counts.pop(c, None)
+
+        if self._tally is not None:
+            for c in cards:
+                _tally_card(self._tally, c, -1)
+
+    def keep_tally(self):
+        """Keep the total value of the cards and their counts by material
+        and by role, updated as cards are added and removed. This makes
+        value, material_count(), role_count() and roles() constant time.
+        """
+        if self._tally is None:
+            self._tally = _new_tally(self._get_card_counts())
+
+    @property
+    def value(self):
+        """Total value of the cards, eg. the points of a vault."""
+        if self._tally is not None:
+            return self._tally[0]
+        return _new_tally(self._get_card_counts())[0]
+
+    def material_count(self, material):
+        """Return the number of cards of the material."""
+        if self._tally is not None:
+            return self._tally[1].get(material, 0)
+        return sum(1 for c in self if c.material == material)
+
+    def material_counts(self):
+        """Return a dict of the number of cards of each material."""
+        if self._tally is not None:
+            return self._tally[1].copy()
+        return _new_tally(self._get_card_counts())[1]
+
+    def role_count(self, role):
+        """Return the number of cards of the role."""
+        if self._tally is not None:
+            return self._tally[2].get(role, 0)
+        return sum(1 for c in self if c.role == role)
+
+    def roles(self):
+        """Return the list of roles of the cards, without repeats."""
+        if self._tally is not None:
+            return self._tally[2].keys()
+        return _new_tally(self._get_card_counts())[2].keys()
+
+    def clone(self, locations=None):
+        """Return a copy of this zone that shares the Card objects.
+
+        If this zone is tracked, the copy is tracked in locations, which
+        should be a copy of this zone's CardLocations table. Nothing is
+        recorded in it, since it already has the cards. The copy has no
+        on_change function.
+        """
+        z = object.__new__(type(self))
+        self._copy_cards_to(z)
+        z.name = self.name
+        if self._card_counts is None:
+            z._card_counts = z._name_counts = None
+        else:
+            z._card_counts = self._card_counts.copy()
+            z._name_counts = self._name_counts.copy()
+        tally = self._tally
+        z._tally = None if tally is None else \
+                [tally[0], tally[1].copy(), tally[2].copy()]
+        z.on_change = None
+        if self._location is not None and locations is not None:
+            z._location = (locations,) + self._location[1:]
+        else:
+            z._location = None
+        return z
+
+    def _copy_cards_to(self, zone):
+        zone.cards = self.cards[:]
 
     def set_content(self, cards):
         """Set the content of this zone to the specified cards.
@@ -34,11 +288,19 @@ class Zone(object):
                     'that isn\'t of class Card.'.format(self.name))
 
         self.cards = list(cards)
+        self._recount()
+
+        if self._location is not None:
+            locations, kind, player, building = self._location
+            locations.place(self.cards, kind, player, building)
+
+        if self.on_change is not None:
+            self.on_change()
 
 
     def move_card(self, card, target_zone):
         """Move the card from this zone to the target_zone.
-        
+
         The card can be specified by name (string) or as a Card object.
         Raise GTRError if hte card does not exist in this zone.
 
@@ -50,26 +312,119 @@ class Zone(object):
             i = self.index(card)
         except ValueError:
             raise GTRError('Source zone "{0}" does not contain {1}. '
-                    'Move to zone "{1}" failed.'
+                    'Move to zone "{2}" failed.'
                     .format(self.name, str(card), target_zone.name))
 
         target_zone.append(self.pop(i))
 
 
+    def move_cards(self, cards, target_zone, trusted=False):
+        """Move the cards from this zone to the end of target_zone, in
+        the order given.
+
+        The cards are checked once, up front, and removed from this zone
+        in a single pass. Raise GTRError if this zone doesn't contain all
+        of the cards, counting repeats; in that case nothing is moved.
+
+        Args:
+            cards -- iterable of Card objects.
+            target_zone -- Zone object.
+            trusted -- if True, skip checking that each object is a Card.
+                For moves within the engine, where the cards come from
+                another zone.
+        """
+        cards = list(cards)
+        if not cards:
+            return
+
+        if not trusted:
+            for c in cards:
+                if not isinstance(c, Card):
+                    raise GTRError('Tried to move an object from \'{0}\' '
+                        'that isn\'t of class Card.'.format(self.name))
+
+        counts = self._get_card_counts()
+        to_remove = Counter(cards)
+        for c, n in to_remove.items():
+            if counts.get(c, 0) < n:
+                raise GTRError('Source zone "{0}" does not contain {1}. '
+                        'Move to zone "{2}" failed.'
+                        .format(self.name, ', '.join(map(str, cards)),
+                            target_zone.name))
+
+        if len(cards) == len(self):
+            self.cards = []
+            self._recount()
+        else:
+            kept = []
+            for c in self.cards:
+                n = to_remove.get(c, 0)
+                if n:
+                    to_remove[c] = n-1
+                else:
+                    kept.append(c)
+
+            self.cards = kept
+            self._count_out(cards)
+
+        if self.on_change is not None:
+            self.on_change()
+
+        target_zone.extend(cards, trusted=True)
+
+
+    def move_all(self, target_zone):
+        """Move every card in this zone to the end of target_zone, keeping
+        their order.
+        """
+        cards = self.cards
+        if not cards:
+            return
+
+        self.cards = []
+        self._recount()
+
+        if self.on_change is not None:
+            self.on_change()
+
+        target_zone.extend(cards, trusted=True)
+
+
     def pop(self, index=-1):
         """Pop a card at given index (default last), just like a list."""
-        return self.cards.pop(index)
-        
+        card = self.cards.pop(index)
+        self._count_out((card,))
+
+        if self.on_change is not None:
+            self.on_change()
+
+        return card
+
+
+    def pop_name(self, name):
+        """Remove and return the first card with the specified name.
+
+        Raise ValueError if there is no such card.
+        """
+        return self.pop(self.index(name))
+
 
     def __len__(self):
         return len(self.cards)
 
 
     def __contains__(self, card):
-        try:
-            self.index(card)
-            return True
-        except ValueError:
+        if isinstance(card, Card):
+            counts = self._kept_counts()
+            if counts is None:
+                return card in self.cards
+            return card in counts[0]
+        elif isinstance(card, basestring):
+            counts = self._kept_counts()
+            if counts is None:
+                return any(c.name == card for c in self)
+            return card in counts[1]
+        else:
             return False
 
 
@@ -77,12 +432,19 @@ class Zone(object):
         """Return the intersection of this zone and the iterable of Card objects as
         a collections.Counter object.
         """
-        return (Counter(cards) & Counter(self.cards))
+        counts = self._get_card_counts()
+        out = Counter()
+        for c, n in Counter(cards).items():
+            n = min(n, counts.get(c, 0))
+            if n > 0:
+                out[c] = n
+
+        return out
 
 
     def contains(self, cards):
         """Return True if this contains all cards in the sequence.
-        
+
         Repeated card names must be in this zone multiple times.
         If cards is a sequence of Card objects, they are compared by Card.ident.
         If cards is empty, return True.
@@ -95,13 +457,15 @@ class Zone(object):
             return True
 
         if type(cards[0]) is Card:
-            return self.intersection(cards) == Counter(cards)
-
+            counts = self._get_card_counts()
         else:
-            h = Counter(map(lambda x: x.name, self.cards))
-            c = Counter(cards)
+            counts = self._get_name_counts()
 
-            return (c & h) == c # intersection
+        for c, n in Counter(cards).items():
+            if counts.get(c, 0) < n:
+                return False
+
+        return True
 
 
     def equal_contents(self, other):
@@ -110,34 +474,68 @@ class Zone(object):
         Args:
             other -- iterable of Card objects.
         """
-        return len(Counter(self.cards) - Counter(other.cards)) == 0
+        other_counts = other._get_card_counts()
+        for c, n in self._get_card_counts().iteritems():
+            if other_counts.get(c, 0) < n:
+                return False
 
-    
-    def index(self, card):
-        if isinstance(card, Card):
-            try:
-                return self.cards.index(card)
-            except ValueError:
-                raise ValueError('{0!r} is not in zone \'{1}\''
-                        .format(card, self.name))
+        return True
 
-        elif isinstance(card, basestring):
-            for i, c in enumerate(self.cards):
-                if c.name == card: return i
 
-            raise ValueError('{0!r} is not in zone \'{1}\''
-                    .format(card, self.name))
+    def index(self, card):
+        """Return the position of the first matching card.
 
+        The card can be specified by name (string) or as a Card object.
+        Raise ValueError if there is no such card in this zone.
+        """
+        counts = self._kept_counts()
+        if isinstance(card, Card):
+            if counts is None or card in counts[0]:
+                try:
+                    return self.cards.index(card)
+                except ValueError:
+                    pass
 
-    def extend(self, cards):
+        elif isinstance(card, basestring):
+            if counts is None or card in counts[1]:
+                # Copies of a card have a contiguous range of idents, so
+                # the name doesn't need to be looked up for each card.
+                ident_range = catalog.ident_ranges.get(card)
+                if ident_range is None:
+                    for i, c in enumerate(self.cards):
+                        if c.name == card:
+                            return i
+                else:
+                    start, stop = ident_range
+                    for i, c in enumerate(self.cards):
+                        if start <= c.ident < stop:
+                            return i
+
+        raise ValueError('{0!r} is not in zone \'{1}\''
+                .format(card, self.name))
+
+
+    def extend(self, cards, trusted=False):
         """Add the sequence of Card objects.
+
+        If trusted is True, don't check that each object is a Card.
         """
-        for c in cards:
-            if not isinstance(c, Card):
-                raise GTRError( 'Tried to add an object to \'{0}\' '
-                    'that isn\'t of class Card.'.format(self.name))
+        cards = list(cards)
+        if not trusted:
+            for c in cards:
+                if not isinstance(c, Card):
+                    raise GTRError( 'Tried to add an object to \'{0}\' '
+                        'that isn\'t of class Card.'.format(self.name))
 
         self.cards.extend(cards)
+        self._count_in(cards)
+
+        if self._location is not None:
+            locations, kind, player, building = self._location
+            locations.place(cards, kind, player, building)
+
+        if self.on_change is not None:
+            self.on_change()
 
 
     def append(self, card):
@@ -146,12 +544,23 @@ class Zone(object):
                 'that isn\'t of class Card.'.format(self.name))
 
         self.cards.append(card)
+        self._count_in((card,))
+
+        if self._location is not None:
+            locations, kind, player, building = self._location
+            locations.place((card,), kind, player, building)
+
+        if self.on_change is not None:
+            self.on_change()
 
 
     def count(self, card_name):
         """Return the count of cards with the card name.
         """
-        return len(filter(lambda c:c.name == card_name, self.cards))
+        counts = self._kept_counts()
+        if counts is None:
+            return sum(1 for c in self if c.name == card_name)
+        return counts[1].get(card_name, 0)
 
     def get_cards(self, card_names):
         """Return Card objects corresponding to the strings in the cards list.
@@ -160,21 +569,18 @@ class Zone(object):
 
         Raises ValueError if any of the cards aren't in this zone.
         """
-        out = []
-        cards = Zone(list(self.cards))
-
-        for name in card_names:
-            try:
-                i = cards.index(name)
-            except IndexError:
-                raise ValueError('Not enough cards in this zone.')
+        if not self.contains(card_names):
+            raise ValueError('Not enough cards in this zone.')
 
-            out.append(cards.pop(i))
-
-        return out
+        cards = Zone(self.cards)
+        return [cards.pop_name(name) for name in card_names]
 
     def __eq__(self, other):
-        return self.__dict__ == other.__dict__
+        return isinstance(other, Zone) and \
+                self.name == other.name and self.cards == other.cards
+
+    def __ne__(self, other):
+        return not self == other
 
     def __iter__(self):
         return self.cards.__iter__()
@@ -183,7 +589,150 @@ class Zone(object):
         return self.cards.__next__()
 
     def __repr__(self):
-        return 'Zone({cards!r}, name={name!r})'.format(**self.__dict__)
+        return 'Zone({0!r}, name={1!r})'.format(self.cards, self.name)
 
     def __str__(self):
         return '{0}: {1}'.format(self.name, str(map(lambda x:x.name,self.cards)))
+
+
+class Library(Zone):
+    """The draw pile.
+
+    The cards are stored bottom first, so drawing from the top pops from
+    the end of a list instead of the front. The cards attribute is still
+    the list of cards top first, as for any other zone, but it is a copy:
+    changing the returned list doesn't change the library. Use the zone
+    methods, put_on_top() and shuffle() instead.
+    """
+
+    __slots__ = ('_cards',)
+
+    def __init__(self, cards=[], name='library'):
+        super(Library, self).__init__(cards, name)
+
+    def _get_cards(self):
+        return self._cards[::-1]
+
+    def _set_cards(self, cards):
+        self._cards = list(cards)[::-1]
+
+    cards = property(_get_cards, _set_cards)
+
+    def _copy_cards_to(self, zone):
+        zone._cards = self._cards[:]
+
+    def draw(self, n=1):
+        """Remove n cards from the top of the library and return them as
+        a list, top card first.
+
+        Raise IndexError if there are fewer than n cards. In that case no
+        cards are drawn.
+        """
+        if n > len(self._cards):
+            raise IndexError('Can\'t draw {0:d} cards from a library of {1:d}.'
+                    .format(n, len(self._cards)))
+        if n <= 0:
+            return []
+        elif n == 1:
+            cards = [self._cards.pop()]
+            self._count_out(cards)
+        else:
+            cards = self._cards[-n:]
+            del self._cards[-n:]
+            cards.reverse()
+            self._count_out(cards)
+
+        if self.on_change is not None:
+            self.on_change()
+
+        return cards
+
+    def put_on_top(self, card):
+        """Put the card on top of the library."""
+        self._cards.append(card)
+        self._count_in((card,))
+
+        if self._location is not None:
+            locations, kind, player, building = self._location
+            locations.place((card,), kind, player, building)
+
+        if self.on_change is not None:
+            self.on_change()
+
+    def shuffle(self):
+        """Shuffle the library with random.shuffle()."""
+        random.shuffle(self._cards)
+
+        if self.on_change is not None:
+            self.on_change()
+
+    def pop(self, index=0):
+        """Pop a card at given index, counted from the top of the library.
+
+        Unlike list.pop() and Zone.pop(), the default is the top card.
+        """
+        n = len(self._cards)
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError('Library index out of range.')
+
+        card = self._cards.pop(n-1-index)
+        self._count_out((card,))
+
+        if self.on_change is not None:
+            self.on_change()
+
+        return card
+
+    def index(self, card):
+        """Return the position of the first matching card from the top.
+
+        Raise ValueError if there is no such card in the library.
+        """
+        if card in self:
+            cards = self._cards
+            n = len(cards)
+            if isinstance(card, Card):
+                for i in xrange(n-1, -1, -1):
+                    if cards[i] == card:
+                        return n-1-i
+            else:
+                for i in xrange(n-1, -1, -1):
+                    if cards[i].name == card:
+                        return n-1-i
+
+        raise ValueError('{0!r} is not in zone \'{1}\''
+                .format(card, self.name))
+
+    def extend(self, cards, trusted=False):
+        """Add the sequence of Card objects to the bottom of the library.
+
+        If trusted is True, don't check that each object is a Card.
+        """
+        cards = list(cards)
+        if not trusted:
+            for c in cards:
+                if not isinstance(c, Card):
+                    raise GTRError( 'Tried to add an object to \'{0}\' '
+                        'that isn\'t of class Card.'.format(self.name))
+
+        self._cards[:0] = cards[::-1]
+        self._count_in(cards)
+
+        if self._location is not None:
+            locations, kind, player, building = self._location
+            locations.place(cards, kind, player, building)
+
+        if self.on_change is not None:
+            self.on_change()
+
+    def append(self, card):
+        """Add the card to the bottom of the library."""
+        self.extend((card,))
+
+    def __len__(self):
+        return len(self._cards)
+
+    def __iter__(self):
+        return reversed(self._cards)